@@ -1,5 +1,5 @@
 import abc
-from typing import Dict, Generator, List, Union
+from typing import Dict, Generator, List, Sequence, Union
 
 from django.core import checks
 
@@ -40,3 +40,9 @@ class BaseEncodingBackend(metaclass=abc.ABCMeta):
         If the requested thumbnail is not within the duration of the video
         an `InvalidTimeError` is thrown.
         """
+
+    def get_thumbnails(self, video_path: str, times: Sequence[float]) -> List[str]:
+        """
+        Extract images at given times from a video and return their paths.
+        """
+        return [self.get_thumbnail(video_path, at_time) for at_time in times]
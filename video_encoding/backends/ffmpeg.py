@@ -1,37 +1,32 @@
-import io
 import json
+import math
 import structlog as logging
 import os
-import re
 import subprocess
 import tempfile
+import shutil
+import threading
+from collections import OrderedDict
 from shutil import which
-from typing import Dict, Generator, List, Union
+from typing import Dict, Generator, List, Optional, Sequence, Tuple, Union
 
 from django.core import checks
+from vidra_kit.progress import FFmpegProgress
 
-from .. import exceptions
+from .. import exceptions, tuning
 from ..config import settings
+from ..utils import get_source_filename
 from .base import BaseEncodingBackend
 
 logger = logging.getLogger(__name__)
 
-# regex to extract the progress (time) from ffmpeg
-RE_TIMECODE = re.compile(r'time=(\d+:\d+:\d+.\d+) ')
+VIDEO_CODEC_PARAMS = ('-codec:v', '-c:v', '-vcodec')
 
 
 class FFmpegBackend(BaseEncodingBackend):
     name = 'FFmpeg'
 
     def __init__(self) -> None:
-        self.params: List[str] = [
-            '-threads',
-            str(settings.VIDEO_ENCODING_THREADS),
-            '-y',  # overwrite temporary created file
-            '-strict',
-            '-2',  # support aac codec (which is experimental)
-        ]
-
         self.ffmpeg_path: str = getattr(settings, 'VIDEO_ENCODING_FFMPEG_PATH', which('ffmpeg'))
         self.ffprobe_path: str = getattr(settings, 'VIDEO_ENCODING_FFPROBE_PATH', which('ffprobe'))
 
@@ -41,6 +36,52 @@ class FFmpegBackend(BaseEncodingBackend):
         if not self.ffprobe_path:
             raise exceptions.FFmpegError("ffprobe binary not found: {}".format(self.ffmpeg_path or ''))
 
+        self.capabilities: Optional[tuning.HostCapabilities] = None
+        threads = settings.VIDEO_ENCODING_THREADS
+        if settings.VIDEO_ENCODING_AUTO_TUNE:
+            # benchmark is run ahead of time by probe_encoders command, fixed
+            # threads are used until then
+            self.capabilities = tuning.get_capabilities(
+                self.ffmpeg_path, settings.VIDEO_ENCODING_PROBE_CACHE, run_probe=False
+            )
+        if self.capabilities is not None:
+            threads = self.get_tuning(None).threads
+
+        self.params: List[str] = [
+            '-threads',
+            str(threads),
+            '-y',  # overwrite temporary created file
+            '-strict',
+            '-2',  # support aac codec (which is experimental)
+        ]
+
+    def get_tuning(self, codec: Optional[str]) -> tuning.Tuning:
+        """
+        Return host specific encode parameters for a codec.
+        """
+        assert self.capabilities is not None
+        return tuning.tune(
+            self.capabilities,
+            codec or '',
+            target_speed=settings.VIDEO_ENCODING_TARGET_SPEED,
+            jobs=settings.VIDEO_ENCODING_JOBS,
+        )
+
+    def tune_params(self, params: List[str]) -> List[str]:
+        """
+        Add a host specific preset to format params which don't set one.
+        """
+        if self.capabilities is None or '-preset' in params:
+            return params
+        codec = None
+        for i, param in enumerate(params[:-1]):
+            if param in VIDEO_CODEC_PARAMS:
+                codec = params[i + 1]
+        preset = self.get_tuning(codec).preset
+        if preset is None:
+            return params
+        return [*params, '-preset', preset]
+
     @classmethod
     def check(cls) -> List[checks.Error]:
         errors = super(FFmpegBackend, cls).check()
@@ -57,16 +98,13 @@ class FFmpegBackend(BaseEncodingBackend):
             )
         return errors
 
-    def _spawn(self, cmd: List[str]) -> subprocess.Popen:
-        try:
-            return subprocess.Popen(
-                cmd,
-                shell=False,
-                stderr=subprocess.PIPE,  # ffmpeg reports live stats to stderr
-                universal_newlines=False,  # stderr will return bytes
-            )
-        except OSError as e:
-            raise exceptions.FFmpegError('Error while running ffmpeg binary') from e
+    def get_input_params(self, source_path: str) -> List[str]:
+        """
+        Input options for a source, retrying dropped connections of http(s) sources.
+        """
+        if source_path.startswith(('http://', 'https://')):
+            return ['-reconnect', '1', '-reconnect_on_network_error', '1', '-reconnect_delay_max', '30']
+        return []
 
     def encode(self, source_path: str, target_path: str, params: List[str]) -> Generator[float, None, None]:
         """
@@ -74,38 +112,29 @@ class FFmpegBackend(BaseEncodingBackend):
 
         All encoder specific options are passed in using `params`.
         """
-        total_time = self.get_media_info(source_path)['duration']
-
-        cmd = [self.ffmpeg_path, '-i', source_path, *self.params, *params, target_path]
-        process = self._spawn(cmd)
-        # ffmpeg write the progress to stderr
-        # each line is either terminated by \n or \r
-        reader = io.TextIOWrapper(process.stderr, newline=None)  # type: ignore
-
-        # update progress
-        while process.poll() is None:  # is process terminated yet?
-            line = reader.readline()
+        params = self.tune_params(params)
+        cmd = [self.ffmpeg_path, *self.get_input_params(source_path), '-i', source_path, *self.params, *params, target_path]
+        try:
+            # ffmpeg reports progress to a dedicated pipe, input duration is
+            # taken from its log
+            process = FFmpegProgress(cmd)
+        except OSError as e:
+            raise exceptions.FFmpegError('Error while running ffmpeg binary') from e
 
-            try:
-                # format 00:00:00.00
-                time_str = RE_TIMECODE.findall(line)[0]
-            except IndexError:
+        for progress in process:
+            if progress.percent is None:
                 continue
-
-            # convert time to seconds
-            time: float = 0
-            for part in time_str.split(':'):
-                time = 60 * time + float(part)
-
-            percent = round(time / total_time, 2)
+            percent = round(progress.percent, 2)
             logger.debug('yield {}%'.format(percent))
             yield percent
 
+        returncode = process.wait()
+
         if os.path.getsize(target_path) == 0:
             raise exceptions.FFmpegError("File size of generated file is 0")
 
-        if process.returncode != 0:
-            raise exceptions.FFmpegError("`{}` exited with code {:d}".format(' '.join(map(str, process.args)), process.returncode))
+        if returncode != 0:
+            raise exceptions.FFmpegError("`{}` exited with code {:d}".format(' '.join(map(str, process.args)), returncode))
 
         yield 100
 
@@ -121,7 +150,7 @@ class FFmpegBackend(BaseEncodingBackend):
         """
         Return information about the given video.
         """
-        cmd = [self.ffprobe_path, '-i', video_path]
+        cmd = [self.ffprobe_path, *self.get_input_params(video_path), '-i', video_path]
         cmd.extend(['-hide_banner', '-loglevel', 'warning'])
         cmd.extend(['-print_format', 'json'])
         cmd.extend(['-show_format', '-show_streams'])
@@ -142,23 +171,211 @@ class FFmpegBackend(BaseEncodingBackend):
         If the requested thumbnail is not within the duration of the video
         an `InvalidTimeError` is thrown.
         """
-        filename = os.path.basename(video_path)
-        filename, __ = os.path.splitext(filename)
-        _, image_path = tempfile.mkstemp(suffix='_{}.jpg'.format(filename))
+        return self.get_thumbnails(video_path, [at_time])[0]
+
+    def get_thumbnails(self, video_path: str, times: Sequence[float]) -> List[str]:
+        """
+        Extract images at given times from a video in a single ffmpeg run.
+
+        Every timestamp is a separate input seeking to the nearest keyframe
+        (`-ss` before `-i`), so ffmpeg doesn't decode the file from the start.
+        Results are cached per local source file and timestamps, returned
+        images are copies owned by the caller.
+
+        If any timestamp is not within the duration of the video
+        an `InvalidTimeError` is thrown.
+        """
+        source = _source_key(video_path)
+        key = (*source, 'frames', tuple(times)) if source else None
+        cached = _get_cached(key)
+        if cached is not None:
+            return cached
 
         video_duration = self.get_media_info(video_path)['duration']
-        if at_time > video_duration:
+        if any(t > video_duration for t in times):
             raise exceptions.InvalidTimeError()
-        thumbnail_time = at_time
 
-        cmd = [self.ffmpeg_path, '-i', video_path, '-vframes', '1']
-        cmd.extend(['-ss', str(thumbnail_time), '-y', image_path])
+        filename, __ = os.path.splitext(get_source_filename(video_path))
+        input_params = self.get_input_params(video_path)
+        cmd = [self.ffmpeg_path, '-y']
+        for at_time in times:
+            cmd.extend(['-ss', str(at_time), *input_params, '-i', video_path])
+        image_paths = []
+        for i, _ in enumerate(times):
+            fd, image_path = tempfile.mkstemp(suffix='_{}.jpg'.format(filename))
+            # ffmpeg opens the file by name
+            os.close(fd)
+            image_paths.append(image_path)
+            cmd.extend(['-map', '{}:v:0'.format(i), '-frames:v', '1', image_path])
+
+        subprocess.check_call(cmd)
+
+        for image_path in image_paths:
+            if not os.path.getsize(image_path):
+                # we somehow failed to generate thumbnail
+                for path in image_paths:
+                    os.unlink(path)
+                raise exceptions.InvalidTimeError()
+
+        _set_cached(key, image_paths)
+        return image_paths
+
+    def get_sprite(
+        self, video_path: str, interval: float = 10.0, width: int = 160, columns: int = 10
+    ) -> Tuple[str, str]:
+        """
+        Extract a thumbnail sprite sheet with a WebVTT index for trick-play.
+
+        One frame per `interval` seconds is scaled to `width` and tiled into
+        a single image by one ffmpeg run decoding keyframes only.
+
+        Unlike `get_thumbnails`, frames are not taken with a seeking input
+        per timestamp: a sprite needs a frame every few GOPs over the whole
+        file, so a feature would open hundreds of inputs (and connections for
+        URL sources), each reading its own GOP. A single keyframe-only pass
+        reads the file once and decodes just one frame per GOP.
+
+        Returns paths of the sprite image and of the WebVTT file, which refers
+        to the image by its basename.
+        """
+        source = _source_key(video_path)
+        key = (*source, 'sprite', interval, width, columns) if source else None
+        cached = _get_cached(key)
+        if cached is not None:
+            return cached[0], cached[1]
+
+        info = self.get_media_info(video_path)
+        duration = float(info['duration'])
+        # keep aspect ratio, yuv420 requires even height
+        height = int(round(width * int(info['height']) / int(info['width']) / 2)) * 2
+        count = max(1, math.ceil(duration / interval))
+        rows = math.ceil(count / columns)
+
+        filename, __ = os.path.splitext(get_source_filename(video_path))
+        fd, image_path = tempfile.mkstemp(suffix='_{}_sprite.jpg'.format(filename))
+        os.close(fd)
+        fd, vtt_path = tempfile.mkstemp(suffix='_{}_sprite.vtt'.format(filename))
+        os.close(fd)
+
+        vf = 'fps=1/{},scale={}:{},tile={}x{}'.format(interval, width, height, columns, rows)
+        cmd = [self.ffmpeg_path, '-y', '-skip_frame', 'nokey', *self.get_input_params(video_path), '-i', video_path]
+        cmd.extend(['-vf', vf, '-frames:v', '1', image_path])
 
         subprocess.check_call(cmd)
 
         if not os.path.getsize(image_path):
-            # we somehow failed to generate thumbnail
             os.unlink(image_path)
-            raise exceptions.InvalidTimeError()
-
-        return image_path
+            os.unlink(vtt_path)
+            raise exceptions.FFmpegError("File size of generated sprite is 0")
+
+        sprite_name = os.path.basename(image_path)
+        lines = ['WEBVTT', '']
+        for i in range(count):
+            start = i * interval
+            end = min((i + 1) * interval, duration)
+            x = (i % columns) * width
+            y = (i // columns) * height
+            lines.append('{} --> {}'.format(_vtt_time(start), _vtt_time(end)))
+            lines.append('{}#xywh={},{},{},{}'.format(sprite_name, x, y, width, height))
+            lines.append('')
+        with open(vtt_path, 'w') as f:
+            f.write('\n'.join(lines))
+
+        _set_cached(key, [image_path, vtt_path])
+        return image_path, vtt_path
+
+
+# Thumbnails are cached in files owned by the cache and callers always get
+# their own copies, which they may delete. Least recently used entries are
+# evicted above this number of entries.
+THUMBNAIL_CACHE_SIZE = 64
+
+# (source path, mtime, size, kind, params...) -> cached file paths
+_thumbnail_cache: 'OrderedDict[tuple, List[str]]' = OrderedDict()
+_thumbnail_lock = threading.Lock()
+_thumbnail_dir: Optional[str] = None
+
+
+def _source_key(video_path: str) -> Optional[tuple]:
+    """
+    Cache key of a source, None if it can't be stat'ed (i.e. URLs).
+    """
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return None
+    return (os.path.realpath(video_path), stat.st_mtime_ns, stat.st_size)
+
+
+def _copy_files(paths: List[str], dir: Optional[str] = None) -> List[str]:
+    """
+    Copy files to new temporary files.
+
+    References to basenames of copied files in WebVTT files are updated.
+    """
+    copies = []
+    for path in paths:
+        name = os.path.basename(path)
+        suffix = '_' + name.split('_', 1)[1] if '_' in name else os.path.splitext(name)[1]
+        fd, copy = tempfile.mkstemp(suffix=suffix, dir=dir)
+        os.close(fd)
+        shutil.copyfile(path, copy)
+        copies.append(copy)
+    names = [(os.path.basename(p), os.path.basename(c)) for p, c in zip(paths, copies)]
+    for copy in copies:
+        if copy.endswith('.vtt'):
+            with open(copy) as f:
+                content = f.read()
+            for old, new in names:
+                content = content.replace(old, new)
+            with open(copy, 'w') as f:
+                f.write(content)
+    return copies
+
+
+def _get_cached(key: Optional[tuple]) -> Optional[List[str]]:
+    if key is None:
+        return None
+    with _thumbnail_lock:
+        paths = _thumbnail_cache.get(key)
+        if paths is None:
+            return None
+        if not all(os.path.exists(p) for p in paths):
+            _evict(key)
+            return None
+        _thumbnail_cache.move_to_end(key)
+        # copy under lock, so files are not evicted while copying
+        return _copy_files(paths)
+
+
+def _set_cached(key: Optional[tuple], paths: List[str]) -> None:
+    global _thumbnail_dir
+    if key is None:
+        return
+    with _thumbnail_lock:
+        if _thumbnail_dir is None:
+            _thumbnail_dir = tempfile.mkdtemp(prefix='video_encoding_thumbnails_')
+        if key in _thumbnail_cache:
+            _evict(key)
+        _thumbnail_cache[key] = _copy_files(paths, _thumbnail_dir)
+        while len(_thumbnail_cache) > THUMBNAIL_CACHE_SIZE:
+            _evict(next(iter(_thumbnail_cache)))
+
+
+def _evict(key: tuple) -> None:
+    for path in _thumbnail_cache.pop(key):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _vtt_time(seconds: float) -> str:
+    """
+    Format seconds as WebVTT timestamp (hh:mm:ss.mmm).
+    """
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return '{:02d}:{:02d}:{:02d}.{:03d}'.format(hours, minutes, secs, millis)
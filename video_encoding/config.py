@@ -4,6 +4,19 @@ from django.conf import settings  # NOQA
 
 class VideoEncodingAppConf(AppConf):
     THREADS = 1
+    # pick threads and x264/x265 presets from a host benchmark (see tuning)
+    AUTO_TUNE = False
+    # encoding speed (media seconds per wall second) to aim for with AUTO_TUNE
+    TARGET_SPEED = 1.0
+    # benchmark results file, defaults to a per-host file in temp dir
+    PROBE_CACHE = None
+    # encodes running concurrently on a host (worker concurrency), cores are
+    # split between them with AUTO_TUNE
+    JOBS = 1
+    # pass http(s) URLs of remote storage files to ffmpeg instead of
+    # downloading them first; presigned URLs must stay valid until every
+    # format is encoded
+    STREAM_URL = False
     PROGRESS_UPDATE = 30
     BACKEND = 'video_encoding.backends.ffmpeg.FFmpegBackend'
     BACKEND_PARAMS = {}  # type: ignore
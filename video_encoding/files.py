@@ -1,6 +1,7 @@
 from django.core.files import File
 
 from .backends import get_backend
+from .config import settings
 from .utils import get_local_path
 
 
@@ -41,7 +42,7 @@ class VideoFile(File):
         if not hasattr(self, '_info_cache'):
             encoding_backend = get_backend()
 
-            with get_local_path(self) as local_path:
+            with get_local_path(self, allow_url=settings.VIDEO_ENCODING_STREAM_URL) as local_path:
                 info_cache = encoding_backend.get_media_info(local_path)
 
             self._info_cache = info_cache
@@ -1,4 +1,3 @@
-import os
 import tempfile
 
 from django.apps import apps
@@ -12,7 +11,7 @@ from .config import settings
 from .exceptions import VideoEncodingError
 from .fields import VideoField
 from .models import Format
-from .utils import get_local_path
+from .utils import get_local_path, get_source_filename
 
 
 def convert_all_videos(app_label, model_name, object_pk):
@@ -43,7 +42,7 @@ def convert_video(fieldfile, force=False):
     instance = fieldfile.instance
     field = fieldfile.field
 
-    with get_local_path(fieldfile) as source_path:
+    with get_local_path(fieldfile, allow_url=settings.VIDEO_ENCODING_STREAM_URL) as source_path:
         encoding_backend = get_backend()
 
         signals.encoding_started.send(instance.__class__, instance=instance)
@@ -116,7 +115,7 @@ def _encode(
             video_format.update_progress(progress)
 
         # save encoded file
-        filename = os.path.basename(source_path)
+        filename = get_source_filename(source_path)
         # TODO remove existing file?
         video_format.file.save(
             '{filename}_{name}.{extension}'.format(filename=filename, **options),
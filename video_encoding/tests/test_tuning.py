@@ -0,0 +1,83 @@
+import json
+import os
+import socket
+import tempfile
+from unittest import TestCase, mock
+
+from video_encoding import tuning
+
+
+def make_caps(cpu_count=64, speed=None):
+    return tuning.HostCapabilities(
+        hostname=socket.gethostname(),
+        cpu_count=cpu_count,
+        ffmpeg_path='ffmpeg',
+        encoders=['libx264'],
+        speed={'libx264': speed or {'veryfast': 8.0, 'medium': 3.0, 'slow': 1.5}},
+    )
+
+
+class TuneTestCase(TestCase):
+    def test_single_job(self):
+        """A single encode gets all cores and the slowest fast enough preset."""
+        t = tuning.tune(make_caps(), 'libx264', target_speed=1.0)
+
+        self.assertEqual(t, tuning.Tuning(threads=64, preset='slow', jobs=1))
+        self.assertEqual(t.get_params(), ['-threads', '64', '-preset', 'slow'])
+
+    def test_concurrent_jobs(self):
+        """Cores and speed are shared by concurrent encodes."""
+        t = tuning.tune(make_caps(), 'libx264', target_speed=1.0, jobs=4)
+
+        self.assertEqual(t, tuning.Tuning(threads=16, preset='veryfast', jobs=4))
+
+    def test_jobs_limited_by_cores(self):
+        t = tuning.tune(make_caps(cpu_count=2), 'libx264', jobs=8)
+
+        self.assertEqual((t.threads, t.jobs), (1, 2))
+
+    def test_too_slow(self):
+        """Fastest probed preset is used if none reaches target speed."""
+        t = tuning.tune(make_caps(), 'libx264', target_speed=10.0)
+
+        self.assertEqual(t.preset, 'veryfast')
+
+    def test_not_probed(self):
+        t = tuning.tune(make_caps(), 'libvpx')
+
+        self.assertIsNone(t.preset)
+        self.assertEqual(t.get_params(), ['-threads', '64'])
+
+
+class GetCapabilitiesTestCase(TestCase):
+    def setUp(self):
+        fd, self.cache_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        os.unlink(self.cache_path)
+        self.addCleanup(tuning._capabilities.clear)
+
+    def tearDown(self):
+        if os.path.exists(self.cache_path):
+            os.unlink(self.cache_path)
+
+    def test_no_probe(self):
+        """Encoders don't run the benchmark themselves."""
+        with mock.patch.object(tuning, 'probe') as m:
+            caps = tuning.get_capabilities('ffmpeg', self.cache_path, run_probe=False)
+
+        self.assertIsNone(caps)
+        m.assert_not_called()
+
+    def test_cached(self):
+        caps = make_caps(cpu_count=os.cpu_count() or 1)
+        with mock.patch.object(tuning, 'probe', return_value=caps) as m:
+            self.assertEqual(tuning.get_capabilities('ffmpeg', self.cache_path), caps)
+        m.assert_called_once_with('ffmpeg')
+        with open(self.cache_path) as f:
+            self.assertEqual(json.load(f)['speed'], caps.speed)
+
+        tuning._capabilities.clear()
+        with mock.patch.object(tuning, 'probe') as m:
+            result = tuning.get_capabilities('ffmpeg', self.cache_path, run_probe=False)
+        self.assertEqual(result, caps)
+        m.assert_not_called()
@@ -0,0 +1,98 @@
+import io
+import os
+from types import SimpleNamespace
+from unittest import TestCase, mock
+
+from video_encoding import utils
+from video_encoding.utils import get_local_path, get_source_filename
+
+
+class GetSourceFilenameTestCase(TestCase):
+    def test_local_path(self):
+        """Local paths are not parsed as URLs."""
+        self.assertEqual(get_source_filename('/tmp/take #2?.mp4'), 'take #2?.mp4')
+
+    def test_url(self):
+        """Query is dropped and name is unquoted for URLs."""
+        url = 'https://bucket.s3.amazonaws.com/videos/take%20%232.mp4?X-Amz-Expires=3600'
+
+        self.assertEqual(get_source_filename(url), 'take #2.mp4')
+
+
+class RemoteStorage:
+    """Storage without local paths, recording read sizes."""
+
+    def __init__(self, data, url=None):
+        self.data = data
+        self._url = url
+        self.reads = []
+
+    def path(self, name):
+        raise NotImplementedError()
+
+    def url(self, name):
+        if self._url is None:
+            raise NotImplementedError()
+        return self._url
+
+    def open(self, name, mode='rb'):
+        storage = self
+
+        class StorageFile(io.BytesIO):
+            def read(self, size=-1):
+                storage.reads.append(size)
+                return super().read(size)
+
+        return StorageFile(self.data)
+
+
+class GetLocalPathTestCase(TestCase):
+    def fieldfile(self, storage, name='videos/a.mp4'):
+        return SimpleNamespace(storage=storage, name=name)
+
+    def test_download(self):
+        """Remote files are copied in bounded chunks to a temp file."""
+        storage = RemoteStorage(b'x' * 25)
+
+        with mock.patch.object(utils, 'DOWNLOAD_CHUNK_SIZE', 10):
+            with get_local_path(self.fieldfile(storage)) as path:
+                self.assertTrue(path.endswith('.mp4'))
+                with open(path, 'rb') as f:
+                    self.assertEqual(f.read(), storage.data)
+
+        self.assertEqual(storage.reads, [10, 10, 10, 10])
+        self.assertFalse(os.path.exists(path))
+
+    def test_download_error(self):
+        """Temp file is removed if processing fails."""
+        storage = RemoteStorage(b'x')
+
+        with self.assertRaises(RuntimeError):
+            with get_local_path(self.fieldfile(storage)) as path:
+                raise RuntimeError()
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_url(self):
+        """URLs are returned only if allowed and streamable."""
+        url = 'https://cdn.example.com/videos/a.mp4?token=1'
+        storage = RemoteStorage(b'x', url=url)
+
+        with get_local_path(self.fieldfile(storage), allow_url=True) as path:
+            self.assertEqual(path, url)
+        self.assertEqual(storage.reads, [])
+
+        with get_local_path(self.fieldfile(storage)) as path:
+            self.assertNotEqual(path, url)
+            self.assertTrue(os.path.isfile(path))
+
+        storage._url = 'ftp://example.com/videos/a.mp4'
+        with get_local_path(self.fieldfile(storage), allow_url=True) as path:
+            self.assertTrue(os.path.isfile(path))
+
+    def test_local_path(self):
+        storage = mock.Mock()
+        storage.path.return_value = '/media/videos/a.mp4'
+
+        with get_local_path(self.fieldfile(storage)) as path:
+            self.assertEqual(path, '/media/videos/a.mp4')
@@ -0,0 +1,240 @@
+"""
+Host encoder capability probe and per-host encode tuning.
+
+Workers differ in core count and available encoders, so fixed `-threads`
+and `-preset` values leave fast hosts idle and overload slow ones. The probe
+benchmarks every preset of the software encoders on a short synthetic clip,
+results are cached on disk per host, and `tune()` picks threads and preset
+for the number of encodes running concurrently on the host.
+
+The benchmark takes a while, so it is run ahead of time
+(``manage.py probe_encoders``); encoders only read cached results.
+"""
+import json
+import logging
+import os
+import socket
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from shutil import which
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# presets from the fastest to the slowest, common for libx264 and libx265
+PRESETS = (
+    'ultrafast',
+    'superfast',
+    'veryfast',
+    'faster',
+    'fast',
+    'medium',
+    'slow',
+    'slower',
+    'veryslow',
+)
+
+PROBE_CODECS = ('libx264', 'libx265')
+
+# synthetic clip used for benchmarking
+PROBE_SOURCE = 'testsrc2=size=1280x720:rate=25'
+PROBE_DURATION = 2.0
+
+
+@dataclass
+class HostCapabilities:
+    """
+    Probe results for a host.
+    """
+
+    hostname: str
+    cpu_count: int
+    ffmpeg_path: str
+    encoders: List[str] = field(default_factory=list)
+    # codec -> preset -> speed factor (media seconds per wall second)
+    speed: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Tuning:
+    """
+    Encode parameters selected for a host.
+    """
+
+    threads: int
+    preset: Optional[str]
+    # concurrent encodes the parameters are selected for
+    jobs: int
+
+    def get_params(self) -> List[str]:
+        """
+        :return: ffmpeg output parameters.
+        """
+        params = ['-threads', str(self.threads)]
+        if self.preset:
+            params.extend(['-preset', self.preset])
+        return params
+
+
+def list_encoders(ffmpeg_path: str) -> List[str]:
+    """
+    Return names of encoders supported by ffmpeg binary.
+    """
+    output = subprocess.check_output(
+        [ffmpeg_path, '-hide_banner', '-encoders'], stderr=subprocess.DEVNULL
+    ).decode('utf-8', 'replace')
+    encoders = []
+    header = True
+    for line in output.splitlines():
+        if header:
+            # capabilities legend is separated from the list by "------"
+            header = not line.strip().startswith('---')
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            encoders.append(parts[1])
+    return encoders
+
+
+def measure_speed(
+    ffmpeg_path: str, codec: str, preset: str, duration: float = PROBE_DURATION
+) -> float:
+    """
+    Encode a synthetic clip and return encoding speed factor.
+    """
+    cmd = [
+        ffmpeg_path,
+        '-hide_banner',
+        '-loglevel',
+        'error',
+        '-f',
+        'lavfi',
+        '-i',
+        PROBE_SOURCE,
+        '-t',
+        str(duration),
+        '-c:v',
+        codec,
+        '-preset',
+        preset,
+        '-f',
+        'null',
+        '-',
+    ]
+    started = time.monotonic()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elapsed = time.monotonic() - started
+    return duration / elapsed if elapsed else 0.0
+
+
+def probe(
+    ffmpeg_path: str,
+    codecs: Sequence[str] = PROBE_CODECS,
+    presets: Sequence[str] = PRESETS,
+) -> HostCapabilities:
+    """
+    Benchmark host encoders.
+    """
+    caps = HostCapabilities(
+        hostname=socket.gethostname(),
+        cpu_count=os.cpu_count() or 1,
+        ffmpeg_path=ffmpeg_path,
+        encoders=list_encoders(ffmpeg_path),
+    )
+    for codec in codecs:
+        if codec not in caps.encoders:
+            continue
+        for preset in presets:
+            try:
+                speed = measure_speed(ffmpeg_path, codec, preset)
+            except subprocess.CalledProcessError:
+                logger.warning('Probing %s preset %s failed', codec, preset)
+                continue
+            caps.speed.setdefault(codec, {})[preset] = speed
+            logger.info('Probed %s preset %s: %.2fx', codec, preset, speed)
+    return caps
+
+
+def get_cache_path() -> str:
+    return os.path.join(
+        tempfile.gettempdir(), 'video_encoding_probe_{}.json'.format(socket.gethostname())
+    )
+
+
+_capabilities: Dict[str, HostCapabilities] = {}
+
+
+def _is_current(caps: HostCapabilities, ffmpeg_path: str) -> bool:
+    return (caps.hostname, caps.cpu_count, caps.ffmpeg_path) == (
+        socket.gethostname(),
+        os.cpu_count() or 1,
+        ffmpeg_path,
+    )
+
+
+def get_capabilities(
+    ffmpeg_path: Optional[str] = None,
+    cache_path: Optional[str] = None,
+    run_probe: bool = True,
+) -> Optional[HostCapabilities]:
+    """
+    Return host capabilities, probing the host only once.
+
+    Results are kept in memory and in a json file, which is ignored if it was
+    written on another host, for another ffmpeg binary or core count.
+
+    :param run_probe: benchmark the host if there are no valid cached
+        results, otherwise return None.
+    """
+    ffmpeg_path = ffmpeg_path or which('ffmpeg') or 'ffmpeg'
+    cache_path = cache_path or get_cache_path()
+    if cache_path in _capabilities:
+        return _capabilities[cache_path]
+
+    caps = None
+    try:
+        with open(cache_path) as f:
+            caps = HostCapabilities(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        pass
+    if caps is None or not _is_current(caps, ffmpeg_path):
+        if not run_probe:
+            logger.warning('No encoder probe results in %s, run probe_encoders', cache_path)
+            return None
+        caps = probe(ffmpeg_path)
+        try:
+            with open(cache_path, 'w') as f:
+                json.dump(asdict(caps), f)
+        except OSError:
+            logger.warning('Cannot write probe cache to %s', cache_path)
+    _capabilities[cache_path] = caps
+    return caps
+
+
+def tune(
+    caps: HostCapabilities,
+    codec: str,
+    target_speed: float = 1.0,
+    jobs: int = 1,
+) -> Tuning:
+    """
+    Select encode parameters for a host.
+
+    Cores are split evenly between `jobs` encodes running concurrently on
+    the host (i.e. worker concurrency). The slowest (best quality) preset
+    still encoding at least at `target_speed` with this share of cores is
+    selected; the fastest probed preset is used if none is fast enough.
+    Preset is None for codecs that were not probed.
+    """
+    jobs = min(max(jobs, 1), caps.cpu_count)
+    threads = max(1, caps.cpu_count // jobs)
+    speeds = caps.speed.get(codec, {})
+    probed = [p for p in PRESETS if p in speeds]
+    preset = None
+    if probed:
+        # probe runs a single job on all cores
+        fast_enough = [p for p in probed if speeds[p] / jobs >= target_speed]
+        preset = fast_enough[-1] if fast_enough else probed[0]
+    return Tuning(threads=threads, preset=preset, jobs=jobs)
@@ -1,15 +1,56 @@
 import contextlib
 import os
+import shutil
 import tempfile
-from typing import Generator
+from typing import Generator, Optional
+from urllib.parse import unquote, urlparse
 
 from django.core.files import File
 
+# read size for copying remote storage files to a local temp file
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# URL schemes ffmpeg reads with range requests
+STREAMABLE_SCHEMES = ('http', 'https')
+
+
+def get_source_url(fieldfile: File) -> Optional[str]:
+    """
+    Return an absolute http(s) URL of a storage file, if the storage has one.
+    """
+    try:
+        url = fieldfile.storage.url(fieldfile.name)
+    except (NotImplementedError, AttributeError, ValueError):
+        return None
+    if urlparse(url).scheme not in STREAMABLE_SCHEMES:
+        return None
+    return url
+
+
+def get_source_filename(source_path: str) -> str:
+    """
+    Return file name of a source returned by `get_local_path`.
+
+    Only http(s) URLs are parsed, local paths are taken as is, so names
+    containing "#" or "?" are kept.
+    """
+    parsed = urlparse(source_path)
+    if parsed.scheme in STREAMABLE_SCHEMES:
+        return os.path.basename(unquote(parsed.path))
+    return os.path.basename(source_path)
+
 
 @contextlib.contextmanager
-def get_local_path(fieldfile: File) -> Generator[str, None, None]:
+def get_local_path(
+    fieldfile: File, allow_url: bool = False
+) -> Generator[str, None, None]:
     """
     Get a local file to work with from a file retrieved from a FileField.
+
+    Files of storages without local paths are streamed to a temporary file,
+    which is removed on exit. With `allow_url` an absolute http(s) URL of the
+    file is returned instead if the storage provides one, so ffmpeg reads the
+    source with range requests and no local copy is made.
     """
     if not hasattr(fieldfile, 'storage'):
         # Its a local file with no storage abstraction
@@ -17,17 +58,31 @@ def get_local_path(fieldfile: File) -> Generator[str, None, None]:
             yield os.path.abspath(fieldfile.path)
         except AttributeError:
             yield os.path.abspath(fieldfile.name)
-    else:
-        storage = fieldfile.storage
-        try:
-            # Try to access with path
-            yield storage.path(fieldfile.path)
-        except (NotImplementedError, AttributeError):
-            # Storage doesnt support absolute paths,
-            # download file to a temp local dir
-            with tempfile.NamedTemporaryFile(mode="wb", delete=False) as temp_file:
-                storage_file = storage.open(fieldfile.name, 'rb')
-
-                temp_file.write(storage_file.read())
-                temp_file.flush()
-                yield temp_file.name
+        return
+
+    storage = fieldfile.storage
+    try:
+        # Try to access with path
+        path = storage.path(fieldfile.name)
+    except (NotImplementedError, AttributeError):
+        path = None
+    if path is not None:
+        yield path
+        return
+
+    url = get_source_url(fieldfile) if allow_url else None
+    if url is not None:
+        yield url
+        return
+
+    # Storage doesnt support absolute paths, download file to a temp local
+    # dir chunk by chunk to keep memory usage bounded
+    __, ext = os.path.splitext(fieldfile.name)
+    fd, temp_path = tempfile.mkstemp(suffix=ext)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            with storage.open(fieldfile.name, 'rb') as storage_file:
+                shutil.copyfileobj(storage_file, temp_file, DOWNLOAD_CHUNK_SIZE)
+        yield temp_path
+    finally:
+        os.unlink(temp_path)
@@ -31,7 +31,7 @@ def short_description(name: str | Promise) -> Callable[[C], C]:
 # noinspection PyUnresolvedReferences
 class VideoAdmin(admin.ModelAdmin):
     list_display = ("basename", "source", "status_display")
-    list_filter = ("status",)
+    list_filter = ("status", "queue")
     search_fields = ("source", "=basename")
     actions = ["transcode"]
     readonly_fields = ("created", "modified", "video_player")
@@ -48,8 +48,15 @@ class VideoAdmin(admin.ModelAdmin):
     def transcode(
         self, request: HttpRequest, queryset: "QuerySet[models.Video]"
     ) -> None:
-        for video in queryset:
-            helpers.send_transcode_task(video)
+        helpers.send_transcode_tasks(
+            queryset,
+            statuses=(
+                models.Video.CREATED,
+                models.Video.QUEUED,
+                models.Video.DONE,
+                models.Video.ERROR,
+            ),
+        )
 
     @short_description(_("Video player"))
     def video_player(self, obj: models.Video) -> str:
@@ -3,8 +3,11 @@ from django.utils.translation import gettext_lazy as _
 
 
 class VideoTranscodingConfig(AppConfig):
-    name = "apps.video_transcoding"
+    name = "apps.video_transcoding_off"
+    label = "video_transcoding"
     verbose_name = _("Video Transcoding")
 
-    # def ready(self) -> None:
-    # __import__("video_transcoding.signals")
+    def ready(self) -> None:
+        # connects receivers: transcode task on video creation, preset
+        # cache invalidation on track and profile changes
+        __import__("apps.video_transcoding_off.signals")
@@ -4,6 +4,9 @@ from django.conf import settings
 from kombu import Queue
 
 CELERY_APP_NAME = 'video_transcoding'
+# Queue for short videos, consumed by dedicated workers
+VIDEO_TRANSCODING_FAST_QUEUE = e(
+    'VIDEO_TRANSCODING_FAST_QUEUE', f'{CELERY_APP_NAME}_fast')
 
 try:
     VIDEO_TRANSCODING_CELERY_CONF = getattr(
@@ -36,13 +39,33 @@ except AttributeError:
                 routing_key=CELERY_APP_NAME,
                 queue_arguments=queue_arguments
             ),
+            Queue(
+                VIDEO_TRANSCODING_FAST_QUEUE,
+                routing_key=VIDEO_TRANSCODING_FAST_QUEUE,
+                queue_arguments=queue_arguments
+            ),
         ]
     }
 
-# delay between sending celery task and applying it
-VIDEO_TRANSCODING_COUNTDOWN = int(e('VIDEO_TRANSCODING_COUNTDOWN', 10))
-# delay between applying celery task and locking video
-VIDEO_TRANSCODING_WAIT = int(e('VIDEO_TRANSCODING_WAIT', 0))
+# delay between sending celery task and applying it (tasks are sent after
+# transaction commit, so no delay is required)
+VIDEO_TRANSCODING_COUNTDOWN = int(e('VIDEO_TRANSCODING_COUNTDOWN', 0))
+# initial and max delay between video lock attempts, seconds
+VIDEO_LOCK_RETRY_DELAY = float(e('VIDEO_LOCK_RETRY_DELAY', 1))
+VIDEO_LOCK_RETRY_MAX_DELAY = float(e('VIDEO_LOCK_RETRY_MAX_DELAY', 60))
+# max video lock attempts while video is not visible in database
+VIDEO_LOCK_MAX_RETRIES = int(e('VIDEO_LOCK_MAX_RETRIES', 10))
+
+# Max estimated cost (duration seconds * video tracks of selected profile) of a video
+# routed to fast queue (0 - fast queue disabled)
+VIDEO_TRANSCODING_FAST_COST = float(e('VIDEO_TRANSCODING_FAST_COST', 0))
+# Max time in default queue before video is moved to fast queue, seconds
+VIDEO_TRANSCODING_MAX_WAIT = int(e('VIDEO_TRANSCODING_MAX_WAIT', 3600))
+# Max estimated cost of a waiting video moved to fast queue
+VIDEO_TRANSCODING_PROMOTE_COST = float(
+    e('VIDEO_TRANSCODING_PROMOTE_COST', 4 * VIDEO_TRANSCODING_FAST_COST))
+# ffprobe timeout for source probe on queueing, seconds
+VIDEO_PROBE_TIMEOUT = float(e('VIDEO_PROBE_TIMEOUT', 10))
 
 # URI for shared files
 VIDEO_TEMP_URI = e('VIDEO_TEMP_URI', 'file:///data/tmp/')
@@ -54,6 +77,14 @@ VIDEO_EDGES = e('VIDEO_EDGES', 'http://localhost:8000/media/').split(',')
 
 # Edge video manifest url template
 VIDEO_URL = e('VIDEO_URL', '{edge}/results/{filename}/index.m3u8')
+# Edge DASH manifest url template (for "cmaf" packaging)
+VIDEO_DASH_URL = e('VIDEO_DASH_URL', '{edge}/results/{filename}/manifest.mpd')
+
+# Result packaging: "hls" (MPEG-TS segments) or "cmaf" (fMP4 segments shared
+# by HLS and DASH manifests)
+VIDEO_PACKAGING = e('VIDEO_PACKAGING', 'hls')
+# DASH manifest filename for "cmaf" packaging
+VIDEO_DASH_MANIFEST = e('VIDEO_DASH_MANIFEST', 'manifest.mpd')
 
 # HTTP Request timeouts
 VIDEO_CONNECT_TIMEOUT = float(e('VIDEO_CONNECT_TIMEOUT', 1))
@@ -62,6 +93,27 @@ VIDEO_REQUEST_TIMEOUT = float(e('VIDEO_REQUEST_TIMEOUT', 1))
 # Processing segment duration
 VIDEO_CHUNK_DURATION = int(e('VIDEO_CHUNK_DURATION', 60))
 
+# Select chunk duration depending on source duration (see planner)
+VIDEO_ADAPTIVE_CHUNKS = bool(int(e('VIDEO_ADAPTIVE_CHUNKS', 0)))
+# Desired number of chunks per source for adaptive chunks, also number of
+# chunks transcoded concurrently
+VIDEO_CHUNK_PARALLELISM = int(e('VIDEO_CHUNK_PARALLELISM', 8))
+# Adaptive chunk duration limits, seconds
+VIDEO_CHUNK_MIN_DURATION = float(e('VIDEO_CHUNK_MIN_DURATION', 30))
+VIDEO_CHUNK_MAX_DURATION = float(e('VIDEO_CHUNK_MAX_DURATION', 600))
+# Maximum share of per-chunk overhead in chunk transcoding time
+VIDEO_CHUNK_MAX_OVERHEAD = float(e('VIDEO_CHUNK_MAX_OVERHEAD', 0.05))
+# Number of last processed videos to estimate chunk overhead from
+VIDEO_CHUNK_COST_SAMPLES = int(e('VIDEO_CHUNK_COST_SAMPLES', 20))
+
+# Transcode chunks while source is still being split
+VIDEO_PIPELINED_SPLIT = bool(int(e('VIDEO_PIPELINED_SPLIT', 0)))
+# Split playlist polling interval for pipelined split, seconds
+VIDEO_SPLIT_POLL_INTERVAL = float(e('VIDEO_SPLIT_POLL_INTERVAL', 1))
+
+# Transcoded chunks cache size limit at VIDEO_TEMP_URI, bytes (0 - disabled)
+VIDEO_SEGMENT_CACHE_SIZE = int(e('VIDEO_SEGMENT_CACHE_SIZE', 0))
+
 VIDEO_MODEL = 'video_transcoding.Video'
 
 _default_config = locals()
@@ -1,23 +1,205 @@
+from datetime import timedelta
+from logging import getLogger
+from typing import Callable, Optional, List, Iterable
+from uuid import UUID, uuid4
+
+import celery
 from celery.result import AsyncResult
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
 
-from apps.video_transcoding_off import models, defaults
+from apps.video_transcoding_off import models, defaults, scheduling
 from apps.video_transcoding_off import tasks
 
+logger = getLogger(__name__)
+
+
+def publish_tasks(send: Callable[[], None], task_ids: Iterable[UUID]) -> None:
+    """
+    Sends queued tasks to broker, reverting videos on failure.
+
+    If broker is unavailable, videos still QUEUED with given task ids are
+    moved back to CREATED status, so they are not left queued without task
+    and may be sent again.
+
+    :param send: function publishing tasks.
+    :param task_ids: task identifiers of queued videos.
+    """
+    try:
+        send()
+    except Exception as e:
+        task_ids = list(task_ids)
+        logger.error("Can't send transcoding tasks %s: %s", task_ids, e)
+        models.get_video_model().objects.filter(
+            status=models.Video.QUEUED, task_id__in=task_ids
+        ).update(status=models.Video.CREATED, task_id=None, modified=timezone.now())
+
 
-def send_transcode_task(video: models.Video) -> AsyncResult:
+def send_transcode_task(
+    video: models.Video, queue: Optional[str] = None
+) -> AsyncResult:
     """
     Send a video transcoding task.
 
-    If task is successfully sent to broker, Video status is changed to QUEUED
-    and Celery task identifier is saved.
+    Video status is changed to QUEUED with a new Celery task identifier, and
+    task is sent to broker after transaction commit.
 
     :param video: video object
     :type video: video.models.Video
+    :param queue: celery queue name, selected by known video cost if not
+        set. Source is not probed here: videos with unknown cost go to
+        default queue and are probed by `promote_stale_videos`.
     :returns: Celery task result
     :rtype: celery.result.AsyncResult
     """
-    result = tasks.transcode_video.apply_async(
-        args=(video.pk,), countdown=defaults.VIDEO_TRANSCODING_COUNTDOWN
+    if queue is None:
+        queue = scheduling.select_queue(video, probe=False)
+    task_id = uuid4()
+    # Task is sent after commit, so worker always finds video in QUEUED
+    # status with current task id.
+    video.change_status(video.QUEUED, task_id=task_id, queue=queue)
+    transaction.on_commit(
+        lambda: publish_tasks(
+            lambda: tasks.transcode_video.apply_async(
+                args=(video.pk,),
+                task_id=str(task_id),
+                countdown=defaults.VIDEO_TRANSCODING_COUNTDOWN,
+                queue=queue,
+            ),
+            [task_id],
+        )
     )
-    video.change_status(video.QUEUED, task_id=result.task_id)
-    return result
+    return tasks.transcode_video.AsyncResult(str(task_id))
+
+
+def send_transcode_tasks(
+    queryset: "QuerySet[models.Video]",
+    statuses: Iterable[int] = (models.Video.CREATED,),
+) -> List[str]:
+    """
+    Sends transcoding tasks for multiple videos at once.
+
+    Videos are moved to QUEUED status with a single bulk update, and tasks
+    are published after transaction commit as a group over a single broker
+    connection. Videos that are locked or have another status are skipped.
+
+    Queue selection may probe sources, so it is done before rows are locked.
+
+    :param queryset: videos to transcode.
+    :param statuses: video statuses allowed to be queued.
+    :returns: sent task identifiers.
+    """
+    statuses = list(statuses)
+    # preset is needed to estimate video cost for queue selection
+    selected = {
+        video.pk: video
+        for video in queryset.select_related("preset").filter(status__in=statuses)
+    }
+    for video in selected.values():
+        video.queue = scheduling.select_queue(video)
+    now = timezone.now()
+    with transaction.atomic():
+        qs = queryset.select_related("preset").select_for_update(
+            skip_locked=True, of=("self",)
+        )
+        videos = list(qs.filter(status__in=statuses))
+        for video in videos:
+            prepared = selected.get(video.pk)
+            if prepared is None:
+                # appeared after queue selection, don't probe under lock
+                video.queue = scheduling.select_queue(video, probe=False)
+            else:
+                video.queue = prepared.queue
+                if prepared.metadata != video.metadata:
+                    # keep probed source, other metadata may have changed
+                    video.metadata = {**(video.metadata or {}), **prepared.metadata}
+            video.status = models.Video.QUEUED
+            video.task_id = uuid4()
+            video.modified = now
+        queryset.model.objects.bulk_update(
+            videos, ["status", "task_id", "queue", "metadata", "modified"]
+        )
+        signatures = [
+            tasks.transcode_video.signature(
+                args=(video.pk,),
+                task_id=str(video.task_id),
+                queue=video.queue,
+                countdown=defaults.VIDEO_TRANSCODING_COUNTDOWN,
+            )
+            for video in videos
+        ]
+        if signatures:
+            task_ids = [video.task_id for video in videos]
+            transaction.on_commit(
+                lambda: publish_tasks(celery.group(signatures).apply_async, task_ids)
+            )
+    return [str(video.task_id) for video in videos]
+
+
+def promote_stale_videos() -> int:
+    """
+    Moves videos waiting too long in default queue to fast queue.
+
+    Prevents starvation of short videos which missed fast queue while fast
+    queue workers are idle. Videos with unknown cost or cost above
+    VIDEO_TRANSCODING_PROMOTE_COST are left in default queue.
+
+    Video is promoted only if it is still QUEUED with the same task id, so
+    a task already started by a worker is never sent again. Previously sent
+    tasks are revoked.
+
+    Sources with unknown cost are probed before any transaction is started,
+    probed parameters are saved to video metadata for later estimates.
+
+    :return: number of promoted videos.
+    """
+    if not defaults.VIDEO_TRANSCODING_FAST_COST:
+        return 0
+    max_wait = timedelta(seconds=defaults.VIDEO_TRANSCODING_MAX_WAIT)
+    queue = defaults.VIDEO_TRANSCODING_FAST_QUEUE
+    video_model = models.get_video_model()
+    qs = video_model.objects.filter(
+        status=models.Video.QUEUED,
+        queue=defaults.CELERY_APP_NAME,
+        modified__lt=timezone.now() - max_wait,
+    ).select_related("preset")
+    count = 0
+    for video in qs:
+        old_task_id = video.task_id
+        known = video.metadata
+        cost = scheduling.estimate_cost(video)
+        if video.metadata != known:
+            # cache probed source even if video stays in default queue
+            video_model.objects.filter(
+                pk=video.pk, status=models.Video.QUEUED, task_id=old_task_id
+            ).update(metadata=video.metadata)
+        if cost is None or cost > defaults.VIDEO_TRANSCODING_PROMOTE_COST:
+            continue
+        task_id = uuid4()
+        with transaction.atomic():
+            updated = video_model.objects.filter(
+                pk=video.pk, status=models.Video.QUEUED, task_id=old_task_id
+            ).update(
+                task_id=task_id,
+                queue=queue,
+                modified=timezone.now(),
+            )
+            if not updated:
+                # worker has already picked up the video
+                continue
+            transaction.on_commit(
+                lambda pk=video.pk, task_id=task_id: publish_tasks(
+                    lambda: tasks.transcode_video.apply_async(
+                        args=(pk,),
+                        task_id=str(task_id),
+                        countdown=defaults.VIDEO_TRANSCODING_COUNTDOWN,
+                        queue=queue,
+                    ),
+                    [task_id],
+                )
+            )
+        if old_task_id is not None:
+            tasks.transcode_video.app.control.revoke(str(old_task_id))
+        count += 1
+    return count
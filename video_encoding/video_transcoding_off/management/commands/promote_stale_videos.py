@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.video_transcoding_off import helpers
+
+
+class Command(BaseCommand):
+    help = "Move videos waiting too long in default queue to fast queue"
+
+    def handle(self, *args, **options):
+        count = helpers.promote_stale_videos()
+        self.stdout.write(self.style.SUCCESS(f"Promoted {count} videos"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from apps.video_transcoding_off import helpers, models
+
+
+class Command(BaseCommand):
+    help = "Send transcoding tasks for videos in bulk"
+
+    def add_arguments(self, parser):
+        statuses = [str(name) for _, name in models.Video.STATUS_CHOICES]
+        parser.add_argument(
+            "ids", nargs="*", type=int, help="Video ids (all videos if omitted)"
+        )
+        parser.add_argument(
+            "--status",
+            action="append",
+            choices=statuses,
+            help="Video status to queue, may be repeated (default: new)",
+        )
+
+    def handle(self, *args, **options):
+        names = {str(name): status for status, name in models.Video.STATUS_CHOICES}
+        statuses = [names[s] for s in options["status"] or ["new"]]
+        qs = models.get_video_model().objects.all()
+        if options["ids"]:
+            qs = qs.filter(pk__in=options["ids"])
+        task_ids = helpers.send_transcode_tasks(qs, statuses=statuses)
+        self.stdout.write(self.style.SUCCESS(f"Queued {len(task_ids)} videos"))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from apps.video_transcoding_off import models, profiling
+
+
+class Command(BaseCommand):
+    help = "Aggregate transcoding stages profiling by preset and source resolution"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=1000,
+            help="Number of last processed videos to aggregate",
+        )
+
+    def handle(self, *args, **options):
+        video_model = models.get_video_model()
+        qs = (
+            video_model.objects.filter(
+                status=models.Video.DONE, metadata__has_key="profiling"
+            )
+            .select_related("preset")
+            .order_by("-modified")
+        )
+        reports = []
+        for video in qs[: options["limit"]].iterator():
+            preset = video.preset.name if video.preset else "default"
+            reports.append((preset, video.metadata["profiling"]))
+
+        result = profiling.aggregate(reports)
+        for (preset, resolution), stages in sorted(result.items()):
+            self.stdout.write(self.style.SUCCESS(f"{preset} {resolution}"))
+            for name, agg in stages.items():
+                count = agg["count"]
+                self.stdout.write(
+                    f"  {name:<15} n={count:<6} "
+                    f"wall={agg['wall_time'] / count:>9.3f}s "
+                    f"cpu={agg['cpu_time'] / count:>9.3f}s "
+                    f"read={int(agg['bytes_read'] / count):>12} "
+                    f"written={int(agg['bytes_written'] / count):>12} "
+                    f"speed={agg['speed']:>6.2f}x"
+                )
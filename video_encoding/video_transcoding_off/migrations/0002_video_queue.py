@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("video_transcoding", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="video",
+            name="queue",
+            field=models.CharField(
+                blank=True, max_length=255, null=True, verbose_name="Queue"
+            ),
+        ),
+    ]
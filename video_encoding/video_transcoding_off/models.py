@@ -204,6 +204,9 @@ class Video(TimeStampedModel):
     )
     error = models.TextField(blank=True, null=True, verbose_name=_("Error"))
     task_id = models.UUIDField(blank=True, null=True, verbose_name=_("Task ID"))
+    queue = models.CharField(
+        max_length=255, blank=True, null=True, verbose_name=_("Queue")
+    )
     source = models.URLField(
         verbose_name=_("Source"),
         validators=[URLValidator(schemes=("ftp", "http", "https"))],
@@ -233,6 +236,17 @@ class Video(TimeStampedModel):
         basename = cast(UUID, self.basename)
         return defaults.VIDEO_URL.format(edge=edge.rstrip("/"), filename=basename.hex)
 
+    def format_dash_url(self, edge: str) -> str:
+        """
+        Returns a link to DASH manifest for videos packaged to CMAF.
+        """
+        if self.basename is None:
+            raise RuntimeError("Video has no files")
+        basename = cast(UUID, self.basename)
+        return defaults.VIDEO_DASH_URL.format(
+            edge=edge.rstrip("/"), filename=basename.hex
+        )
+
     def change_status(self, status: int, **fields: Any) -> None:
         """
         Changes video status.
@@ -0,0 +1,137 @@
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
+
+from apps.video_transcoding_off import models
+from apps.video_transcoding_off.transcoding import profiles
+
+PRESET_PREFETCH = (
+    "video_tracks",
+    "audio_tracks",
+    "video_profiles",
+    Prefetch(
+        "video_profiles__videoprofiletracks_set",
+        queryset=models.VideoProfileTracks.objects.select_related("track"),
+    ),
+    "audio_profiles",
+    Prefetch(
+        "audio_profiles__audioprofiletracks_set",
+        queryset=models.AudioProfileTracks.objects.select_related("track"),
+    ),
+)
+"""
+Related objects loaded for preset compilation, one query per lookup.
+"""
+
+_cache: Dict[int, Tuple[datetime, profiles.Preset]] = {}
+_lock = Lock()
+
+
+def compile_preset(preset: models.Preset) -> profiles.Preset:
+    """
+    Builds preset entity from database objects.
+
+    Loads all tracks and profiles with a fixed number of queries regardless
+    of preset size.
+
+    :param preset: preset database object.
+    :return: preset entity.
+    """
+    prefetch_related_objects([preset], *PRESET_PREFETCH)
+
+    video_tracks: List[profiles.VideoTrack] = []
+    for vt in preset.video_tracks.all():  # type: models.VideoTrack
+        kwargs = dict(**vt.params)
+        kwargs["id"] = vt.name
+        video_tracks.append(profiles.VideoTrack(**kwargs))
+
+    audio_tracks: List[profiles.AudioTrack] = []
+    for at in preset.audio_tracks.all():  # type: models.AudioTrack
+        kwargs = dict(**at.params)
+        kwargs["id"] = at.name
+        audio_tracks.append(profiles.AudioTrack(**kwargs))
+
+    video_profiles: List[profiles.VideoProfile] = []
+    for vp in preset.video_profiles.all():  # type: models.VideoProfile
+        vc = profiles.VideoCondition(**vp.condition)
+        tracks = [vpt.track.name for vpt in vp.videoprofiletracks_set.all()]
+        video_profiles.append(
+            profiles.VideoProfile(
+                condition=vc,
+                video=tracks,
+                segment_duration=vp.segment_duration.total_seconds(),
+            )
+        )
+
+    audio_profiles: List[profiles.AudioProfile] = []
+    for ap in preset.audio_profiles.all():  # type: models.AudioProfile
+        ac = profiles.AudioCondition(**ap.condition)
+        tracks = [apt.track.name for apt in ap.audioprofiletracks_set.all()]
+        audio_profiles.append(
+            profiles.AudioProfile(
+                condition=ac,
+                audio=tracks,
+            )
+        )
+
+    return profiles.Preset(
+        video_profiles=video_profiles,
+        audio_profiles=audio_profiles,
+        video=video_tracks,
+        audio=audio_tracks,
+    )
+
+
+def get_preset(preset: Optional[models.Preset]) -> profiles.Preset:
+    """
+    Returns compiled preset entity, using per-process cache.
+
+    Cache entry is valid while preset `modified` timestamp is unchanged.
+
+    :param preset: preset database object or None for default preset.
+    :return: preset entity.
+    """
+    if preset is None:
+        return profiles.DEFAULT_PRESET
+    with _lock:
+        cached = _cache.get(preset.pk)
+    if cached is not None and cached[0] == preset.modified:
+        return cached[1]
+    compiled = compile_preset(preset)
+    with _lock:
+        _cache[preset.pk] = (preset.modified, compiled)
+    return compiled
+
+
+def invalidate(preset_id: int) -> None:
+    """
+    Drops compiled preset from local cache and marks preset as modified.
+
+    Touching `modified` timestamp invalidates cached entities in other
+    worker processes, because they check it before reusing cache.
+
+    :param preset_id: preset primary key.
+    """
+    forget(preset_id)
+    models.Preset.objects.filter(pk=preset_id).update(modified=timezone.now())
+
+
+def forget(preset_id: int) -> None:
+    """
+    Drops compiled preset from local cache.
+
+    :param preset_id: preset primary key.
+    """
+    with _lock:
+        _cache.pop(preset_id, None)
+
+
+def clear() -> None:
+    """
+    Drops all compiled presets from local cache.
+    """
+    with _lock:
+        _cache.clear()
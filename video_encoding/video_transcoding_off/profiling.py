@@ -0,0 +1,195 @@
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import List, Optional, Iterator, Dict, Any, Tuple, Iterable
+
+from django.dispatch import Signal
+
+from apps.video_transcoding_off.transcoding import metadata, planner
+from apps.video_transcoding_off.utils import LoggerMixin
+
+# Sent after each processing stage with `stats` argument (StageStats)
+stage_finished = Signal()
+
+PROC_IO = "/proc/self/io"
+
+STAGE_TOTALS = (
+    "wall_time",
+    "cpu_time",
+    "bytes_read",
+    "bytes_written",
+    "media_duration",
+)
+"""
+Stage statistics summed up in profiling reports aggregation.
+"""
+
+
+@dataclass
+class StageStats:
+    """
+    Resource usage of a single processing stage.
+    """
+
+    name: str
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    media_duration: float = 0.0
+    speed: Optional[float] = None
+    segment: Optional[str] = None
+
+
+def cpu_time() -> float:
+    """
+    :return: CPU time of current process and its finished children (ffmpeg).
+    """
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def io_counters() -> Tuple[int, int]:
+    """
+    :return: bytes read and written by current process, if supported by OS.
+    """
+    try:
+        with open(PROC_IO) as f:
+            data = dict(line.split(": ", 1) for line in f.read().splitlines())
+    except (OSError, ValueError):
+        return 0, 0
+    return int(data.get("rchar", 0)), int(data.get("wchar", 0))
+
+
+class Profiler(LoggerMixin):
+    """
+    Collects processing stages statistics for a transcoding strategy.
+
+    CPU time includes finished ffmpeg processes. I/O counters include only
+    current process, so stages add ffmpeg input and output sizes explicitly.
+    Overlapping stages (i.e. pipelined split) account shared resources twice.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.stages: List[StageStats] = []
+        self.source: Dict[str, Any] = {}
+        self._lock = Lock()
+
+    def describe_source(self, meta: metadata.Metadata) -> None:
+        """
+        Stores source parameters used for profiling data aggregation.
+        """
+        video = meta.video
+        self.source = {
+            "width": video.width,
+            "height": video.height,
+            "duration": float(video.duration),
+        }
+
+    @contextmanager
+    def stage(self, name: str, segment: Optional[str] = None) -> Iterator[StageStats]:
+        """
+        Measures resources used by a stage.
+
+        :param name: stage name
+        :param segment: chunk filename for per-chunk stages
+        :return: stage statistics object to add stage-specific values to.
+        """
+        stats = StageStats(name=name, segment=segment)
+        started = time.monotonic()
+        cpu = cpu_time()
+        read, written = io_counters()
+        try:
+            yield stats
+        finally:
+            stats.wall_time = time.monotonic() - started
+            stats.cpu_time = cpu_time() - cpu
+            r, w = io_counters()
+            stats.bytes_read += r - read
+            stats.bytes_written += w - written
+            if stats.media_duration and stats.wall_time:
+                stats.speed = stats.media_duration / stats.wall_time
+            with self._lock:
+                self.stages.append(stats)
+            self.logger.info(
+                "Stage %s%s: wall %.3fs, cpu %.3fs, read %d, written %d, speed %s",
+                name,
+                f" {segment}" if segment else "",
+                stats.wall_time,
+                stats.cpu_time,
+                stats.bytes_read,
+                stats.bytes_written,
+                f"{stats.speed:.2f}x" if stats.speed else "n/a",
+            )
+            stage_finished.send(sender=self.__class__, stats=stats)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        :return: JSON-serializable profiling data.
+        """
+        with self._lock:
+            # noinspection PyTypeChecker
+            stages = [asdict(s) for s in self.stages]
+        return {"source": self.source, "stages": stages}
+
+
+def aggregate(
+    reports: Iterable[Tuple[str, Dict[str, Any]]],
+) -> Dict[Tuple[str, str], Dict[str, Dict[str, float]]]:
+    """
+    Aggregates profiling reports by preset and source resolution.
+
+    :param reports: pairs of preset name and profiling report.
+    :return: per-stage totals and speed for each (preset, resolution) key.
+    """
+    result: Dict[Tuple[str, str], Dict[str, Dict[str, float]]] = {}
+    for preset, report in reports:
+        source = report.get("source") or {}
+        resolution = f"{source.get('width', '?')}x{source.get('height', '?')}"
+        stages = result.setdefault((preset, resolution), {})
+        for s in report.get("stages", []):
+            agg = stages.setdefault(s["name"], dict.fromkeys(STAGE_TOTALS, 0))
+            agg["count"] = agg.get("count", 0) + 1
+            for f in STAGE_TOTALS:
+                agg[f] += s[f]
+    for stages in result.values():
+        for agg in stages.values():
+            agg["speed"] = (
+                agg["media_duration"] / agg["wall_time"] if agg["wall_time"] else 0.0
+            )
+    return result
+
+
+def estimate_chunk_cost(
+    reports: Iterable[Dict[str, Any]],
+) -> Optional[planner.ChunkCost]:
+    """
+    Fits chunk transcoding cost model to transcode stages of profiling reports.
+
+    :param reports: profiling reports.
+    :return: estimated cost or None if there is not enough data.
+    """
+    points = [
+        (s["media_duration"], s["wall_time"])
+        for report in reports
+        for s in report.get("stages", [])
+        if s["name"] == "transcode" and s["media_duration"]
+    ]
+    n = len(points)
+    if n < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var:
+        # all chunks have the same duration, overhead can't be separated
+        return None
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    per_second = cov / var
+    if per_second <= 0:
+        return None
+    overhead = max(0.0, mean_y - per_second * mean_x)
+    return planner.ChunkCost(overhead=overhead, per_second=per_second)
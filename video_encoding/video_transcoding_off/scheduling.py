@@ -0,0 +1,129 @@
+from dataclasses import dataclass, asdict
+from fractions import Fraction
+from typing import Optional, Dict, Any, cast
+
+from fffw.graph import meta
+
+from apps.video_transcoding_off import models, defaults, presets
+from apps.video_transcoding_off.transcoding import extract, profiles
+
+
+@dataclass(frozen=True)
+class SourceVideo:
+    """
+    Source video stream parameters checked by video profile conditions.
+    """
+
+    width: int = 0
+    height: int = 0
+    bitrate: int = 0
+    frame_rate: float = 0.0
+    dar: float = 0.0
+
+
+def _number(value: Any) -> float:
+    """
+    Parses ffprobe numbers and ratios like "30000/1001" or "16:9".
+    """
+    try:
+        ratio = Fraction(str(value).replace(":", "/"))
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+    return float(ratio)
+
+
+def probe_source(uri: str) -> Optional[Dict[str, Any]]:
+    """
+    Reads source duration and video stream parameters with ffprobe.
+
+    :param uri: source uri
+    :return: `duration` and `video` (SourceVideo fields) to keep in video
+        metadata, or None if source can't be probed.
+    """
+    extractor = extract.SourceExtractor()
+    try:
+        info = extractor.ffprobe(uri, timeout=defaults.VIDEO_PROBE_TIMEOUT)
+        result: Dict[str, Any] = {"duration": float(info.format["duration"])}
+    except (OSError, RuntimeError, KeyError, TypeError, ValueError) as e:
+        extractor.logger.warning("Can't probe %s: %s", uri, e)
+        return None
+    for s in info.streams:
+        if s.get("codec_type") != "video":
+            continue
+        width, height = int(s.get("width", 0)), int(s.get("height", 0))
+        dar = _number(s.get("display_aspect_ratio", 0))
+        result["video"] = asdict(SourceVideo(
+            width=width,
+            height=height,
+            bitrate=int(_number(s.get("bit_rate") or info.format.get("bit_rate", 0))),
+            frame_rate=_number(s.get("avg_frame_rate", 0)),
+            dar=dar or (width / height if height else 0.0),
+        ))
+        break
+    return result
+
+
+def ladder_size(preset: profiles.Preset, video: Optional[Dict[str, Any]]) -> int:
+    """
+    Counts video tracks of the profile selected for a source.
+
+    :param preset: compiled preset
+    :param video: source video parameters from `probe_source`
+    :return: number of tracks, the largest one among profiles if source
+        parameters are unknown or no profile matches.
+    """
+    if video is not None:
+        try:
+            index = preset.select_video_profile(
+                cast(meta.VideoMeta, SourceVideo(**video)))
+        except (RuntimeError, TypeError):
+            pass
+        else:
+            return max(len(preset.video_profiles[index].video), 1)
+    return max((len(vp.video) for vp in preset.video_profiles), default=1)
+
+
+def estimate_cost(video: models.Video, probe: bool = True) -> Optional[float]:
+    """
+    Estimates video transcoding cost as duration multiplied by ladder size.
+
+    Duration is known from previous processing or metadata, otherwise source
+    is probed and its duration and video parameters for ladder selection are
+    saved to `video.metadata` (not to database). Without video parameters
+    the largest ladder of the preset is assumed.
+
+    :param video: video object
+    :param probe: allow probing source, otherwise only known values are used
+    :return: estimated cost or None if video duration is unknown.
+    """
+    data = video.metadata or {}
+    duration: float
+    if video.duration is not None:
+        duration = video.duration.total_seconds()
+    elif data.get("duration"):
+        duration = float(data["duration"])
+    elif probe:
+        probed = probe_source(video.source)
+        if probed is None:
+            return None
+        data = video.metadata = {**data, **probed}
+        duration = probed["duration"]
+    else:
+        return None
+    preset = presets.get_preset(video.preset)
+    return duration * ladder_size(preset, data.get("video"))
+
+
+def select_queue(video: models.Video, probe: bool = True) -> str:
+    """
+    Routes cheap videos to fast queue, so they don't wait for long ones.
+
+    :param video: video object
+    :param probe: allow probing source for cost estimation
+    :return: celery queue name.
+    """
+    if defaults.VIDEO_TRANSCODING_FAST_COST:
+        cost = estimate_cost(video, probe=probe)
+        if cost is not None and cost <= defaults.VIDEO_TRANSCODING_FAST_COST:
+            return defaults.VIDEO_TRANSCODING_FAST_QUEUE
+    return defaults.CELERY_APP_NAME
@@ -3,10 +3,10 @@ from typing import Any
 import celery
 from django.core.signals import request_started, request_finished
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
-from apps.video_transcoding_off import helpers, models
+from apps.video_transcoding_off import helpers, models, presets
 from celery.signals import task_prerun, task_postrun
 
 
@@ -20,6 +20,62 @@ def send_transcode_task(
     transaction.on_commit(lambda: helpers.send_transcode_task(instance))
 
 
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=models.VideoTrack)
+@receiver(post_delete, sender=models.VideoTrack)
+@receiver(post_save, sender=models.AudioTrack)
+@receiver(post_delete, sender=models.AudioTrack)
+@receiver(post_save, sender=models.VideoProfile)
+@receiver(post_delete, sender=models.VideoProfile)
+@receiver(post_save, sender=models.AudioProfile)
+@receiver(post_delete, sender=models.AudioProfile)
+def invalidate_preset(sender: Any, *, instance: Any, **kw: Any) -> None:
+    """
+    Invalidates compiled preset when its track or profile changes.
+    """
+    presets.invalidate(instance.preset_id)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_save, sender=models.VideoProfileTracks)
+@receiver(post_delete, sender=models.VideoProfileTracks)
+@receiver(post_save, sender=models.AudioProfileTracks)
+@receiver(post_delete, sender=models.AudioProfileTracks)
+def invalidate_profile_preset(sender: Any, *, instance: Any, **kw: Any) -> None:
+    """
+    Invalidates compiled preset when profile tracks list changes.
+    """
+    profile_model = sender._meta.get_field("profile").related_model
+    qs = profile_model.objects.filter(pk=instance.profile_id)
+    for preset_id in qs.values_list("preset_id", flat=True):
+        presets.invalidate(preset_id)
+
+
+# noinspection PyUnusedLocal
+@receiver(m2m_changed, sender=models.VideoProfile.video.through)
+@receiver(m2m_changed, sender=models.AudioProfile.audio.through)
+def invalidate_m2m_preset(
+    sender: Any, *, instance: Any, action: str, **kw: Any
+) -> None:
+    """
+    Invalidates compiled preset on bulk profile tracks changes.
+
+    Both profiles and tracks reference preset, so instance may be any side
+    of relation.
+    """
+    if action in ("post_add", "post_remove", "post_clear"):
+        presets.invalidate(instance.preset_id)
+
+
+# noinspection PyUnusedLocal
+@receiver(post_delete, sender=models.Preset)
+def forget_preset(sender: Any, *, instance: models.Preset, **kw: Any) -> None:
+    """
+    Drops deleted preset from compiled presets cache.
+    """
+    presets.forget(instance.pk)
+
+
 # noinspection PyUnusedLocal
 @task_prerun.connect
 def send_request_started(task: celery.Task, **kwargs: Any) -> None:
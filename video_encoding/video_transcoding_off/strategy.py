@@ -1,16 +1,22 @@
 import abc
 import json
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import replace, asdict
 from types import TracebackType
-from typing import Type, List, Optional
+from typing import Type, List, Optional, Iterator, Dict, Iterable
 
-from apps.video_transcoding_off import defaults
+from fffw.graph import meta as fffw_meta
+
+from apps.video_transcoding_off import defaults, profiling
 from apps.video_transcoding_off.transcoding import (
+    analysis,
     workspace,
     profiles,
     metadata,
     transcoder,
     extract,
+    cache,
+    planner,
 )
 from apps.video_transcoding_off.utils import LoggerMixin
 
@@ -25,12 +31,14 @@ class Strategy(LoggerMixin, abc.ABC):
         source_uri: str,
         basename: str,
         preset: profiles.Preset,
+        chunk_cost: Optional[planner.ChunkCost] = None,
     ) -> None:
         """
 
         :param source_uri: URI of source file at remote storage.
         :param basename: common prefix for temporary and resulting paths.
         :param preset: preset to choose profile from.
+        :param chunk_cost: measured chunk transcoding cost for chunk planning.
 
         >>> from uuid import uuid4
         >>> s = Strategy(source_uri='http://storage.localhost:8080/source.mp4',
@@ -42,6 +50,8 @@ class Strategy(LoggerMixin, abc.ABC):
         self.source_uri = source_uri
         self.basename = basename
         self.preset = preset
+        self.chunk_cost = chunk_cost
+        self.profiler = profiling.Profiler()
 
     def __call__(self) -> metadata.Metadata:
         """
@@ -94,8 +104,8 @@ class ResumableStrategy(Strategy):
     Transcoding strategy implementation with resume support.
 
     Source file is downloaded to temporary shared webdav directory,
-    split to chunks. Chunks are transcoded on by one and merged to a
-    single file at the end. Resulting file is segmented to HLS on
+    split to chunks. Chunks are transcoded (concurrently for adaptive
+    chunks, see `chunk_workers`) and merged to a single file at the end. Resulting file is segmented to HLS on
     a result storage.
     """
 
@@ -110,14 +120,19 @@ class ResumableStrategy(Strategy):
     """
     Profile selected for current source.
     """
+    src: Optional[metadata.Metadata] = None
+    """
+    Source metadata, used to describe chunks without probing.
+    """
 
     def __init__(
         self,
         source_uri: str,
         basename: str,
         preset: profiles.Preset,
+        chunk_cost: Optional[planner.ChunkCost] = None,
     ) -> None:
-        super().__init__(source_uri, basename, preset)
+        super().__init__(source_uri, basename, preset, chunk_cost)
 
         root = defaults.VIDEO_TEMP_URI.rstrip("/")
         base = f"{root}/{basename}/"
@@ -127,6 +142,14 @@ class ResumableStrategy(Strategy):
         base = f"{root}/{basename}/"
         self.store = workspace.init(base)
 
+        self.segments: Dict[str, fffw_meta.VideoMeta] = {}
+        self.cache: Optional[cache.SegmentCache] = None
+        if defaults.VIDEO_SEGMENT_CACHE_SIZE:
+            shared = workspace.init(defaults.VIDEO_TEMP_URI)
+            self.cache = cache.SegmentCache(
+                shared, max_size=defaults.VIDEO_SEGMENT_CACHE_SIZE
+            )
+
     @property
     def source_metadata(self) -> workspace.File:
         """
@@ -141,6 +164,13 @@ class ResumableStrategy(Strategy):
         """
         return self.sources.file("split.json")
 
+    @property
+    def chunks_file(self) -> workspace.File:
+        """
+        :return: A json file with planned split chunk duration.
+        """
+        return self.sources.file("chunks.json")
+
     @property
     def video_playlist_file(self) -> workspace.File:
         """
@@ -192,6 +222,8 @@ class ResumableStrategy(Strategy):
         self.sources = self.ws.ensure_collection("sources")
         self.results = self.ws.ensure_collection("results")
         self.store.create_collection(self.store.root)
+        if self.cache is not None:
+            self.cache.initialize()
 
     def cleanup(self, is_error: bool) -> None:
         if is_error:
@@ -207,14 +239,37 @@ class ResumableStrategy(Strategy):
 
         segments = self.get_segment_list()
 
+        result_meta = self.process_segments(segments)
+
+        return self.merge(segments, meta=result_meta)
+
+    @property
+    def chunk_workers(self) -> int:
+        """
+        :return: number of chunks transcoded concurrently; adaptive chunks
+            are planned for VIDEO_CHUNK_PARALLELISM of them.
+        """
+        if not defaults.VIDEO_ADAPTIVE_CHUNKS:
+            return 1
+        return max(defaults.VIDEO_CHUNK_PARALLELISM, 1)
+
+    def process_segments(self, segments: Iterable[str]) -> metadata.Metadata:
+        """
+        Transcodes chunks, up to `chunk_workers` at once.
+
+        :param segments: chunk filenames, may be yielded while source is
+            being split.
+        :return: resulting file metadata, chunks merged in order.
+        """
+        with ThreadPoolExecutor(max_workers=self.chunk_workers) as pool:
+            futures = [pool.submit(self.process_segment, fn) for fn in segments]
+
         result_meta: Optional[metadata.Metadata] = None
-        for fn in segments:
-            segment_meta = self.process_segment(fn)
-            result_meta = self.merge_metadata(result_meta, segment_meta)
+        for future in futures:
+            result_meta = self.merge_metadata(result_meta, future.result())
         if result_meta is None:  # pragma: no cover
             raise RuntimeError("no segments")
-
-        return self.merge(segments, meta=result_meta)
+        return result_meta
 
     @staticmethod
     def merge_metadata(
@@ -262,9 +317,15 @@ class ResumableStrategy(Strategy):
             self.logger.debug("Using previous metadata %s", self.source_metadata)
             content = self.ws.read(self.source_metadata)
             data = json.loads(content)
-            return metadata.Metadata.from_native(data)
+            meta = metadata.Metadata.from_native(data)
+            self.profiler.describe_source(meta)
+            self.src = meta
+            return meta
 
-        meta = self._analyze_source()
+        with self.profiler.stage("analyze"):
+            meta = self._analyze_source()
+        self.profiler.describe_source(meta)
+        self.src = meta
 
         # noinspection PyTypeChecker
         content = json.dumps(asdict(meta))
@@ -293,7 +354,8 @@ class ResumableStrategy(Strategy):
             data = json.loads(content)
             return profiles.Profile.from_native(data)
 
-        profile = self._select_profile(src)
+        with self.profiler.stage("select_profile"):
+            profile = self._select_profile(src)
 
         # noinspection PyTypeChecker
         content = json.dumps(asdict(profile))
@@ -326,12 +388,21 @@ class ResumableStrategy(Strategy):
             meta = metadata.Metadata.from_native(data)
             return meta
 
-        meta = self._split(src)
+        meta = self._profiled_split(src)
         # noinspection PyTypeChecker
         content = json.dumps(asdict(meta))
         self.ws.write(f, content)
         return meta
 
+    def _profiled_split(self, src: metadata.Metadata) -> metadata.Metadata:
+        """
+        Splits source file recording split stage statistics.
+        """
+        with self.profiler.stage("split") as stats:
+            meta = self._split(src)
+            stats.media_duration = float(meta.video.duration)
+        return meta
+
     def _split(self, src: metadata.Metadata) -> metadata.Metadata:
         """
         Downloads source file and split it to chunks at shared webdav.
@@ -345,9 +416,42 @@ class ResumableStrategy(Strategy):
             source_video_playlist=self.video_playlist_file.basename,
             source_video_chunk=self.video_chunk_file.basename,
             source_audio=self.audio_file.basename,
+            chunk_duration=self.plan_chunk_duration(src),
         )
         return split()
 
+    def plan_chunk_duration(self, src: metadata.Metadata) -> Optional[float]:
+        """
+        Selects split chunk duration for source if adaptive chunks are enabled.
+
+        Planned duration is stored in sources collection before split, so
+        a resumed split produces the same chunks as ones already transcoded.
+
+        :param src: source metadata.
+        :return: chunk duration or None for default duration.
+        """
+        if not defaults.VIDEO_ADAPTIVE_CHUNKS:
+            return None
+        if self.ws.exists(self.chunks_file):
+            self.logger.debug("Using previous chunk plan %s", self.chunks_file)
+            content = self.ws.read(self.chunks_file)
+            return float(json.loads(content)["chunk_duration"])
+        chunk_planner = planner.ChunkPlanner(
+            parallelism=defaults.VIDEO_CHUNK_PARALLELISM,
+            min_duration=defaults.VIDEO_CHUNK_MIN_DURATION,
+            max_duration=defaults.VIDEO_CHUNK_MAX_DURATION,
+            max_overhead=defaults.VIDEO_CHUNK_MAX_OVERHEAD,
+        )
+        duration = chunk_planner.plan(
+            float(src.video.duration),
+            self.profile.container.segment_duration,
+            self.chunk_cost,
+        )
+        self.logger.debug("Planned chunk duration %s for %s", duration, src.uri)
+        content = json.dumps({"chunk_duration": duration})
+        self.ws.write(self.chunks_file, content)
+        return duration
+
     def get_segment_list(self) -> List[str]:
         """
         Parses a list of segment names from a M3U8 playlist.
@@ -377,13 +481,49 @@ class ResumableStrategy(Strategy):
             meta = metadata.Metadata.from_native(data)
             return meta
 
-        meta = self._process_segment(filename)
+        with self.profiler.stage("transcode", segment=filename) as stats:
+            if self.cache is None:
+                meta = self._process_segment(filename)
+            else:
+                meta = self._process_cached_segment(filename, self.cache)
+            # ffmpeg I/O is not accounted by profiler, so add chunk sizes
+            stats.bytes_read += self.ws.size(self.sources.file(filename))
+            stats.bytes_written += self.ws.size(self.results.file(filename))
+            stats.media_duration = float(meta.video.duration)
 
         # noinspection PyTypeChecker
         content = json.dumps(asdict(meta))
         self.ws.write(f, content)
         return meta
 
+    def _process_cached_segment(
+        self, filename: str, segment_cache: cache.SegmentCache
+    ) -> metadata.Metadata:
+        """
+        Reuses a chunk transcoded earlier with the same profile or transcodes
+        it and stores result to segment cache.
+
+        :param filename: chunk filename
+        :param segment_cache: transcoded chunks cache
+        :return: resulting chunk metadata.
+        """
+        src = self.sources.file(filename)
+        dst = self.results.file(filename)
+        key = segment_cache.key(
+            self.ws.digest(src), segment_cache.profile_digest(self.profile)
+        )
+        meta = segment_cache.get(key)
+        if meta is not None:
+            self.logger.debug("Reusing cached %s for %s", key, filename)
+            dst_uri = self.ws.get_absolute_uri(dst)
+            segment_cache.ws.copy(segment_cache.result_file(key), dst_uri)
+            return replace(meta, uri=dst_uri.geturl())
+
+        meta = self._process_segment(filename)
+        self.ws.copy(dst, segment_cache.allocate(key))
+        segment_cache.put(key, meta)
+        return meta
+
     def _process_segment(self, filename: str) -> metadata.Metadata:
         """
         Runs transcoding process on a source chunk.
@@ -410,7 +550,8 @@ class ResumableStrategy(Strategy):
         meta: metadata.Metadata,
     ) -> metadata.Metadata:
         """
-        Combines resulting chunks to a single output and segments it to HLS.
+        Combines resulting chunks to a single output and segments it to HLS
+        (or to CMAF with HLS and DASH manifests, see VIDEO_PACKAGING).
         :param segments: list of chunk filenames.
         :param meta: resulting file metadata.
         :return: resulting file metadata.
@@ -419,14 +560,20 @@ class ResumableStrategy(Strategy):
         dst = self.manifest_uri
         self.logger.debug("Segmenting %s to %s", src, dst)
         audio = self.ws.get_absolute_uri(self.audio_file).geturl()
-        segment = transcoder.Segmentor(
+        if defaults.VIDEO_PACKAGING == "cmaf":
+            segmentor_class: Type[transcoder.Segmentor] = transcoder.CMAFSegmentor
+        else:
+            segmentor_class = transcoder.Segmentor
+        segment = segmentor_class(
             video_source=src,
             audio_source=audio,
             dst=dst,
             profile=self.profile,
             meta=meta,
         )
-        result = segment()
+        with self.profiler.stage("merge") as stats:
+            result = segment()
+            stats.media_duration = float(result.video.duration)
         return result
 
     def write_concat_file(self, segments: List[str]) -> str:
@@ -443,6 +590,98 @@ class ResumableStrategy(Strategy):
         return self.ws.get_absolute_uri(f).geturl()
 
     def get_segment_meta(self, src: workspace.File) -> metadata.Metadata:
+        """
+        Describes source chunk using split segment list timings.
+
+        Falls back to probing the chunk if segment list lacks its timings.
+        :param src: source chunk file.
+        :return: source chunk metadata.
+        """
         segment_uri = self.ws.get_absolute_uri(src).geturl()
+        if self.src is not None and src.basename not in self.segments:
+            # playlist grows while source is being split, so re-read it
+            content = self.ws.read(self.video_playlist_file)
+            analyzer = analysis.SegmentListAnalyzer(content, self.src.video)
+            self.segments = analyzer.analyze()
+        video = self.segments.get(src.basename)
+        if video is not None:
+            return metadata.Metadata(uri=segment_uri, videos=[video], audios=[])
+        self.logger.debug("No timings for %s in segment list", src.basename)
         segment = extract.VideoSegmentExtractor().get_meta_data(segment_uri)
         return segment
+
+
+class PipelinedStrategy(ResumableStrategy):
+    """
+    Resumable strategy that transcodes chunks while source is being split.
+
+    Splitter runs in a background thread, and each chunk is transcoded as
+    soon as it appears in the growing split playlist. Segment muxer adds
+    chunks to the playlist only after they are closed, so download, split
+    and transcode steps overlap.
+    """
+
+    def process(self) -> metadata.Metadata:
+        src = self.analyze_source()
+        self.profile = self.select_profile(src)
+
+        segments: List[str] = []
+
+        def ready_segments() -> Iterator[str]:
+            for fn in self.split_segments(src):
+                segments.append(fn)
+                yield fn
+
+        result_meta = self.process_segments(ready_segments())
+
+        return self.merge(segments, meta=result_meta)
+
+    def split_segments(self, src: metadata.Metadata) -> Iterator[str]:
+        """
+        Splits source file and yields chunk filenames as they become ready.
+
+        :param src: remote source metadata.
+        :return: chunk filenames iterator.
+        """
+        if self.ws.exists(self.split_metadata):
+            self.logger.debug("Source already split to %s", self.split_metadata)
+            yield from self.get_segment_list()
+            return
+
+        seen = 0
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            future = pool.submit(self._profiled_split, src)
+            while True:
+                # playlist is complete only if it is read after split finish
+                done = future.done()
+                segments = self.get_closed_segments()
+                yield from segments[seen:]
+                seen = len(segments)
+                if done:
+                    break
+                wait([future], timeout=defaults.VIDEO_SPLIT_POLL_INTERVAL)
+
+        meta = future.result()
+        # noinspection PyTypeChecker
+        content = json.dumps(asdict(meta))
+        self.ws.write(self.split_metadata, content)
+
+    def get_closed_segments(self) -> List[str]:
+        """
+        Parses a list of closed segment names from a growing M3U8 playlist.
+
+        Playlist may be read while it is being rewritten, so incomplete
+        trailing line is skipped.
+
+        :return: a list of chunk filenames.
+        """
+        if not self.ws.exists(self.video_playlist_file):
+            return []
+        content = self.ws.read(self.video_playlist_file)
+        segments = []
+        for line in content.split("\n")[:-1]:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            segments.append(line)
+        return segments
@@ -1,7 +1,6 @@
 import dataclasses
-import time
 from datetime import timedelta, datetime
-from typing import Optional, List, Iterable, Any, Dict, Union
+from typing import Optional, Iterable, Any, Dict, Union, Type
 from uuid import UUID, uuid4
 
 import celery
@@ -10,9 +9,9 @@ from django.db import close_old_connections
 from django.db.transaction import atomic
 from django.db.utils import OperationalError
 
-from apps.video_transcoding_off import models, strategy, defaults
+from apps.video_transcoding_off import models, strategy, defaults, presets, profiling
 from apps.video_transcoding_off.celery import app
-from apps.video_transcoding_off.transcoding import profiles
+from apps.video_transcoding_off.transcoding import profiles, planner
 from apps.video_transcoding_off.utils import LoggerMixin
 
 Video = models.get_video_model()
@@ -65,6 +64,8 @@ class TranscodeVideo(LoggerMixin, celery.Task):
         status = Video.DONE
         error = meta = duration = None
         video = self.lock_video(video_id)
+        if video is None:
+            return None
         try:
             meta = self.process_video(video)
             duration = timedelta(seconds=meta["duration"])
@@ -116,22 +117,32 @@ class TranscodeVideo(LoggerMixin, celery.Task):
         return video
 
     @atomic
-    def lock_video(self, video_id: int) -> models.Video:
+    def lock_video(self, video_id: int) -> Optional[models.Video]:
         """
         Gets video in QUEUED status from DB and changes status to PROCESS.
 
         :param video_id: Video primary key
-        :returns: Video object
-        :raises Retry: in case of unexpected video status or task_id
+        :returns: Video object or None if task is outdated
+        :raises Retry: in case video is missing or locked
         """
-        if defaults.VIDEO_TRANSCODING_WAIT:  # pragma: no cover
-            # Handle database replication and transaction commit related delay
-            time.sleep(defaults.VIDEO_TRANSCODING_WAIT)
         try:
             video = self.select_for_update(video_id, Video.QUEUED)
-        except (Video.DoesNotExist, ValueError) as e:
-            # if video is locked or task_id is not equal to current task, retry.
-            raise self.retry(exc=e)
+        except Video.DoesNotExist as e:
+            # Task is sent after commit, so video may be invisible only
+            # because of replication lag or while locked by another task.
+            retries = self.request.retries
+            countdown = min(
+                defaults.VIDEO_LOCK_RETRY_DELAY * 2**retries,
+                defaults.VIDEO_LOCK_RETRY_MAX_DELAY,
+            )
+            raise self.retry(
+                exc=e, countdown=countdown, max_retries=defaults.VIDEO_LOCK_MAX_RETRIES
+            )
+        except ValueError:
+            # Task id and status are saved before task is sent, so video has
+            # been re-queued or processed by another task.
+            self.logger.warning("Skip outdated task for video %s", video_id)
+            return None
         if video.basename is None:
             video.basename = uuid4()
         video.change_status(Video.PROCESS, basename=video.basename)
@@ -177,6 +188,7 @@ class TranscodeVideo(LoggerMixin, celery.Task):
             source_uri=video.source,
             basename=basename.hex,
             preset=preset,
+            chunk_cost=self.get_chunk_cost(video.preset),
         )
         output_meta = s()
 
@@ -192,71 +204,52 @@ class TranscodeVideo(LoggerMixin, celery.Task):
             else:
                 duration = min(duration, stream["duration"])
         data["duration"] = duration
+        data["profiling"] = s.profiler.report()
 
         return data
 
     @staticmethod
     def init_strategy(
-        source_uri: str, basename: str, preset: profiles.Preset
+        source_uri: str,
+        basename: str,
+        preset: profiles.Preset,
+        chunk_cost: Optional[planner.ChunkCost] = None,
     ) -> strategy.Strategy:
-        return strategy.ResumableStrategy(
+        if defaults.VIDEO_PIPELINED_SPLIT:
+            cls: Type[strategy.Strategy] = strategy.PipelinedStrategy
+        else:
+            cls = strategy.ResumableStrategy
+        return cls(
             source_uri=source_uri,
             basename=basename,
             preset=preset,
+            chunk_cost=chunk_cost,
         )
 
     @staticmethod
-    def init_preset(preset: Optional[models.Preset]) -> profiles.Preset:
+    def get_chunk_cost(
+        preset: Optional[models.Preset],
+    ) -> Optional[planner.ChunkCost]:
         """
-        Initializes preset entity from database objects.
+        Estimates chunk transcoding cost from last processed videos profiling.
         """
-        if preset is None:
-            return profiles.DEFAULT_PRESET
-        video_tracks: List[profiles.VideoTrack] = []
-        for vt in preset.video_tracks.all():  # type: models.VideoTrack
-            kwargs = dict(**vt.params)
-            kwargs["id"] = vt.name
-            video_tracks.append(profiles.VideoTrack(**kwargs))
-
-        audio_tracks: List[profiles.AudioTrack] = []
-        for at in preset.audio_tracks.all():  # type: models.AudioTrack
-            kwargs = dict(**at.params)
-            kwargs["id"] = at.name
-            audio_tracks.append(profiles.AudioTrack(**kwargs))
-
-        video_profiles: List[profiles.VideoProfile] = []
-        for vp in preset.video_profiles.all():  # type: models.VideoProfile
-            vc = profiles.VideoCondition(**vp.condition)
-
-            vqs = vp.videoprofiletracks_set.select_related("track")
-            tracks = [vpt.track.name for vpt in vqs]
-            video_profiles.append(
-                profiles.VideoProfile(
-                    condition=vc,
-                    video=tracks,
-                    segment_duration=vp.segment_duration.total_seconds(),
-                )
-            )
+        if not defaults.VIDEO_ADAPTIVE_CHUNKS:
+            return None
+        qs = Video.objects.filter(
+            status=Video.DONE, preset=preset, metadata__has_key="profiling"
+        ).order_by("-modified")
+        rows = qs.values_list("metadata", flat=True)
+        reports = [m["profiling"] for m in rows[: defaults.VIDEO_CHUNK_COST_SAMPLES]]
+        return profiling.estimate_chunk_cost(reports)
 
-        audio_profiles: List[profiles.AudioProfile] = []
-        for ap in preset.audio_profiles.all():  # type: models.AudioProfile
-            ac = profiles.AudioCondition(**ap.condition)
-
-            aqs = ap.audioprofiletracks_set.select_related("track")
-            tracks = [apt.track.name for apt in aqs]
-            audio_profiles.append(
-                profiles.AudioProfile(
-                    condition=ac,
-                    audio=tracks,
-                )
-            )
+    @staticmethod
+    def init_preset(preset: Optional[models.Preset]) -> profiles.Preset:
+        """
+        Initializes preset entity from database objects.
 
-        return profiles.Preset(
-            video_profiles=video_profiles,
-            audio_profiles=audio_profiles,
-            video=video_tracks,
-            audio=audio_tracks,
-        )
+        Compiled presets are cached per worker process until preset changes.
+        """
+        return presets.get_preset(preset)
 
 
 transcode_video: TranscodeVideo = app.register_task(TranscodeVideo())  # type: ignore
@@ -1,3 +1,4 @@
+import hashlib
 from unittest import mock
 from urllib.parse import ParseResult, urlparse, urlunparse
 from uuid import uuid4
@@ -155,6 +156,16 @@ class MemoryWorkspace:
             t = t[p]
         t[f.parts[-1]] = content
 
+    def copy(self, f: workspace.File, dst: ParseResult) -> None:
+        content = self.read(f)
+        self.write(workspace.File(*dst.path.split("/")), content)
+
+    def size(self, f: workspace.File) -> int:
+        return len(self.read(f))
+
+    def digest(self, f: workspace.File) -> str:
+        return hashlib.sha256(self.read(f).encode()).hexdigest()
+
     @staticmethod
     def get_absolute_uri(r: workspace.Resource) -> ParseResult:
         path = "/".join(r.parts)
@@ -164,3 +164,47 @@ class FFprobeHLSAnalyzerTestCase(TestCase):
         streams = self.analyzer.analyze()
 
         self.assertEqual(len(streams), 0)
+
+
+class SegmentListAnalyzerTestCase(base.MetadataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.video = self.make_meta(30.0).video
+
+    def test_analyze(self):
+        content = "\n".join(
+            [
+                "#EXTM3U",
+                "#EXT-X-VERSION:3",
+                "#EXT-X-TARGETDURATION:5",
+                "#EXTINF:4.800000,",
+                "s1.mkv",
+                "#EXTINF:2.400000,",
+                "s2.mkv",
+                "#EXT-X-ENDLIST",
+                "",
+            ]
+        )
+
+        segments = analysis.SegmentListAnalyzer(content, self.video).analyze()
+
+        self.assertEqual(list(segments), ["s1.mkv", "s2.mkv"])
+        s1, s2 = segments["s1.mkv"], segments["s2.mkv"]
+        self.assertEqual(float(s1.start), 0.0)
+        self.assertEqual(float(s1.duration), 4.8)
+        self.assertEqual(s1.frames, 144)
+        self.assertEqual(float(s2.start), 4.8)
+        self.assertEqual(float(s2.duration), 2.4)
+        self.assertEqual(float(s2.scenes[0].position), 4.8)
+        self.assertEqual(s2.width, self.video.width)
+        self.assertEqual(s2.bitrate, self.video.bitrate)
+
+    def test_analyze_missing_timings(self):
+        """Chunks after one without timings are left for probing."""
+        content = "\n".join(
+            ["#EXTINF:4.8,", "s1.mkv", "s2.mkv", "#EXTINF:4.8,", "s3.mkv"]
+        )
+
+        segments = analysis.SegmentListAnalyzer(content, self.video).analyze()
+
+        self.assertEqual(list(segments), ["s1.mkv"])
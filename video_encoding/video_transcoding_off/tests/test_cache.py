@@ -0,0 +1,64 @@
+from dataclasses import replace
+from unittest import mock
+
+from django.test import TestCase
+
+from apps.video_transcoding_off.tests import base
+from apps.video_transcoding_off.transcoding import cache
+
+
+class SegmentCacheTestCase(base.ProfileMixin, base.MetadataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ws = base.MemoryWorkspace("tmp")
+        self.cache = cache.SegmentCache(self.ws, max_size=10)
+        self.cache.initialize()
+
+    def store(self, key: str, content: str) -> None:
+        uri = self.cache.allocate(key)
+        self.ws.write(self.cache.result_file(key), content)
+        self.assertEqual(uri.path, f"tmp/segment-cache/{key}/result")
+        self.cache.put(key, self.make_meta(30.0, uri=key))
+
+    def test_profile_digest(self):
+        profile = self.default_profile()
+        digest = self.cache.profile_digest(profile)
+        self.assertEqual(digest, self.cache.profile_digest(self.default_profile()))
+        container = replace(profile.container, segment_duration=2.0)
+        changed = replace(profile, container=container)
+        self.assertNotEqual(digest, self.cache.profile_digest(changed))
+
+    def test_key(self):
+        key = self.cache.key("chunk", "profile")
+        self.assertEqual(key, self.cache.key("chunk", "profile"))
+        self.assertNotEqual(key, self.cache.key("chunk", "another"))
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_put_get(self):
+        self.store("key", "12345")
+
+        meta = self.cache.get("key")
+
+        self.assertEqual(meta, self.make_meta(30.0, uri="key"))
+        self.assertEqual(self.cache.read_index()["key"][0], 5)
+
+    def test_evict_least_recently_used(self):
+        with mock.patch("time.time", side_effect=range(100)):
+            self.store("first", "1234")
+            self.store("second", "1234")
+            # first entry becomes most recently used
+            self.cache.get("first")
+            self.store("third", "1234")
+
+        self.assertIsNone(self.cache.get("second"))
+        self.assertIsNotNone(self.cache.get("first"))
+        self.assertIsNotNone(self.cache.get("third"))
+        self.assertEqual(set(self.cache.read_index()), {"first", "third"})
+
+    def test_keep_oversized_entry(self):
+        """Just stored entry is not evicted even if it exceeds limit."""
+        self.store("key", "x" * 100)
+
+        self.assertIsNotNone(self.cache.get("key"))
@@ -1,9 +1,13 @@
+from datetime import timedelta
+from io import StringIO
 from unittest import mock
-from uuid import uuid4, UUID
+from uuid import uuid4
 
 from celery.result import AsyncResult
+from django.core.management import call_command
+from django.db import connection
 
-from apps.video_transcoding_off import models
+from apps.video_transcoding_off import defaults, models, helpers, presets, scheduling
 from apps.video_transcoding_off.tests.base import BaseTestCase
 
 
@@ -31,10 +35,151 @@ class VideoModelTestCase(BaseTestCase):
 
     def test_send_transcode_task(self):
         """When new video is created, a transcode task is sent."""
-        v = models.Video.objects.create(source="http://ya.ru/1.mp4")
+        with mock.patch.object(defaults, "VIDEO_TRANSCODING_FAST_COST", 600.0), \
+                mock.patch.object(scheduling, "probe_source") as probe_mock:
+            v = models.Video.objects.create(source="http://ya.ru/1.mp4")
+        # source is not probed in request, unknown cost goes to default queue
+        probe_mock.assert_not_called()
         self.on_commit_mock.assert_called()
-        self.apply_async_mock.assert_called_once_with(args=(v.id,), countdown=10)
         v.refresh_from_db()
+        self.apply_async_mock.assert_called_once_with(
+            args=(v.id,), task_id=str(v.task_id), countdown=0, queue="video_transcoding"
+        )
         self.assertEqual(v.status, models.Video.QUEUED)
-        result = self.apply_async_mock.return_value
-        self.assertEqual(v.task_id, UUID(result.task_id))
+        self.assertEqual(v.queue, "video_transcoding")
+
+
+    def test_send_transcode_task_broker_error(self):
+        """Video is not left queued when task can't be sent."""
+        self.apply_async_mock.side_effect = ConnectionError("broker is down")
+
+        v = models.Video.objects.create(source="http://ya.ru/1.mp4")
+
+        v.refresh_from_db()
+        self.assertEqual(v.status, models.Video.CREATED)
+        self.assertIsNone(v.task_id)
+
+
+class SendTranscodeTasksTestCase(BaseTestCase):
+    """Bulk transcoding tasks submission tests."""
+
+    def setUp(self):
+        super().setUp()
+        with mock.patch("django.db.transaction.on_commit"):
+            self.videos = [
+                models.Video.objects.create(source=f"http://ya.ru/{i}.mp4")
+                for i in range(3)
+            ]
+        self.error = self.videos[2]
+        self.error.change_status(models.Video.ERROR)
+
+    def test_send_transcode_tasks(self):
+        qs = models.Video.objects.all()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # select for queue selection, savepoint, select for update,
+            # single update, savepoint release
+            with self.assertNumQueries(5):
+                task_ids = helpers.send_transcode_tasks(qs)
+
+        self.assertEqual(len(task_ids), 2)
+        calls = self.apply_async_mock.call_args_list
+        self.assertEqual(len(calls), 2)
+        for video, task_id, call in zip(self.videos, task_ids, calls):
+            video.refresh_from_db()
+            self.assertEqual(video.status, models.Video.QUEUED)
+            self.assertEqual(str(video.task_id), task_id)
+            self.assertEqual(video.queue, "video_transcoding")
+            self.assertEqual(call.args[0], (video.pk,))
+            self.assertEqual(call.kwargs["task_id"], task_id)
+            self.assertEqual(call.kwargs["queue"], "video_transcoding")
+            self.assertEqual(call.kwargs["countdown"], 0)
+        self.error.refresh_from_db()
+        self.assertEqual(self.error.status, models.Video.ERROR)
+
+    def test_send_transcode_tasks_fast_queue(self):
+        """Queue selection doesn't query presets per video."""
+        preset = models.Preset.objects.create(name="preset")
+        # compile preset before counting queries
+        presets.get_preset(preset)
+        models.Video.objects.update(preset=preset, duration=timedelta(seconds=60))
+        qs = models.Video.objects.all()
+
+        with mock.patch.object(defaults, "VIDEO_TRANSCODING_FAST_COST", 600.0):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertNumQueries(5):
+                    task_ids = helpers.send_transcode_tasks(qs)
+
+        self.assertEqual(len(task_ids), 2)
+        for call in self.apply_async_mock.call_args_list:
+            self.assertEqual(
+                call.kwargs["queue"], defaults.VIDEO_TRANSCODING_FAST_QUEUE
+            )
+
+    def test_send_transcode_tasks_probe(self):
+        """Sources are probed before rows are locked, probes are kept."""
+        qs = models.Video.objects.all()
+        savepoints = []
+
+        def probe(uri):
+            savepoints.append(len(connection.savepoint_ids))
+            return {"duration": 30.0}
+
+        outer = len(connection.savepoint_ids)
+        with mock.patch.object(defaults, "VIDEO_TRANSCODING_FAST_COST", 600.0), \
+                mock.patch.object(scheduling, "probe_source", side_effect=probe):
+            with self.captureOnCommitCallbacks(execute=True):
+                task_ids = helpers.send_transcode_tasks(qs)
+
+        self.assertEqual(len(task_ids), 2)
+        self.assertEqual(savepoints, [outer, outer])
+        for video in self.videos[:2]:
+            video.refresh_from_db()
+            self.assertEqual(video.queue, defaults.VIDEO_TRANSCODING_FAST_QUEUE)
+            self.assertEqual(video.metadata, {"duration": 30.0})
+
+    def test_send_transcode_tasks_broker_error(self):
+        qs = models.Video.objects.all()
+        self.apply_async_mock.side_effect = ConnectionError("broker is down")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            helpers.send_transcode_tasks(qs)
+
+        for video in self.videos[:2]:
+            video.refresh_from_db()
+            self.assertEqual(video.status, models.Video.CREATED)
+            self.assertIsNone(video.task_id)
+        self.error.refresh_from_db()
+        self.assertEqual(self.error.status, models.Video.ERROR)
+
+    def test_send_transcode_tasks_errors(self):
+        """Errored videos are re-queued on demand."""
+        qs = models.Video.objects.all()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task_ids = helpers.send_transcode_tasks(qs, statuses=[models.Video.ERROR])
+
+        self.assertEqual(len(task_ids), 1)
+        self.error.refresh_from_db()
+        self.assertEqual(self.error.status, models.Video.QUEUED)
+
+    def test_send_transcode_tasks_empty(self):
+        qs = models.Video.objects.none()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(helpers.send_transcode_tasks(qs), [])
+
+        self.assertEqual(callbacks, [])
+        self.apply_async_mock.assert_not_called()
+
+    def test_command(self):
+        out = StringIO()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                "transcode_videos", str(self.error.pk), status=["error"], stdout=out
+            )
+
+        self.assertEqual(out.getvalue().strip(), "Queued 1 videos")
+        self.error.refresh_from_db()
+        self.assertEqual(self.error.status, models.Video.QUEUED)
@@ -0,0 +1,61 @@
+from dataclasses import replace
+from unittest import TestCase
+
+from apps.video_transcoding_off.transcoding import planner, profiles
+
+
+class ChunkPlannerTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.planner = planner.ChunkPlanner(
+            parallelism=8,
+            min_duration=30.0,
+            max_duration=600.0,
+            max_overhead=0.05,
+        )
+        self.segment = profiles.SEGMENT_SIZE
+
+    def assertAligned(self, duration: float) -> None:
+        steps = duration / self.segment
+        self.assertAlmostEqual(steps, round(steps))
+
+    def test_plan_long_source(self):
+        """Long source chunks are limited by max duration."""
+        duration = self.planner.plan(3 * 3600.0, self.segment)
+
+        self.assertEqual(duration, 600.0)
+        self.assertAligned(duration)
+
+    def test_plan_parallelism(self):
+        duration = self.planner.plan(20 * 60.0, self.segment)
+
+        self.assertEqual(duration, 153.6)
+        self.assertAligned(duration)
+
+    def test_plan_short_source(self):
+        """Trailer is split to chunks not shorter than min duration."""
+        duration = self.planner.plan(90.0, self.segment)
+
+        self.assertEqual(duration, 33.6)
+        self.assertAligned(duration)
+
+    def test_plan_tiny_source(self):
+        """Chunk is at least one segment long."""
+        chunk_planner = replace(self.planner, min_duration=0.0)
+        self.assertEqual(chunk_planner.plan(1.0, 4.8), 4.8)
+
+    def test_plan_overhead(self):
+        """Chunks are enlarged to keep per-chunk overhead share low."""
+        # 2 seconds overhead, transcoding at 2x speed: 19 * 2 * 2 = 76 sec
+        cost = planner.ChunkCost(overhead=2.0, per_second=0.5)
+
+        self.assertAlmostEqual(self.planner.get_min_duration(cost), 76.0)
+        duration = self.planner.plan(90.0, self.segment, cost)
+
+        self.assertEqual(duration, 76.8)
+        self.assertAligned(duration)
+
+    def test_plan_without_cost(self):
+        self.assertEqual(self.planner.get_min_duration(None), 30.0)
+        cost = planner.ChunkCost(overhead=2.0, per_second=0.0)
+        self.assertEqual(self.planner.get_min_duration(cost), 30.0)
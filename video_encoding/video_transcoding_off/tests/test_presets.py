@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+from django.test import TestCase
+
+from apps.video_transcoding_off import models, presets
+from apps.video_transcoding_off.transcoding import profiles
+
+
+class PresetCacheTestCase(TestCase):
+    """Tests compiled presets cache."""
+
+    def setUp(self):
+        super().setUp()
+        presets.clear()
+        self.preset = models.Preset.objects.create(name="preset")
+        self.vt = models.VideoTrack.objects.create(
+            name="v",
+            preset=self.preset,
+            params={
+                "codec": "libx264",
+                "constant_rate_factor": 23,
+                "preset": "slow",
+                "max_rate": 1_500_000,
+                "buf_size": 3_000_000,
+                "profile": "main",
+                "pix_fmt": "yuv420p",
+                "width": 1920,
+                "height": 1080,
+                "frame_rate": 30.0,
+                "gop_size": 30,
+                "force_key_frames": "formula",
+            },
+        )
+        self.at = models.AudioTrack.objects.create(
+            name="a",
+            preset=self.preset,
+            params={
+                "codec": "libfdk_aac",
+                "bitrate": 128_000,
+                "channels": 2,
+                "sample_rate": 44100,
+            },
+        )
+        for i in range(3):
+            vp = models.VideoProfile.objects.create(
+                name=f"vp{i}",
+                preset=self.preset,
+                order_number=i,
+                segment_duration=timedelta(seconds=1.0),
+                condition={"min_width": 3 - i},
+            )
+            vp.videoprofiletracks_set.create(track=self.vt)
+            ap = models.AudioProfile.objects.create(
+                name=f"ap{i}",
+                preset=self.preset,
+                order_number=i,
+                condition={"min_bitrate": 3 - i},
+            )
+            ap.audioprofiletracks_set.create(track=self.at)
+
+    def tearDown(self):
+        super().tearDown()
+        presets.clear()
+
+    def get_preset(self) -> models.Preset:
+        return models.Preset.objects.get(pk=self.preset.pk)
+
+    def test_default_preset(self):
+        self.assertIs(presets.get_preset(None), profiles.DEFAULT_PRESET)
+
+    def test_compile_fixed_queries(self):
+        """Preset is loaded with a fixed number of queries."""
+        preset = self.get_preset()
+
+        with self.assertNumQueries(6):
+            result = presets.compile_preset(preset)
+
+        self.assertEqual(len(result.video_profiles), 3)
+        self.assertEqual(len(result.audio_profiles), 3)
+        self.assertEqual(
+            [vp.condition.min_width for vp in result.video_profiles], [3, 2, 1]
+        )
+        for vp in result.video_profiles:
+            self.assertEqual(vp.video, ["v"])
+        for ap in result.audio_profiles:
+            self.assertEqual(ap.audio, ["a"])
+
+    def test_cached(self):
+        """Compiled preset is reused while preset is not modified."""
+        first = presets.get_preset(self.get_preset())
+        preset = self.get_preset()
+
+        with self.assertNumQueries(0):
+            second = presets.get_preset(preset)
+
+        self.assertIs(second, first)
+
+    def test_invalidate_on_track_change(self):
+        """Track change marks preset modified and drops cached entity."""
+        first = presets.get_preset(self.get_preset())
+
+        self.vt.params["width"] = 1280
+        self.vt.save()
+
+        second = presets.get_preset(self.get_preset())
+        self.assertIsNot(second, first)
+        self.assertEqual(second.video[0].width, 1280)
+
+    def test_invalidate_on_profile_tracks_change(self):
+        first = presets.get_preset(self.get_preset())
+
+        models.VideoProfileTracks.objects.filter(profile__name="vp0").delete()
+
+        second = presets.get_preset(self.get_preset())
+        self.assertIsNot(second, first)
+        self.assertEqual(second.video_profiles[0].video, [])
+
+    def test_invalidate_foreign_worker(self):
+        """Cached entity with outdated modified timestamp is not reused."""
+        first = presets.get_preset(self.get_preset())
+        models.Preset.objects.filter(pk=self.preset.pk).update(
+            modified=self.preset.modified + timedelta(seconds=1)
+        )
+
+        second = presets.get_preset(self.get_preset())
+
+        self.assertIsNot(second, first)
+        self.assertEqual(second, first)
@@ -0,0 +1,189 @@
+import os
+import timeit
+from dataclasses import replace
+from typing import List
+from unittest import TestCase, mock, skipUnless
+
+from fffw.graph import VideoMeta, AudioMeta, TS
+
+from apps.video_transcoding_off.transcoding import profiles
+
+
+def video_meta(width: int, height: int, bitrate: int) -> VideoMeta:
+    return VideoMeta(
+        bitrate=bitrate,
+        frame_rate=30.0,
+        dar=width / height,
+        par=1.0,
+        width=width,
+        height=height,
+        frames=900,
+        streams=["v"],
+        start=TS(0),
+        duration=TS(30.0),
+        device=None,
+        scenes=[],
+    )
+
+
+def audio_meta(bitrate: int = 192_000) -> AudioMeta:
+    return AudioMeta(
+        bitrate=bitrate,
+        sampling_rate=48000,
+        channels=2,
+        samples=48000 * 30,
+        streams=["a"],
+        start=TS(0),
+        duration=TS(30.0),
+        scenes=[],
+    )
+
+
+def linear_select(
+    preset: profiles.Preset, video: VideoMeta, audio: AudioMeta
+) -> profiles.Profile:
+    """
+    Reference profile selection implementation without index.
+    """
+    video_profile = next(
+        vp for vp in preset.video_profiles if vp.condition.is_valid(video)
+    )
+    audio_profile = next(
+        ap for ap in preset.audio_profiles if ap.condition.is_valid(audio)
+    )
+    return profiles.Profile(
+        video=[v for v in preset.video if v.id in video_profile.video],
+        audio=[a for a in preset.audio if a.id in audio_profile.audio],
+        container=profiles.Container(segment_duration=video_profile.segment_duration),
+    )
+
+
+def make_preset(size: int) -> profiles.Preset:
+    """
+    Generates a preset with `size` video profiles and tracks.
+
+    Each profile contains all tracks not wider than profile threshold.
+    """
+    template = profiles.DEFAULT_PRESET.video[-1]
+    video: List[profiles.VideoTrack] = []
+    video_profiles: List[profiles.VideoProfile] = []
+    for i in range(size, 0, -1):
+        width = 16 * i
+        video.append(replace(template, id=f"v{i}", width=width, height=width // 2))
+    for i in range(size, 0, -1):
+        video_profiles.append(
+            profiles.VideoProfile(
+                condition=profiles.VideoCondition(min_width=16 * i),
+                segment_duration=profiles.SEGMENT_SIZE,
+                video=[f"v{j}" for j in range(i, 0, -1)],
+            )
+        )
+    return profiles.Preset(
+        video_profiles=video_profiles,
+        audio_profiles=profiles.DEFAULT_PRESET.audio_profiles,
+        video=video,
+        audio=profiles.DEFAULT_PRESET.audio,
+    )
+
+
+class PresetTestCase(TestCase):
+    def test_select_profile(self):
+        preset = profiles.DEFAULT_PRESET
+        for width, height, bitrate in (
+            (1920, 1080, 5_000_000),
+            (1920, 1080, 3_000_000),
+            (1280, 720, 1_000_000),
+            (640, 360, 100_000),
+        ):
+            video = video_meta(width, height, bitrate)
+            audio = audio_meta()
+            with self.subTest(width=width, bitrate=bitrate):
+                self.assertEqual(
+                    preset.select_profile(video, audio),
+                    linear_select(preset, video, audio),
+                )
+
+    def test_select_profile_tracks_order(self):
+        """Selected tracks keep preset order, not profile order."""
+        preset = make_preset(4)
+        preset = replace(
+            preset,
+            video_profiles=[
+                replace(preset.video_profiles[0], video=["v1", "v3", "v2"])
+            ],
+        )
+
+        profile = preset.select_profile(video_meta(1920, 1080, 0), audio_meta())
+
+        self.assertEqual([v.id for v in profile.video], ["v3", "v2", "v1"])
+
+    def test_select_profile_first_match(self):
+        """Profiles are checked in preset order, not by thresholds."""
+        preset = make_preset(4)
+        preset = replace(preset, video_profiles=preset.video_profiles[::-1])
+
+        profile = preset.select_profile(video_meta(1920, 1080, 0), audio_meta())
+
+        self.assertEqual([v.id for v in profile.video], ["v1"])
+
+    def test_select_profile_early_exit(self):
+        """Remaining profiles are not checked when thresholds are not met."""
+        preset = make_preset(4)
+        is_valid = profiles.VideoCondition.is_valid
+
+        with mock.patch.object(
+            profiles.VideoCondition, "is_valid", autospec=True, side_effect=is_valid
+        ) as m:
+            with self.assertRaises(RuntimeError):
+                preset.select_profile(video_meta(8, 4, 0), audio_meta())
+
+        m.assert_not_called()
+        self.assertEqual(preset.select_video_profile(video_meta(16, 8, 0)), 3)
+
+    def test_no_compatible_profiles(self):
+        preset = profiles.DEFAULT_PRESET
+        audio = replace(
+            preset.audio_profiles[0],
+            condition=profiles.AudioCondition(min_bitrate=1_000_000),
+        )
+        preset = replace(preset, audio_profiles=[audio])
+
+        with self.assertRaises(RuntimeError):
+            preset.select_profile(video_meta(1920, 1080, 0), audio_meta())
+
+    def test_index(self):
+        preset = profiles.DEFAULT_PRESET
+        self.assertIs(preset.video_index["720p"], preset.video[1])
+        self.assertIs(preset.audio_index["192k"], preset.audio[0])
+
+
+@skipUnless(os.getenv("BENCHMARK"), "benchmarks are disabled")
+class PresetBenchmark(TestCase):
+    """
+    Compares profile selection cost for indexed and linear implementations.
+
+    Run with BENCHMARK=1 environment variable.
+    """
+
+    sizes = (4, 16, 64, 256)
+    number = 1000
+
+    def test_select_profile(self):
+        audio = audio_meta()
+        for size in self.sizes:
+            preset = make_preset(size)
+            # top profile with all tracks, middle profile and the last one,
+            # which is the worst case for a profile scan.
+            for width in (16 * size, 16 * (size // 2), 16):
+                video = video_meta(width, width // 2, 0)
+                indexed = timeit.timeit(
+                    lambda: preset.select_profile(video, audio), number=self.number
+                )
+                linear = timeit.timeit(
+                    lambda: linear_select(preset, video, audio), number=self.number
+                )
+                print(
+                    f"\npreset size {size:>4}, source width {width:>5}: "
+                    f"indexed {indexed * 1e6 / self.number:>9.1f} us, "
+                    f"linear {linear * 1e6 / self.number:>9.1f} us"
+                )
@@ -0,0 +1,142 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.video_transcoding_off import models, profiling
+from apps.video_transcoding_off.tests import base
+
+
+class ProfilerTestCase(base.MetadataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.profiler = profiling.Profiler()
+
+    def test_stage(self):
+        handler = mock.MagicMock()
+        profiling.stage_finished.connect(handler)
+        self.addCleanup(profiling.stage_finished.disconnect, handler)
+
+        with mock.patch("time.monotonic", side_effect=[10.0, 12.0]):
+            with self.profiler.stage("transcode", segment="s1") as stats:
+                stats.bytes_read += 100
+                stats.media_duration = 30.0
+
+        self.assertEqual(self.profiler.stages, [stats])
+        self.assertEqual(stats.wall_time, 2.0)
+        self.assertEqual(stats.speed, 15.0)
+        self.assertGreaterEqual(stats.bytes_read, 100)
+        self.assertGreaterEqual(stats.cpu_time, 0.0)
+        handler.assert_called_once_with(
+            signal=profiling.stage_finished,
+            sender=profiling.Profiler,
+            stats=stats,
+        )
+
+    def test_stage_error(self):
+        """Failed stage is recorded too."""
+        with self.assertRaises(RuntimeError):
+            with self.profiler.stage("split"):
+                raise RuntimeError()
+
+        self.assertEqual([s.name for s in self.profiler.stages], ["split"])
+        self.assertIsNone(self.profiler.stages[0].speed)
+
+    def test_io_counters_unsupported(self):
+        with mock.patch.object(profiling, "PROC_IO", "/nonexistent"):
+            self.assertEqual(profiling.io_counters(), (0, 0))
+
+    def test_report(self):
+        self.profiler.describe_source(self.make_meta(30.0))
+        with self.profiler.stage("analyze"):
+            pass
+
+        report = self.profiler.report()
+
+        self.assertEqual(
+            report["source"], {"width": 1920, "height": 1080, "duration": 30.0}
+        )
+        self.assertEqual(len(report["stages"]), 1)
+        self.assertEqual(report["stages"][0]["name"], "analyze")
+
+    def test_aggregate(self):
+        def stage(name, wall, duration=0.0):
+            return {
+                "name": name,
+                "wall_time": wall,
+                "cpu_time": wall * 2,
+                "bytes_read": 10,
+                "bytes_written": 20,
+                "media_duration": duration,
+                "speed": None,
+                "segment": None,
+            }
+
+        source = {"width": 1920, "height": 1080, "duration": 60.0}
+        reports = [
+            ("p", {"source": source, "stages": [stage("transcode", 1.0, 30.0)]}),
+            ("p", {"source": source, "stages": [stage("transcode", 3.0, 30.0)]}),
+            ("q", {"source": source, "stages": [stage("analyze", 1.0)]}),
+        ]
+
+        result = profiling.aggregate(reports)
+
+        self.assertEqual(set(result), {("p", "1920x1080"), ("q", "1920x1080")})
+        agg = result[("p", "1920x1080")]["transcode"]
+        self.assertEqual(agg["count"], 2)
+        self.assertEqual(agg["wall_time"], 4.0)
+        self.assertEqual(agg["cpu_time"], 8.0)
+        self.assertEqual(agg["bytes_read"], 20)
+        self.assertEqual(agg["speed"], 15.0)
+        self.assertEqual(result[("q", "1920x1080")]["analyze"]["speed"], 0.0)
+
+    def test_estimate_chunk_cost(self):
+        def report(*chunks):
+            stages = [
+                {"name": "transcode", "media_duration": d, "wall_time": 1.0 + d / 2}
+                for d in chunks
+            ]
+            stages.append({"name": "merge", "media_duration": 60.0, "wall_time": 1})
+            return {"source": {}, "stages": stages}
+
+        cost = profiling.estimate_chunk_cost([report(10.0, 20.0), report(5.0)])
+
+        self.assertAlmostEqual(cost.overhead, 1.0)
+        self.assertAlmostEqual(cost.per_second, 0.5)
+
+    def test_estimate_chunk_cost_not_enough_data(self):
+        self.assertIsNone(profiling.estimate_chunk_cost([]))
+        report = {
+            "stages": [
+                {"name": "transcode", "media_duration": 10.0, "wall_time": 6.0},
+                {"name": "transcode", "media_duration": 10.0, "wall_time": 7.0},
+            ]
+        }
+        self.assertIsNone(profiling.estimate_chunk_cost([report]))
+
+
+class TranscodingReportTestCase(TestCase):
+    def test_report(self):
+        preset = models.Preset.objects.create(name="preset")
+        profiler = profiling.Profiler()
+        profiler.source = {"width": 1280, "height": 720, "duration": 30.0}
+        with profiler.stage("merge") as stats:
+            stats.media_duration = 30.0
+        models.Video.objects.create(
+            source="ftp://ya.ru/1.mp4",
+            status=models.Video.DONE,
+            preset=preset,
+            metadata={"profiling": profiler.report()},
+        )
+        models.Video.objects.create(
+            source="ftp://ya.ru/2.mp4", status=models.Video.DONE, metadata={}
+        )
+
+        out = StringIO()
+        call_command("transcoding_report", stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], "preset 1280x720")
+        self.assertTrue(lines[1].strip().startswith("merge"))
+        self.assertEqual(len(lines), 2)
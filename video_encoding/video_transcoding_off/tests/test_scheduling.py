@@ -0,0 +1,250 @@
+from datetime import timedelta
+from unittest import mock
+from uuid import uuid4
+
+
+from apps.video_transcoding_off import models, scheduling, defaults, helpers, tasks
+from apps.video_transcoding_off.tests.base import BaseTestCase
+
+FAST = defaults.VIDEO_TRANSCODING_FAST_QUEUE
+SLOW = defaults.CELERY_APP_NAME
+
+
+class SchedulingTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.video = models.Video(source="http://ya.ru/1.mp4")
+        self.cost_patcher = mock.patch.object(
+            defaults, "VIDEO_TRANSCODING_FAST_COST", 600.0
+        )
+        self.cost_patcher.start()
+        self.probe_patcher = mock.patch.object(
+            scheduling, "probe_source", return_value=None
+        )
+        self.probe_mock = self.probe_patcher.start()
+
+    def tearDown(self):
+        super().tearDown()
+        self.cost_patcher.stop()
+        self.probe_patcher.stop()
+
+    def test_estimate_cost(self):
+        self.assertIsNone(scheduling.estimate_cost(self.video))
+        self.probe_mock.assert_called_once_with(self.video.source)
+
+        self.video.metadata = {"duration": 30.0}
+        # default preset has 4 video tracks
+        self.assertEqual(scheduling.estimate_cost(self.video), 120.0)
+
+        self.video.duration = timedelta(seconds=60)
+        self.assertEqual(scheduling.estimate_cost(self.video), 240.0)
+
+    def test_estimate_cost_probe(self):
+        """Source of new video is probed and kept in metadata."""
+        probed = {"duration": 30.0, "video": self.source_video(1920, 1080)}
+        self.probe_mock.return_value = probed
+
+        self.assertEqual(scheduling.estimate_cost(self.video), 120.0)
+        self.assertEqual(self.video.metadata, probed)
+
+        self.probe_mock.reset_mock()
+        self.assertEqual(scheduling.select_queue(self.video), FAST)
+        self.probe_mock.assert_not_called()
+
+    def test_estimate_cost_no_probe(self):
+        """Only known values are used if probing is not allowed."""
+        self.assertIsNone(scheduling.estimate_cost(self.video, probe=False))
+
+        self.video.metadata = {"duration": 30.0}
+        self.assertEqual(scheduling.estimate_cost(self.video, probe=False), 120.0)
+        self.assertEqual(scheduling.select_queue(self.video, probe=False), FAST)
+        self.probe_mock.assert_not_called()
+
+    def test_estimate_cost_selected_profile(self):
+        """Only tracks of profile selected for source are counted."""
+        self.video.metadata = {"duration": 30.0, "video": self.source_video(1280, 720)}
+        # 720p profile of default preset has 3 video tracks
+        self.assertEqual(scheduling.estimate_cost(self.video), 90.0)
+
+        self.video.metadata["video"] = self.source_video(640, 360)
+        self.assertEqual(scheduling.estimate_cost(self.video), 30.0)
+
+        # largest profile if source video is unknown
+        del self.video.metadata["video"]
+        self.assertEqual(scheduling.estimate_cost(self.video), 120.0)
+        self.probe_mock.assert_not_called()
+
+    @staticmethod
+    def source_video(width: int, height: int) -> dict:
+        return {
+            "width": width,
+            "height": height,
+            "bitrate": 10_000_000,
+            "frame_rate": 25.0,
+            "dar": width / height,
+        }
+
+    def test_probe_source(self):
+        info = mock.MagicMock(
+            format={"duration": "12.5", "bit_rate": "5000000"},
+            streams=[
+                {"codec_type": "audio"},
+                {
+                    "codec_type": "video",
+                    "width": 1920,
+                    "height": 1080,
+                    "avg_frame_rate": "30000/1001",
+                    "display_aspect_ratio": "16:9",
+                },
+            ],
+        )
+        target = "apps.video_transcoding_off.transcoding.extract.SourceExtractor.ffprobe"
+        self.probe_patcher.stop()
+        try:
+            with mock.patch(target, return_value=info) as m:
+                probed = scheduling.probe_source("http://ya.ru/1.mp4")
+            m.assert_called_once_with(
+                "http://ya.ru/1.mp4", timeout=defaults.VIDEO_PROBE_TIMEOUT
+            )
+            self.assertEqual(probed["duration"], 12.5)
+            self.assertEqual(probed["video"]["bitrate"], 5_000_000)
+            self.assertAlmostEqual(probed["video"]["frame_rate"], 29.97, places=2)
+            self.assertAlmostEqual(probed["video"]["dar"], 16 / 9)
+            with mock.patch(target, side_effect=RuntimeError("ffprobe returned 1")):
+                self.assertIsNone(scheduling.probe_source("http://ya.ru/1.mp4"))
+        finally:
+            self.probe_patcher.start()
+
+    def test_select_queue(self):
+        self.assertEqual(scheduling.select_queue(self.video), SLOW)
+
+        self.video.duration = timedelta(seconds=150)
+        self.assertEqual(scheduling.select_queue(self.video), FAST)
+
+        self.video.duration = timedelta(seconds=151)
+        self.assertEqual(scheduling.select_queue(self.video), SLOW)
+
+    def test_select_queue_disabled(self):
+        self.video.duration = timedelta(seconds=1)
+        with mock.patch.object(defaults, "VIDEO_TRANSCODING_FAST_COST", 0):
+            self.assertEqual(scheduling.select_queue(self.video), SLOW)
+
+
+class PromoteStaleVideosTestCase(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cost_patcher = mock.patch.object(
+            defaults, "VIDEO_TRANSCODING_FAST_COST", 600.0
+        )
+        self.cost_patcher.start()
+        self.promote_patcher = mock.patch.object(
+            defaults, "VIDEO_TRANSCODING_PROMOTE_COST", 2400.0
+        )
+        self.promote_patcher.start()
+        self.revoke_patcher = mock.patch.object(
+            tasks.transcode_video.app.control, "revoke"
+        )
+        self.revoke_mock = self.revoke_patcher.start()
+
+    def tearDown(self):
+        super().tearDown()
+        self.cost_patcher.stop()
+        self.promote_patcher.stop()
+        self.revoke_patcher.stop()
+
+    def create_video(self, queue: str, **kwargs) -> models.Video:
+        kwargs.setdefault("duration", timedelta(seconds=300))
+        kwargs.setdefault("source", "http://ya.ru/1.mp4")
+        with mock.patch("django.db.transaction.on_commit"):
+            video = models.Video.objects.create(
+                status=models.Video.QUEUED,
+                task_id=uuid4(),
+                queue=queue,
+                **kwargs,
+            )
+        return video
+
+    def make_stale(self, *videos: models.Video) -> None:
+        old = videos[0].modified - timedelta(
+            seconds=defaults.VIDEO_TRANSCODING_MAX_WAIT + 1
+        )
+        models.Video.objects.filter(pk__in=[v.pk for v in videos]).update(modified=old)
+
+    def test_promote(self):
+        stale = self.create_video(SLOW)
+        fresh = self.create_video(SLOW)
+        fast = self.create_video(FAST)
+        self.make_stale(stale, fast)
+        old_task_id = stale.task_id
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(helpers.promote_stale_videos(), 1)
+
+        self.revoke_mock.assert_called_once_with(str(old_task_id))
+        stale.refresh_from_db()
+        self.assertNotEqual(stale.task_id, old_task_id)
+        self.assertEqual(stale.status, models.Video.QUEUED)
+        self.apply_async_mock.assert_called_once_with(
+            args=(stale.pk,),
+            task_id=str(stale.task_id),
+            countdown=defaults.VIDEO_TRANSCODING_COUNTDOWN,
+            queue=FAST,
+        )
+        self.assertEqual(stale.queue, FAST)
+
+    def test_promote_skip_expensive(self):
+        """Long videos stay in default queue."""
+        long = self.create_video(SLOW, duration=timedelta(seconds=601))
+        self.make_stale(long)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(helpers.promote_stale_videos(), 0)
+
+        self.apply_async_mock.assert_not_called()
+        self.revoke_mock.assert_not_called()
+
+    def test_promote_probe(self):
+        """Unknown sources are probed and probed parameters are saved."""
+        stale = self.create_video(SLOW, duration=None)
+        long = self.create_video(SLOW, duration=None, source="http://ya.ru/2.mp4")
+        self.make_stale(stale, long)
+        probed = {stale.source: {"duration": 300.0}, long.source: {"duration": 900.0}}
+
+        with mock.patch.object(
+            scheduling, "probe_source", side_effect=lambda uri: probed[uri]
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(helpers.promote_stale_videos(), 1)
+
+        stale.refresh_from_db()
+        long.refresh_from_db()
+        self.assertEqual(stale.queue, FAST)
+        self.assertEqual(stale.metadata, {"duration": 300.0})
+        self.assertEqual(long.queue, SLOW)
+        self.assertEqual(long.metadata, {"duration": 900.0})
+
+    def test_promote_skip_started(self):
+        """Video picked up by worker is not sent again."""
+        stale = self.create_video(SLOW)
+        self.make_stale(stale)
+        qs = models.Video.objects.filter(pk=stale.pk)
+
+        def start(*args, **kwargs):
+            # worker locks video after it has been selected for promotion
+            qs.update(status=models.Video.PROCESS)
+            return 120.0
+
+        with mock.patch.object(scheduling, "estimate_cost", side_effect=start):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(helpers.promote_stale_videos(), 0)
+
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, models.Video.PROCESS)
+        self.apply_async_mock.assert_not_called()
+        self.revoke_mock.assert_not_called()
+
+    def test_promote_disabled(self):
+        self.create_video(SLOW)
+        with mock.patch.object(defaults, "VIDEO_TRANSCODING_FAST_COST", 0):
+            self.assertEqual(helpers.promote_stale_videos(), 0)
+        self.apply_async_mock.assert_not_called()
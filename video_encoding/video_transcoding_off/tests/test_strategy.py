@@ -1,4 +1,5 @@
 import json
+import threading
 from dataclasses import asdict
 from unittest import mock
 
@@ -6,7 +7,7 @@ from django.test import TestCase
 
 from apps.video_transcoding_off import strategy, defaults
 from apps.video_transcoding_off.tests import base
-from apps.video_transcoding_off.transcoding import profiles, workspace
+from apps.video_transcoding_off.transcoding import profiles, workspace, cache, planner
 
 
 class ResumableStrategyTestCase(base.ProfileMixin, base.MetadataMixin, TestCase):
@@ -258,9 +259,68 @@ class ResumableStrategyTestCase(base.ProfileMixin, base.MetadataMixin, TestCase)
             source_video_playlist="source-video.m3u8",
             source_video_chunk="source-video-%05d.mkv",
             source_audio="source-audio.mkv",
+            chunk_duration=None,
         )
         m.return_value.assert_called_once_with()
 
+    def test_plan_chunk_duration(self):
+        self.strategy.profile = self.profile
+        src = self.make_meta(3 * 3600.0)
+        self.assertIsNone(self.strategy.plan_chunk_duration(src))
+
+        with (
+            mock.patch.object(defaults, "VIDEO_ADAPTIVE_CHUNKS", True),
+            mock.patch.object(defaults, "VIDEO_CHUNK_PARALLELISM", 8),
+            mock.patch.object(defaults, "VIDEO_CHUNK_MAX_DURATION", 600.0),
+        ):
+            duration = self.strategy.plan_chunk_duration(src)
+
+        # profile segment duration is 1.0
+        self.assertEqual(duration, 600.0)
+        c = self.tmp_ws.tree["tmp-basename"]["sources"]["chunks.json"]
+        self.assertEqual(json.loads(c), {"chunk_duration": 600.0})
+
+    def test_plan_chunk_duration_exists(self):
+        """Resumed split reuses planned duration, so chunks don't change."""
+        self.strategy.profile = self.profile
+        sources = self.tmp_ws.tree["tmp-basename"]["sources"]
+        sources["chunks.json"] = json.dumps({"chunk_duration": 120.0})
+
+        with (
+            mock.patch.object(defaults, "VIDEO_ADAPTIVE_CHUNKS", True),
+            mock.patch.object(planner.ChunkPlanner, "plan") as plan,
+        ):
+            duration = self.strategy.plan_chunk_duration(self.make_meta(3 * 3600.0))
+
+        self.assertEqual(duration, 120.0)
+        plan.assert_not_called()
+
+    def test_process_segments_concurrently(self):
+        """Adaptive chunks are transcoded concurrently and merged in order."""
+        segments = ["s1", "s2", "s3"]
+        metas = {fn: self.make_meta(float(i + 1)) for i, fn in enumerate(segments)}
+        running = []
+        barrier = threading.Barrier(2, timeout=5)
+
+        def process_segment(fn):
+            running.append(fn)
+            if fn != "s3":
+                # first two chunks are transcoded at the same time
+                barrier.wait()
+            return metas[fn]
+
+        with (
+            mock.patch.object(defaults, "VIDEO_ADAPTIVE_CHUNKS", True),
+            mock.patch.object(defaults, "VIDEO_CHUNK_PARALLELISM", 2),
+            mock.patch.object(
+                self.strategy, "process_segment", side_effect=process_segment
+            ),
+        ):
+            result = self.strategy.process_segments(segments)
+
+        self.assertCountEqual(running, segments)
+        self.assertEqual(result.video.duration, 6.0)
+
     def test_get_segment_list(self):
         content = "\n".join(
             (
@@ -290,8 +350,15 @@ class ResumableStrategyTestCase(base.ProfileMixin, base.MetadataMixin, TestCase)
         meta = self.make_meta(30.0)
         # noinspection PyTypeChecker
         content = json.dumps(asdict(meta))
+        results = self.tmp_ws.tree["tmp-basename"]["results"]
+        self.tmp_ws.tree["tmp-basename"]["sources"]["s1"] = "source"
+
+        def transcode(filename):
+            results[filename] = "result"
+            return meta
+
         with mock.patch.object(
-            self.strategy, "_process_segment", return_value=meta
+            self.strategy, "_process_segment", side_effect=transcode
         ) as m:
             result = self.strategy.process_segment("s1")
         self.assertEqual(result, meta)
@@ -299,6 +366,94 @@ class ResumableStrategyTestCase(base.ProfileMixin, base.MetadataMixin, TestCase)
         self.assertEqual(c, content)
         m.assert_called_once_with("s1")
 
+    def test_process_segment_profiling(self):
+        """Transcoding stage records chunk sizes and speed."""
+        meta = self.make_meta(30.0)
+        self.tmp_ws.tree["tmp-basename"]["sources"]["s1"] = "source"
+
+        def transcode(filename):
+            self.tmp_ws.tree["tmp-basename"]["results"][filename] = "result!"
+            return meta
+
+        with mock.patch.object(self.strategy, "_process_segment", side_effect=transcode):
+            self.strategy.process_segment("s1")
+
+        stats = self.strategy.profiler.stages[-1]
+        self.assertEqual(stats.name, "transcode")
+        self.assertEqual(stats.segment, "s1")
+        self.assertGreaterEqual(stats.bytes_read, len("source"))
+        self.assertGreaterEqual(stats.bytes_written, len("result!"))
+        self.assertEqual(stats.media_duration, 30.0)
+        self.assertIsNotNone(stats.speed)
+
+    def test_analyze_source_profiling(self):
+        expected = self.make_meta(30.0)
+        with mock.patch.object(
+            self.strategy, "_analyze_source", return_value=expected
+        ):
+            self.strategy.analyze_source()
+
+        report = self.strategy.profiler.report()
+        self.assertEqual(
+            report["source"],
+            {"width": 1920, "height": 1080, "duration": 30.0},
+        )
+        self.assertEqual([s["name"] for s in report["stages"]], ["analyze"])
+
+    def test_process_segment_cache_miss(self):
+        """Transcoded chunk is stored to segment cache."""
+        meta = self.make_meta(30.0, uri="memory:tmp-basename/results/s1")
+        self.strategy.profile = self.profile
+        self.strategy.cache = cache.SegmentCache(self.tmp_ws, max_size=100)
+        self.strategy.cache.initialize()
+        sources = self.tmp_ws.tree["tmp-basename"]["sources"]
+        results = self.tmp_ws.tree["tmp-basename"]["results"]
+        sources["s1"] = "source"
+
+        def transcode(filename):
+            results[filename] = "result"
+            return meta
+
+        with mock.patch.object(
+            self.strategy, "_process_segment", side_effect=transcode
+        ) as m:
+            result = self.strategy.process_segment("s1")
+
+        m.assert_called_once_with("s1")
+        self.assertEqual(result, meta)
+        key = self.strategy.cache.key(
+            self.tmp_ws.digest(self.strategy.sources.file("s1")),
+            self.strategy.cache.profile_digest(self.profile),
+        )
+        self.assertEqual(self.strategy.cache.get(key), meta)
+        entry = self.tmp_ws.tree["tmp-basename"]["segment-cache"][key]
+        self.assertEqual(entry["result"], "result")
+
+    def test_process_segment_cache_hit(self):
+        """Cached result is reused for identical chunk and profile."""
+        meta = self.make_meta(30.0, uri="memory:tmp-another/results/s2")
+        self.strategy.profile = self.profile
+        self.strategy.cache = cache.SegmentCache(self.tmp_ws, max_size=100)
+        self.strategy.cache.initialize()
+        self.tmp_ws.tree["tmp-basename"]["sources"]["s1"] = "source"
+        key = self.strategy.cache.key(
+            self.tmp_ws.digest(self.strategy.sources.file("s1")),
+            self.strategy.cache.profile_digest(self.profile),
+        )
+        self.strategy.cache.allocate(key)
+        self.tmp_ws.write(self.strategy.cache.result_file(key), "cached")
+        self.strategy.cache.put(key, meta)
+
+        with mock.patch.object(self.strategy, "_process_segment") as m:
+            result = self.strategy.process_segment("s1")
+
+        m.assert_not_called()
+        self.assertEqual(result.uri, "memory:tmp-basename/results/s1")
+        self.assertEqual(result.videos, meta.videos)
+        results = self.tmp_ws.tree["tmp-basename"]["results"]
+        self.assertEqual(results["s1"], "cached")
+        self.assertIn("s1.json", results)
+
     def test_process_segment_call(self):
         src = self.make_meta(30.0)
         dst = self.make_meta(60.0)
@@ -348,6 +503,21 @@ class ResumableStrategyTestCase(base.ProfileMixin, base.MetadataMixin, TestCase)
         t.return_value.assert_called_once_with()
         self.assertEqual(result, dst)
 
+    def test_merge_cmaf(self):
+        src = self.make_meta(30.0)
+        self.strategy.profile = self.profile
+        target = "video_transcoding.transcoding.transcoder.CMAFSegmentor"
+        with (
+            mock.patch.object(defaults, "VIDEO_PACKAGING", "cmaf"),
+            mock.patch.object(self.strategy, "write_concat_file"),
+            mock.patch(target, autospec=True) as t,
+        ):
+            t.return_value.return_value = self.make_meta(60.0)
+            self.strategy.merge(["s1", "s2"], src)
+
+        t.assert_called_once()
+        self.assertEqual(t.call_args.kwargs["dst"], "memory:dst-basename/index.m3u8")
+
     def test_write_concat_file(self):
         result = self.strategy.write_concat_file(["s1", "s2"])
         self.assertEqual(result, "memory:tmp-basename/results/concat.ffconcat")
@@ -375,3 +545,131 @@ class ResumableStrategyTestCase(base.ProfileMixin, base.MetadataMixin, TestCase)
             "memory:tmp-basename/sources/s1"
         )
         self.assertEqual(result, meta)
+
+    def test_get_segment_meta_from_segment_list(self):
+        """Chunk is described from segment list timings without probing."""
+        self.strategy.src = self.make_meta(30.0)
+        sources = self.tmp_ws.tree["tmp-basename"]["sources"]
+        sources["source-video.m3u8"] = "#EXTM3U\n#EXTINF:4.8,\ns1\n"
+        src = workspace.File("tmp-basename", "sources", "s1")
+        target = "video_transcoding.transcoding.extract.VideoSegmentExtractor"
+        with mock.patch(target, autospec=True) as m:
+            result = self.strategy.get_segment_meta(src)
+
+        m.assert_not_called()
+        self.assertEqual(result.uri, "memory:tmp-basename/sources/s1")
+        self.assertEqual(float(result.video.duration), 4.8)
+        self.assertEqual(result.audios, [])
+
+        # pipelined split appends chunks to playlist
+        sources["source-video.m3u8"] += "#EXTINF:4.8,\ns2\n"
+        src = workspace.File("tmp-basename", "sources", "s2")
+        result = self.strategy.get_segment_meta(src)
+        self.assertEqual(float(result.video.start), 4.8)
+
+
+class PipelinedStrategyTestCase(base.ProfileMixin, base.MetadataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile = self.default_profile()
+        self.strategy = strategy.PipelinedStrategy(
+            source_uri="https://example.com/source.mp4",
+            basename="basename",
+            preset=profiles.DEFAULT_PRESET,
+        )
+        self.tmp_ws = base.MemoryWorkspace("tmp-basename")
+        self.dst_ws = base.MemoryWorkspace("dst-basename")
+        self.strategy.ws = self.tmp_ws
+        self.strategy.store = self.dst_ws
+        self.strategy.initialize()
+        self.sources = self.tmp_ws.tree["tmp-basename"]["sources"]
+        self.poll_patcher = mock.patch.object(
+            defaults, "VIDEO_SPLIT_POLL_INTERVAL", 0.01
+        )
+        self.poll_patcher.start()
+
+    def tearDown(self):
+        super().tearDown()
+        self.poll_patcher.stop()
+
+    def test_process(self):
+        with (
+            mock.patch.object(
+                self.strategy, "analyze_source", return_value=mock.sentinel.src_rv
+            ) as analyze_source,
+            mock.patch.object(
+                self.strategy, "select_profile", return_value=mock.sentinel.profile_rv
+            ),
+            mock.patch.object(
+                self.strategy, "split_segments", return_value=iter(["s1", "s2"])
+            ) as split_segments,
+            mock.patch.object(
+                self.strategy,
+                "process_segment",
+                side_effect=[mock.sentinel.s1_rv, mock.sentinel.s2_rv],
+            ) as process_segment,
+            mock.patch.object(
+                self.strategy,
+                "merge_metadata",
+                side_effect=[mock.sentinel.m1_rv, mock.sentinel.m2_rv],
+            ),
+            mock.patch.object(
+                self.strategy, "merge", return_value=mock.sentinel.merge_rv
+            ) as merge,
+        ):
+            result = self.strategy.process()
+
+        analyze_source.assert_called_once_with()
+        split_segments.assert_called_once_with(mock.sentinel.src_rv)
+        process_segment.assert_has_calls([mock.call("s1"), mock.call("s2")])
+        merge.assert_called_once_with(["s1", "s2"], meta=mock.sentinel.m2_rv)
+        self.assertEqual(result, mock.sentinel.merge_rv)
+
+    def test_split_segments_exists(self):
+        """Playlist is reused if source has already been split."""
+        self.sources["split.json"] = json.dumps(asdict(self.make_meta(30.0)))
+        self.sources["source-video.m3u8"] = "#M3U8\ns1\ns2\n"
+
+        with mock.patch.object(self.strategy, "_split") as m:
+            segments = list(self.strategy.split_segments(self.make_meta(30.0)))
+
+        m.assert_not_called()
+        self.assertListEqual(segments, ["s1", "s2"])
+
+    def test_split_segments_pipelined(self):
+        """Chunks are yielded while splitter is still running."""
+        src = self.make_meta(600.0)
+        split = self.make_meta(30.0)
+        consumed = threading.Event()
+
+        def _split(meta):
+            self.assertIs(meta, src)
+            self.sources["source-video.m3u8"] = "#M3U8\ns1\n"
+            # wait until first chunk is consumed before splitting further
+            self.assertTrue(consumed.wait(timeout=5))
+            self.sources["source-video.m3u8"] = "#M3U8\ns1\ns2\n#EXT-X-ENDLIST\n"
+            return split
+
+        segments = []
+        with mock.patch.object(self.strategy, "_split", side_effect=_split):
+            for fn in self.strategy.split_segments(src):
+                segments.append(fn)
+                consumed.set()
+
+        self.assertListEqual(segments, ["s1", "s2"])
+        content = json.dumps(asdict(split))
+        self.assertEqual(self.sources["split.json"], content)
+
+    def test_split_segments_error(self):
+        with mock.patch.object(self.strategy, "_split", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                list(self.strategy.split_segments(self.make_meta(30.0)))
+        self.assertNotIn("split.json", self.sources)
+
+    def test_get_closed_segments(self):
+        self.assertListEqual(self.strategy.get_closed_segments(), [])
+
+        self.sources["source-video.m3u8"] = "#M3U8\ns1\ns2\ns3"
+
+        # incomplete line may be a partially written chunk name
+        self.assertListEqual(self.strategy.get_closed_segments(), ["s1", "s2"])
@@ -6,7 +6,7 @@ from uuid import UUID, uuid4
 from billiard.exceptions import SoftTimeLimitExceeded
 from celery.exceptions import Retry
 
-from apps.video_transcoding_off import models, tasks
+from apps.video_transcoding_off import models, tasks, defaults, strategy
 from apps.video_transcoding_off.tests import base
 from apps.video_transcoding_off.transcoding import profiles
 
@@ -71,17 +71,36 @@ class TranscodeTaskVideoStateTestCase(base.BaseTestCase):
 
     def test_skip_incorrect_status(self):
         """
-        Unexpected video statuses lead to task retry.
+        Task is skipped without retry for unexpected video status.
         """
         self.video.status = models.Video.ERROR
         self.video.save()
 
-        with self.assertRaises(Retry):
-            self.run_task()
+        self.run_task()
 
         self.video.refresh_from_db()
         self.assertEqual(self.video.status, models.Video.ERROR)
         self.handle_mock.assert_not_called()
+        self.retry_mock.assert_not_called()
+
+    def test_skip_outdated_task(self):
+        """
+        Task is skipped without retry if video has been re-queued.
+        """
+        task_id = uuid4()
+        self.video.task_id = task_id
+        self.video.save()
+
+        result = tasks.transcode_video.apply(
+            task_id=str(uuid4()), args=(self.video.id,), throw=True
+        )
+
+        self.assertIsNone(result.result)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.status, models.Video.QUEUED)
+        self.assertEqual(self.video.task_id, task_id)
+        self.handle_mock.assert_not_called()
+        self.retry_mock.assert_not_called()
 
     def test_skip_locked(self):
         """
@@ -95,6 +114,30 @@ class TranscodeTaskVideoStateTestCase(base.BaseTestCase):
             self.run_task()
 
         self.handle_mock.assert_not_called()
+        self.retry_mock.assert_called_once_with(
+            exc=mock.ANY,
+            countdown=defaults.VIDEO_LOCK_RETRY_DELAY,
+            max_retries=defaults.VIDEO_LOCK_MAX_RETRIES,
+        )
+
+    def test_lock_retry_backoff(self):
+        """
+        Lock retry delay grows exponentially up to a limit.
+        """
+        self.video.pk += 1
+        task = tasks.transcode_video
+        for retries, countdown in ((1, 2.0), (3, 8.0), (10, 60.0)):
+            self.retry_mock.reset_mock()
+            task.push_request(id=str(self.video.task_id), retries=retries)
+            try:
+                with self.assertRaises(Retry):
+                    task.lock_video(self.video.pk)
+            finally:
+                task.pop_request()
+            with self.subTest(retries=retries):
+                self.assertEqual(
+                    self.retry_mock.call_args.kwargs["countdown"], countdown
+                )
 
     def test_skip_unlock_incorrect_status(self):
         """
@@ -149,6 +192,33 @@ class TranscodeTaskVideoStateTestCase(base.BaseTestCase):
         self.assertEqual(self.video.error, repr(exc))
         self.retry_mock.assert_called_once_with(countdown=10)
 
+    def test_init_strategy_pipelined(self):
+        with mock.patch.object(defaults, "VIDEO_PIPELINED_SPLIT", True):
+            s = tasks.transcode_video.init_strategy(
+                source_uri="ftp://ya.ru/1.mp4",
+                basename=uuid4().hex,
+                preset=profiles.DEFAULT_PRESET,
+            )
+        self.assertIsInstance(s, strategy.PipelinedStrategy)
+
+    def test_get_chunk_cost(self):
+        self.assertIsNone(tasks.transcode_video.get_chunk_cost(None))
+        stages = [
+            {"name": "transcode", "media_duration": d, "wall_time": 2.0 + d}
+            for d in (10.0, 20.0)
+        ]
+        models.Video.objects.create(
+            status=models.Video.DONE,
+            source="ftp://ya.ru/1.mp4",
+            metadata={"profiling": {"source": {}, "stages": stages}},
+        )
+
+        with mock.patch.object(defaults, "VIDEO_ADAPTIVE_CHUNKS", True):
+            cost = tasks.transcode_video.get_chunk_cost(None)
+
+        self.assertAlmostEqual(cost.overhead, 2.0)
+        self.assertAlmostEqual(cost.per_second, 1.0)
+
     def test_init_preset_default(self):
         preset = tasks.transcode_video.init_preset(None)
         self.assertEqual(preset, profiles.DEFAULT_PRESET)
@@ -308,6 +378,7 @@ class ProcessVideoTestCase(base.MetadataMixin, base.BaseTestCase):
             source_uri=self.video.source,
             basename=self.video.basename.hex,
             preset=tasks.transcode_video.init_preset(self.video.preset),
+            chunk_cost=None,
         )
         self.strategy_mock.return_value.assert_called_once_with()
 
@@ -319,4 +390,5 @@ class ProcessVideoTestCase(base.MetadataMixin, base.BaseTestCase):
                 s.pop(f, None)
         duration = min(s["duration"] for s in streams)
         expected["duration"] = duration
+        expected["profiling"] = self.strategy_mock.return_value.profiler.report()
         self.assertEqual(result, expected)
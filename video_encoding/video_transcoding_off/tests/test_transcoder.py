@@ -290,6 +290,8 @@ class SplitterTestCase(ProcessorBaseTestCase):
             "m3u8",
             "-segment_time",
             defaults.VIDEO_CHUNK_DURATION,
+            "-fflags",
+            "+bitexact",
             "/dst/source-video-%05d.mkv",
             "-map",
             "0:a:0",
@@ -305,6 +307,22 @@ class SplitterTestCase(ProcessorBaseTestCase):
         ]
         self.assertEqual(ff.get_args(), ensure_binary(expected))
 
+    def test_chunk_duration(self):
+        splitter = transcoder.Splitter(
+            "src.mp4",
+            "/dst/",
+            profile=self.profile,
+            meta=self.meta,
+            source_video_playlist="source-video.m3u8",
+            source_video_chunk="source-video-%05d.mkv",
+            source_audio="source-audio.mkv",
+            chunk_duration=9.6,
+        )
+
+        kwargs = splitter.get_video_output_kwargs([])
+
+        self.assertEqual(kwargs["segment_time"], 9.6)
+
 
 class SegmentorTestCase(ProcessorBaseTestCase):
 
@@ -406,3 +424,68 @@ class SegmentorTestCase(ProcessorBaseTestCase):
             "/dst/playlist-%v.m3u8",
         ]
         self.assertEqual(ff.get_args(), ensure_binary(expected))
+
+
+class CMAFSegmentorTestCase(ProcessorBaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.segmentor = transcoder.CMAFSegmentor(
+            video_source="/results/concat.ffconcat",
+            audio_source="/sources/source-audio.mkv",
+            dst="/dst/index.m3u8",
+            profile=self.profile,
+            meta=self.meta,
+        )
+
+    def test_prepare_ffmpeg(self):
+        ff = self.segmentor.prepare_ffmpeg(self.meta)
+
+        expected = [
+            "-loglevel",
+            "level+info",
+            "-y",
+            "-i",
+            "/results/concat.ffconcat",
+            "-i",
+            "/sources/source-audio.mkv",
+            "-map",
+            "0:v:0",
+            "-c:v:0",
+            "copy",
+            "-b:v:0",
+            1500000,
+            "-map",
+            "1:a:0",
+            "-c:a:0",
+            "libfdk_aac",
+            "-b:a:0",
+            128000,
+            "-ar:a:0",
+            48000,
+            "-ac:a:0",
+            2,
+            "-f",
+            "dash",
+            "-copyts",
+            "-avoid_negative_ts",
+            "auto",
+            "-seg_duration",
+            1.0,
+            "-use_template",
+            1,
+            "-use_timeline",
+            1,
+            "-adaptation_sets",
+            "id=0,streams=v id=1,streams=a",
+            "-init_seg_name",
+            "init-$RepresentationID$.m4s",
+            "-media_seg_name",
+            "segment-$RepresentationID$-$Number%05d$.m4s",
+            "-hls_playlist",
+            1,
+            "-hls_master_name",
+            "index.m3u8",
+            "/dst/manifest.mpd",
+        ]
+        self.assertEqual(ff.get_args(), ensure_binary(expected))
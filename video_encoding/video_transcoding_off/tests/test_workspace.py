@@ -1,3 +1,5 @@
+import hashlib
+import io
 from functools import partial
 from unittest import mock
 
@@ -108,6 +110,26 @@ class FileSystemWorkspaceTestCase(TestCase):
         self.ws.write(self.file, "content")
         m.return_value.write.assert_called_once_with("content")
 
+    @mock.patch("shutil.copyfile")
+    def test_copy(self, m: mock.Mock):
+        dst = workspace.FileSystemWorkspace("/tmp/cache")
+        uri = dst.get_absolute_uri(workspace.File("result"))
+        self.ws.copy(self.file, uri)
+        m.assert_called_once_with("/tmp/dir/first/second/file.txt", "/tmp/cache/result")
+
+    @mock.patch("os.path.getsize", return_value=42)
+    def test_size(self, m: mock.Mock):
+        self.assertEqual(self.ws.size(self.file), 42)
+        m.assert_called_once_with("/tmp/dir/first/second/file.txt")
+
+    @mock.patch(
+        "builtins.open", new_callable=partial(mock.mock_open, read_data=b"content")
+    )
+    def test_digest(self, m: mock.Mock):
+        digest = self.ws.digest(self.file)
+        self.assertEqual(digest, hashlib.sha256(b"content").hexdigest())
+        m.assert_called_once_with("/tmp/dir/first/second/file.txt", "rb")
+
 
 class WebDAVWorkspaceTestCase(TestCase):
     def setUp(self):
@@ -288,6 +310,41 @@ class WebDAVWorkspaceTestCase(TestCase):
         )
         self.status_mock.assert_called()
 
+    def test_copy(self):
+        dst = workspace.WebDAVWorkspace("https://domain.com/cache")
+        uri = dst.get_absolute_uri(workspace.File("result"))
+        self.ws.copy(self.file, uri)
+        self.session_mock.assert_called_once_with(
+            "COPY",
+            "https://domain.com/path/first/second/file.txt",
+            headers={
+                "Destination": "https://domain.com/cache/result",
+                "Overwrite": "T",
+            },
+        )
+        self.status_mock.assert_called()
+
+    def test_size(self):
+        self.response.headers["Content-Length"] = "42"
+        self.assertEqual(self.ws.size(self.file), 42)
+        self.session_mock.assert_called_once_with(
+            "HEAD",
+            "https://domain.com/path/first/second/file.txt",
+            **self.session_kwargs,
+        )
+
+    def test_digest(self):
+        self.response.raw = io.BytesIO(b"content")
+        digest = self.ws.digest(self.file)
+        self.assertEqual(digest, hashlib.sha256(b"content").hexdigest())
+        self.session_mock.assert_called_once_with(
+            "GET",
+            "https://domain.com/path/first/second/file.txt",
+            stream=True,
+            **self.session_kwargs,
+        )
+        self.status_mock.assert_called()
+
 
 class InitWorkspaceTestCase(TestCase):
     def test_init_file(self):
@@ -1,3 +1,4 @@
+from dataclasses import replace
 from typing import Dict, Any, List
 
 from fffw.analysis import ffprobe, mediainfo
@@ -79,3 +80,59 @@ class FFProbeHLSAnalyzer(ffprobe.Analyzer):
         # Revert multiplying real bitrate on 1.1
         # https://github.com/FFmpeg/FFmpeg/blob/n7.0.1/libavformat/hlsenc.c#L1493
         return round(variant_bitrate / 1.1)
+
+
+class SegmentListAnalyzer:
+    """
+    Analyzer for video chunks from a split M3U8 segment list.
+
+    Splitter copies video stream, so chunks share stream parameters with
+    source and differ only in timings, which segment muxer writes to
+    playlist as #EXTINF durations. This avoids probing each chunk.
+    """
+
+    def __init__(self, content: str, video: meta.VideoMeta) -> None:
+        """
+        :param content: segment list content.
+        :param video: source video stream metadata.
+        """
+        self.content = content
+        self.video = video
+
+    def analyze(self) -> Dict[str, meta.VideoMeta]:
+        """
+        :return: chunk video stream metadata by chunk filename.
+        """
+        segments: Dict[str, meta.VideoMeta] = {}
+        start = self.video.start
+        duration = None
+        for line in self.content.splitlines():
+            line = line.strip()
+            if line.startswith('#EXTINF:'):
+                duration = meta.TS(line[len('#EXTINF:'):].split(',', 1)[0])
+                continue
+            if not line or line.startswith('#'):
+                continue
+            if duration is None:
+                # unknown timings, following chunks must be probed
+                break
+            segments[line] = self.video_meta_data(start, duration)
+            start += duration
+            duration = None
+        return segments
+
+    def video_meta_data(self, start: meta.TS, duration: meta.TS) -> meta.VideoMeta:
+        scene = meta.Scene(
+            stream=None,
+            duration=duration,
+            start=start,
+            position=start,
+        )
+        return replace(
+            self.video,
+            start=start,
+            duration=duration,
+            frames=round(float(duration) * self.video.frame_rate),
+            scenes=[scene],
+            streams=[],
+        )
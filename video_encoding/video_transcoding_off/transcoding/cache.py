@@ -0,0 +1,158 @@
+import hashlib
+import json
+import time
+from dataclasses import asdict
+from typing import Optional, Dict, List
+from urllib.parse import ParseResult
+
+from apps.video_transcoding_off.transcoding import workspace
+from apps.video_transcoding_off.transcoding.metadata import Metadata
+from apps.video_transcoding_off.transcoding.profiles import Profile
+from apps.video_transcoding_off.utils import LoggerMixin
+
+
+class SegmentCache(LoggerMixin):
+    """
+    Content-addressed storage for transcoded chunks.
+
+    Entries are keyed by source chunk content hash and profile hash, so a
+    re-ingested source is not transcoded again under a new basename. Each
+    entry is a collection containing resulting chunk and its metadata.
+    When total size exceeds limit, least recently used entries are evicted.
+
+    Cache index is shared between workers without locking, so concurrent
+    updates may lose usage records; this only affects eviction order.
+    """
+
+    def __init__(
+        self, ws: workspace.Workspace, max_size: int, name: str = "segment-cache"
+    ) -> None:
+        """
+        :param ws: workspace shared between transcoding tasks.
+        :param max_size: cache size limit, bytes.
+        :param name: cache collection name.
+        """
+        super().__init__()
+        self.ws = ws
+        self.max_size = max_size
+        self.name = name
+        self.root = ws.root.collection(name)
+
+    @staticmethod
+    def profile_digest(profile: Profile) -> str:
+        """
+        :return: sha256 hex digest of profile parameters.
+        """
+        # noinspection PyTypeChecker
+        content = json.dumps(asdict(profile), sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    @staticmethod
+    def key(chunk_digest: str, profile_digest: str) -> str:
+        """
+        :param chunk_digest: source chunk content digest.
+        :param profile_digest: transcoding profile digest.
+        :return: cache entry key.
+        """
+        content = f"{chunk_digest}:{profile_digest}"
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    @property
+    def index_file(self) -> workspace.File:
+        """
+        :return: A json file with entries sizes and last usage timestamps.
+        """
+        return self.root.file("index.json")
+
+    def result_file(self, key: str) -> workspace.File:
+        """
+        :param key: cache entry key.
+        :return: cached transcoded chunk.
+        """
+        return self.root.collection(key).file("result")
+
+    def metadata_file(self, key: str) -> workspace.File:
+        """
+        :param key: cache entry key.
+        :return: a json file with cached chunk metadata.
+        """
+        return self.root.collection(key).file("result.json")
+
+    def initialize(self) -> None:
+        self.root = self.ws.ensure_collection(self.name)
+
+    def get(self, key: str) -> Optional[Metadata]:
+        """
+        Looks up cache entry and marks it as recently used.
+
+        :param key: cache entry key.
+        :return: cached chunk metadata or None if entry is missing.
+        """
+        f = self.metadata_file(key)
+        if not self.ws.exists(f):
+            return None
+        content = self.ws.read(f)
+        meta = Metadata.from_native(json.loads(content))
+        index = self.read_index()
+        if key in index:
+            index[key][1] = time.time()
+            self.write_index(index)
+        return meta
+
+    def allocate(self, key: str) -> ParseResult:
+        """
+        Creates cache entry collection.
+
+        :param key: cache entry key.
+        :return: absolute uri to copy resulting chunk to.
+        """
+        self.ws.create_collection(self.root.collection(key))
+        return self.ws.get_absolute_uri(self.result_file(key))
+
+    def put(self, key: str, meta: Metadata) -> None:
+        """
+        Registers copied result chunk in cache and evicts old entries.
+
+        Resulting chunk must already be copied to uri returned by `allocate`.
+
+        :param key: cache entry key.
+        :param meta: transcoded chunk metadata.
+        """
+        # noinspection PyTypeChecker
+        content = json.dumps(asdict(meta))
+        self.ws.write(self.metadata_file(key), content)
+        size = self.ws.size(self.result_file(key))
+        index = self.read_index()
+        index[key] = [size, time.time()]
+        for k in self.select_evicted(index, keep=key):
+            self.logger.debug("Evicting %s", k)
+            self.ws.delete_collection(self.root.collection(k))
+            del index[k]
+        self.write_index(index)
+
+    def select_evicted(self, index: Dict[str, List[float]], keep: str) -> List[str]:
+        """
+        Selects least recently used entries exceeding cache size limit.
+
+        :param index: cache index.
+        :param keep: key of an entry that must not be evicted.
+        :return: list of keys to evict.
+        """
+        total = sum(size for size, _ in index.values())
+        evicted = []
+        for k, (size, _) in sorted(index.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_size:
+                break
+            if k == keep:
+                continue
+            evicted.append(k)
+            total -= size
+        return evicted
+
+    def read_index(self) -> Dict[str, List[float]]:
+        if not self.ws.exists(self.index_file):
+            return {}
+        return json.loads(self.ws.read(self.index_file))
+
+    def write_index(self, index: Dict[str, List[float]]) -> None:
+        self.ws.write(self.index_file, json.dumps(index))
@@ -22,6 +22,21 @@ class HLSOutput(Output):
     reset_timestamps: Optional[int] = 0
 
 
+@dataclass
+class DASHOutput(Output):
+    """
+    DASH muxer producing CMAF fragments and both DASH and HLS manifests.
+    """
+    seg_duration: Optional[float] = None
+    use_template: Optional[int] = None
+    use_timeline: Optional[int] = None
+    adaptation_sets: Optional[str] = None
+    init_seg_name: Optional[str] = None
+    media_seg_name: Optional[str] = None
+    hls_playlist: Optional[int] = None
+    hls_master_name: Optional[str] = None
+
+
 @dataclass
 class SegmentOutput(Output):
     """
@@ -31,6 +46,7 @@ class SegmentOutput(Output):
     segment_list: Optional[str] = None
     segment_list_type: Optional[str] = None
     segment_time: Optional[float] = None
+    fflags: Optional[str] = None
 
 
 @dataclass
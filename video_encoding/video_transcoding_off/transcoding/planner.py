@@ -0,0 +1,68 @@
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class ChunkCost:
+    """
+    Chunk transcoding cost model: wall = overhead + duration * per_second.
+    """
+
+    overhead: float
+    """ Fixed per-chunk cost (process start, probing, I/O setup), seconds."""
+    per_second: float
+    """ Wall time spent per second of chunk media."""
+
+
+@dataclass(frozen=True)
+class ChunkPlanner:
+    """
+    Selects split chunk duration for a source.
+
+    Chunk duration is a multiple of HLS segment duration, so chunk
+    boundaries stay aligned with audio and video frames (see "Selecting HLS
+    Segment duration" in profiles). Long sources are split to
+    `parallelism` chunks, but chunks are not made shorter than it is
+    reasonable for per-chunk overhead.
+    """
+
+    parallelism: int
+    """ Desired number of chunks per source."""
+    min_duration: float
+    """ Minimum chunk duration, seconds."""
+    max_duration: float
+    """ Maximum chunk duration, seconds."""
+    max_overhead: float
+    """ Maximum share of per-chunk overhead in chunk transcoding time."""
+
+    def get_min_duration(self, cost: Optional[ChunkCost]) -> float:
+        """
+        :param cost: measured chunk transcoding cost.
+        :return: minimum chunk duration with acceptable overhead share.
+        """
+        if cost is None or cost.per_second <= 0:
+            return self.min_duration
+        # overhead / (overhead + duration * per_second) <= max_overhead
+        ratio = (1 - self.max_overhead) / self.max_overhead
+        return max(self.min_duration, cost.overhead * ratio / cost.per_second)
+
+    def plan(
+        self,
+        duration: float,
+        segment_duration: float,
+        cost: Optional[ChunkCost] = None,
+    ) -> float:
+        """
+        :param duration: source duration, seconds.
+        :param segment_duration: HLS segment duration from profile, seconds.
+        :param cost: measured chunk transcoding cost.
+        :return: chunk duration, a multiple of segment duration.
+        """
+        target = duration / max(self.parallelism, 1)
+        target = max(target, self.get_min_duration(cost))
+        target = min(target, self.max_duration)
+        steps = math.ceil(target / segment_duration)
+        if steps * segment_duration > self.max_duration:
+            steps = math.floor(self.max_duration / segment_duration)
+        return round(max(steps, 1) * segment_duration, 6)
@@ -1,10 +1,11 @@
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import List, Optional, Any, Dict
+from typing import List, Optional, Any, Dict, Tuple
 
 from fffw.graph import VideoMeta, AudioMeta
 
 
-@dataclass
+@dataclass(frozen=True)
 class VideoTrack:
     """
     Settings for a single video stream in resulting media file
@@ -29,7 +30,7 @@ class VideoTrack:
         return cls(**data)
 
 
-@dataclass
+@dataclass(frozen=True)
 class AudioTrack:
     """
     Settings for a single audio stream in resulting media file
@@ -46,7 +47,7 @@ class AudioTrack:
         return cls(**data)
 
 
-@dataclass
+@dataclass(frozen=True)
 class VideoCondition:
     """
     Condition for source video stream for video profile selection
@@ -74,7 +75,7 @@ class VideoCondition:
         )
 
 
-@dataclass
+@dataclass(frozen=True)
 class AudioCondition:
     """
     Condition for source audio stream for video profile selection
@@ -94,7 +95,7 @@ class AudioCondition:
         )
 
 
-@dataclass
+@dataclass(frozen=True)
 class VideoProfile:
     """
     Video transcoding profile.
@@ -105,7 +106,7 @@ class VideoProfile:
     video: List[str]  # List of VideoTrack ids defined in a preset
 
 
-@dataclass
+@dataclass(frozen=True)
 class AudioProfile:
     """
     Audio transcoding profile.
@@ -151,6 +152,10 @@ class Profile:
 class Preset:
     """
     A set of video and audio profiles to select from.
+
+    Profiles are checked in order, first matching profile is selected. Track
+    lookups and profile thresholds are indexed on construction, so preset
+    should not be modified afterwards.
     """
 
     video_profiles: List[VideoProfile]
@@ -158,27 +163,99 @@ class Preset:
     video: List[VideoTrack]
     audio: List[AudioTrack]
 
+    def __post_init__(self) -> None:
+        self.video_index: Dict[str, VideoTrack] = {v.id: v for v in self.video}
+        self.audio_index: Dict[str, AudioTrack] = {a.id: a for a in self.audio}
+        self._video_tracks = [
+            self._resolve(vp.video, self.video) for vp in self.video_profiles
+        ]
+        self._audio_tracks = [
+            self._resolve(ap.audio, self.audio) for ap in self.audio_profiles
+        ]
+        self._video_bounds = self._suffix_bounds(
+            [
+                (
+                    vp.condition.min_width,
+                    vp.condition.min_height,
+                    vp.condition.min_bitrate,
+                    vp.condition.min_frame_rate,
+                )
+                for vp in self.video_profiles
+            ]
+        )
+        self._audio_bounds = self._suffix_bounds(
+            [
+                (ap.condition.min_sample_rate, ap.condition.min_bitrate)
+                for ap in self.audio_profiles
+            ]
+        )
+
+    @staticmethod
+    def _resolve(ids: List[str], tracks: List[Any]) -> List[Any]:
+        """
+        Selects tracks by ids keeping preset tracks order.
+        """
+        selected = set(ids)
+        return [t for t in tracks if t.id in selected]
+
+    @staticmethod
+    def _suffix_bounds(thresholds: List[Tuple[float, ...]]) -> List[List[float]]:
+        """
+        Computes lowest thresholds among each profile and all following ones.
+
+        Resulting per-condition lists are non-decreasing, so profiles that
+        a source could satisfy form a prefix found with binary search.
+        """
+        bounds: List[Tuple[float, ...]] = []
+        current: Optional[Tuple[float, ...]] = None
+        for t in reversed(thresholds):
+            current = t if current is None else tuple(map(min, t, current))
+            bounds.append(current)
+        bounds.reverse()
+        return [list(b) for b in zip(*bounds)]
+
+    @staticmethod
+    def _reachable(bounds: List[List[float]], values: Tuple[float, ...]) -> int:
+        """
+        :return: number of leading profiles that a source may satisfy.
+        """
+        if not bounds:
+            return 0
+        return min(bisect_right(b, v) for b, v in zip(bounds, values))
+
+    def select_video_profile(self, video: VideoMeta) -> int:
+        """
+        :param video: source video stream metadata
+        :return: index of first compatible video profile
+        """
+        values = (video.width, video.height, video.bitrate, video.frame_rate)
+        end = self._reachable(self._video_bounds, values)
+        for i in range(end):
+            if self.video_profiles[i].condition.is_valid(video):
+                return i
+        raise RuntimeError("No compatible video profiles")
+
+    def select_audio_profile(self, audio: AudioMeta) -> int:
+        """
+        :param audio: source audio stream metadata
+        :return: index of first compatible audio profile
+        """
+        values = (audio.sampling_rate, audio.bitrate)
+        end = self._reachable(self._audio_bounds, values)
+        for i in range(end):
+            if self.audio_profiles[i].condition.is_valid(audio):
+                return i
+        raise RuntimeError("No compatible audio profiles")
+
     def select_profile(self, video: VideoMeta, audio: AudioMeta) -> Profile:
-        video_profile = None
-        for vp in self.video_profiles:
-            if vp.condition.is_valid(video):
-                video_profile = vp
-                break
-        if video_profile is None:
-            raise RuntimeError("No compatible video profiles")
-
-        audio_profile = None
-        for ap in self.audio_profiles:
-            if ap.condition.is_valid(audio):
-                audio_profile = ap
-                break
-        if audio_profile is None:
-            raise RuntimeError("No compatible audio profiles")
+        vi = self.select_video_profile(video)
+        ai = self.select_audio_profile(audio)
+        video_profile = self.video_profiles[vi]
 
         # noinspection PyTypeChecker
         return Profile(
-            video=[v for v in self.video if v.id in video_profile.video],
-            audio=[a for a in self.audio if a.id in audio_profile.audio],
+            video=list(self._video_tracks[vi]),
+            audio=list(self._audio_tracks[ai]),
             container=Container(segment_duration=video_profile.segment_duration),
         )
 
@@ -192,6 +269,9 @@ class Preset:
 # * 48 kHz @ 25 fps - 4.8 seconds
 # * 44100 Hz @ 25 fps - 10.24 seconds
 # * 44100 Hz @ 30 fps - just don't use this (1536 frames or 51.2 seconds)
+#
+# Adaptive split chunk duration is a multiple of segment duration too (see
+# planner.ChunkPlanner), so chunk boundaries keep this alignment.
 
 # Default frame rate
 FRAME_RATE = 30
@@ -1,7 +1,7 @@
 import abc
 import os.path
 from itertools import product
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from urllib.parse import urljoin
 
 from fffw import encoding
@@ -160,11 +160,13 @@ class Splitter(Processor):
         source_video_playlist: str,
         source_video_chunk: str,
         source_audio: str,
+        chunk_duration: Optional[float] = None,
     ) -> None:
         super().__init__(src, dst, profile=profile, meta=meta)
         self.source_video_playlist = source_video_playlist
         self.source_video_chunk = source_video_chunk
         self.source_audio = source_audio
+        self.chunk_duration = chunk_duration or defaults.VIDEO_CHUNK_DURATION
 
     def get_result_metadata(self, uri: str) -> Metadata:
         extractor = extract.SplitExtractor(
@@ -215,7 +217,10 @@ class Splitter(Processor):
             copyts=True,
             segment_list=urljoin(self.dst, self.source_video_playlist),
             segment_list_type="m3u8",
-            segment_time=defaults.VIDEO_CHUNK_DURATION,
+            segment_time=self.chunk_duration,
+            # Omit muxing date and app version, so chunks of the same source
+            # are byte-identical across runs (see strategy segment cache).
+            fflags="+bitexact",
             output_file=urljoin(self.dst, self.source_video_chunk),
         )
 
@@ -336,3 +341,33 @@ class Segmentor(Processor):
             vsm.append(f"v:{j},agroup:a{i}:bandwidth:{v.bitrate}")
         var_stream_map = " ".join(vsm)
         return var_stream_map
+
+
+class CMAFSegmentor(Segmentor):
+    """
+    Segments result to CMAF fragments shared by HLS and DASH manifests.
+
+    Fragments are written once, DASH manifest is written next to HLS master
+    playlist, so results are published on both protocols without
+    re-encoding or storing media twice.
+    """
+
+    def prepare_output(self, codecs_list: List[encoding.Codec]) -> encoding.Output:
+        return outputs.DASHOutput(**self.get_output_kwargs(codecs_list))
+
+    def get_output_kwargs(self, codecs_list: List[encoding.Codec]) -> Dict[str, Any]:
+        return dict(
+            format="dash",
+            seg_duration=self.profile.container.segment_duration,
+            codecs=codecs_list,
+            copyts=True,
+            avoid_negative_ts="auto",
+            use_template=1,
+            use_timeline=1,
+            adaptation_sets="id=0,streams=v id=1,streams=a",
+            init_seg_name="init-$RepresentationID$.m4s",
+            media_seg_name="segment-$RepresentationID$-$Number%05d$.m4s",
+            hls_playlist=1,
+            hls_master_name=os.path.basename(self.dst),
+            output_file=urljoin(self.dst, defaults.VIDEO_DASH_MANIFEST),
+        )
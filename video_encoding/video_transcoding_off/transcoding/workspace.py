@@ -1,4 +1,5 @@
 import abc
+import hashlib
 import http
 import os
 import shutil
@@ -11,6 +12,9 @@ import requests
 from apps.video_transcoding_off import defaults
 from apps.video_transcoding_off.utils import LoggerMixin
 
+# Read buffer size for file content hashing
+CHUNK_SIZE = 1024 * 1024
+
 
 class Resource(abc.ABC):
     """
@@ -105,6 +109,24 @@ class Workspace(LoggerMixin, abc.ABC):
     def exists(self, r: Resource) -> bool:  # pragma: no cover
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def copy(self, f: File, dst: ParseResult) -> None:  # pragma: no cover
+        """
+        Copies file to an absolute uri at the same storage.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def size(self, f: File) -> int:  # pragma: no cover
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def digest(self, f: File) -> str:  # pragma: no cover
+        """
+        :returns: sha256 hex digest of file content.
+        """
+        raise NotImplementedError
+
     def __init__(self, uri: ParseResult) -> None:
         super().__init__()
         self.uri = uri._replace(path=uri.path.rstrip("/"))
@@ -157,6 +179,24 @@ class FileSystemWorkspace(Workspace):
         with open(uri.path, "w") as f:
             f.write(content)
 
+    def copy(self, r: File, dst: ParseResult) -> None:
+        uri = self.get_absolute_uri(r)
+        self.logger.debug("copy %s to %s", uri.path, dst.path)
+        shutil.copyfile(uri.path, dst.path)
+
+    def size(self, r: File) -> int:
+        uri = self.get_absolute_uri(r)
+        return os.path.getsize(uri.path)
+
+    def digest(self, r: File) -> str:
+        uri = self.get_absolute_uri(r)
+        self.logger.debug("digest %s", uri.path)
+        h = hashlib.sha256()
+        with open(uri.path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
 
 class WebDAVWorkspace(Workspace):
     def __init__(self, base: str) -> None:
@@ -213,6 +253,39 @@ class WebDAVWorkspace(Workspace):
         resp = self.session.request("PUT", uri.geturl(), data=content)
         resp.raise_for_status()
 
+    def copy(self, r: File, dst: ParseResult) -> None:
+        uri = self.get_absolute_uri(r)
+        self.logger.debug("copy %s to %s", uri.geturl(), dst.geturl())
+        headers = {"Destination": dst.geturl(), "Overwrite": "T"}
+        resp = self.session.request("COPY", uri.geturl(), headers=headers)
+        resp.raise_for_status()
+
+    def size(self, r: File) -> int:
+        uri = self.get_absolute_uri(r)
+        timeout = (
+            defaults.VIDEO_CONNECT_TIMEOUT,
+            defaults.VIDEO_REQUEST_TIMEOUT,
+        )
+        resp = self.session.request("HEAD", uri.geturl(), timeout=timeout)
+        resp.raise_for_status()
+        return int(resp.headers.get("Content-Length", 0))
+
+    def digest(self, r: File) -> str:
+        uri = self.get_absolute_uri(r)
+        self.logger.debug("digest %s", uri.geturl())
+        h = hashlib.sha256()
+        timeout = (
+            defaults.VIDEO_CONNECT_TIMEOUT,
+            defaults.VIDEO_REQUEST_TIMEOUT,
+        )
+        with self.session.request(
+            "GET", uri.geturl(), timeout=timeout, stream=True
+        ) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                h.update(chunk)
+        return h.hexdigest()
+
     def _mkcol(self, c: Collection) -> None:
         uri = self.get_absolute_uri(c)
         if not uri.path.endswith("/"):
@@ -1,7 +1,7 @@
-import subprocess
-import re
-import os
 from typing import Callable, Optional
+
+from vidra_kit.progress import FFmpegProgress
+
 from .abstract_encoder import AbstractEncoder
 
 
@@ -20,11 +20,6 @@ class FFmpegEncoder(AbstractEncoder):
         """
         Transcodes using FFmpeg and reports progress if callback provided.
         """
-        # Probe duration first (so we can estimate percentage)
-        duration = self._get_duration(input_file)
-        if duration is None:
-            print("⚠️ Could not determine input duration; progress will be unavailable.")
-
         cmd = [
             "ffmpeg",
             "-i",
@@ -45,60 +40,11 @@ class FFmpegEncoder(AbstractEncoder):
         if output_file.endswith(".ts"):
             cmd.extend(["-f", "mpegts"])
 
-        # Add a pipe for progress output
-        progress_pipe = subprocess.PIPE
-        ffmpeg_proc = subprocess.Popen(
-            cmd,
-            stderr=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            universal_newlines=True,
-            bufsize=1,
-        )
-
-        if not progress_callback:
-            ffmpeg_proc.wait()
-            return ffmpeg_proc.returncode == 0
-
-        time_pattern = re.compile(r"time=(\d+:\d+:\d+\.\d+)")
-
-        # Read ffmpeg output line by line
-        for line in ffmpeg_proc.stderr:
-            match = time_pattern.search(line)
-            if match and duration:
-                current_time = self._time_to_seconds(match.group(1))
-                progress = min(current_time / duration, 1.0)
-                progress_callback(progress)
-
-        ffmpeg_proc.wait()
-        return ffmpeg_proc.returncode == 0
-
-    # --------------------------
-    # Helpers
-    # --------------------------
-
-    def _get_duration(self, filename: str) -> Optional[float]:
-        """Get duration (in seconds) using ffprobe."""
-        try:
-            result = subprocess.run(
-                [
-                    "ffprobe",
-                    "-v",
-                    "error",
-                    "-show_entries",
-                    "format=duration",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    filename,
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-            return float(result.stdout.strip())
-        except Exception:
-            return None
+        # ffmpeg reports progress to a dedicated pipe, duration is taken
+        # from its log, so no separate ffprobe run is needed
+        ffmpeg_proc = FFmpegProgress(cmd)
+        for progress in ffmpeg_proc:
+            if progress_callback and progress.percent is not None:
+                progress_callback(progress.percent)
 
-    def _time_to_seconds(self, timestr: str) -> float:
-        """Convert HH:MM:SS.xx → seconds."""
-        h, m, s = timestr.split(":")
-        return int(h) * 3600 + int(m) * 60 + float(s)
+        return ffmpeg_proc.wait() == 0
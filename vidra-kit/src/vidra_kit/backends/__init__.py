@@ -1,6 +1,7 @@
-from .api import AtemeApi, PublishEW
+from .api import AtemeApi, EdgewareStatusPoller, PublishEW
 
 __all__ = [
     'AtemeApi',
+    'EdgewareStatusPoller',
     'PublishEW',
 ]
@@ -1,11 +1,18 @@
 import ftplib
 import logging
-from time import sleep
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from uuid import uuid4
 
+from django.apps import apps
 from django.conf import settings
+from django.db.models import Min, Q
+from django.utils import timezone
 from requests.auth import HTTPBasicAuth
 
+from .ftp import FtpAgent
+
 logger = logging.getLogger(__name__)
 
 from pathlib import Path
@@ -13,6 +20,13 @@ from typing import Optional, Dict, Any
 import uuid
 
 
+def get_edgeware_model():
+    """
+    Model of Edgeware publications, set by EDGEWARE_MODEL setting.
+    """
+    return apps.get_model(getattr(settings, "EDGEWARE_MODEL", "vod.Edgeware"))
+
+
 class EdgewareAPIError(Exception):
     """Custom exception for Edgeware API errors"""
 
@@ -33,8 +47,17 @@ class EdgewareApi:
 
         # Default headers with API key
         self.headers = {"x-account-api-key": self.EW_KEY}
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        self._local = threading.local()
+
+    @property
+    def session(self) -> "requests.Session":
+        """HTTP session of current thread, sessions aren't thread safe"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
 
     def _get(
         self, endpoint: str, params: Optional[Dict[str, Any]] = None
@@ -57,9 +80,7 @@ class EdgewareApi:
         Check status of a specific content by ID
         """
         cid = content_id or self.content_id
-
-        cid = content_id or self.content_id
-        return self._get(f"/{cid}")
+        return self._get(f"content/{cid}")
 
     def list_content_page(self, limit: int = 100, offset: int = 0, **filters):
         """Fetch one page"""
@@ -69,7 +90,7 @@ class EdgewareApi:
 
     def get_content_by_id(self, content_id: str) -> Dict[str, Any]:
 
-        return self._get(f"/{content_id}")
+        return self._get(f"content/{content_id}")
 
     def search_content(self, query: str, **params) -> Dict[str, Any]:
 
@@ -190,7 +211,7 @@ class PublishEW:
         self.ftp_folder = self.FTP_REMOTE_DIR + self.src_dir.name
 
         self.content_id = content_id if content_id else str(uuid4())
-        self.ew = Edgeware.objects.create(title=self.title, ftp_dir=self.ftp_folder)
+        self.ew = get_edgeware_model().objects.create(title=self.title, ftp_dir=self.ftp_folder)
 
     def edgeware_check(self):
         headers = {"x-account-api-key": self.EW_KEY}
@@ -198,23 +219,6 @@ class PublishEW:
         res = requests.get(url, headers=headers)
         return res.json()
 
-    def pool_ew(self):
-        ew_ongoing = True
-
-        while ew_ongoing:
-            json_response = self.edgeware_check()
-            logger.debug(json.dumps(json_response, indent=4))
-
-            if json_response["state"] in ["error"]:
-                self.ew.msg = json_response
-                self.ew.status = self.ew.Status.EW_ERROR
-                self.ew.save()
-                ew_ongoing = json_response["state"] == "ongoing"
-
-            sleep(5)
-
-        logger.info("DONE")
-
     # Function to call Edgeware API and extract the "dash" URL
     def edgeware_create(self):
         logger.info(f"Calling Edgeware API with content_id: {self.content_id}")
@@ -230,62 +234,25 @@ class PublishEW:
         headers = {"x-account-api-key": self.EW_KEY}
 
         res = requests.post(self.EW_API, json=payload, headers=headers)
-        self.ew.status = self.ew.Status.EW_PENDIND
+        self.ew.status = self.ew.Status.EW_PENDING
 
         self.ew.msg = res.json()
         self.ew.content_id = self.content_id
 
         for key, uri in res.json()["delivery_uris"].items():
-            DeliveryUri.objects.create(type=key, uri=uri, ew=self.ew)
+            self.ew.delivery_uris.create(type=key, uri=uri)
 
         self.ew.save()
 
-    def _upload_directory(self, ftp, local_dir: Path, remote_dir):
-        """Recursively upload a directory to an FTP server."""
-        # Ensure remote directory exists
+    def ftp_upload_dir(self, workers: int = 4):
+        """Upload package directory to FTP server, manifests last."""
         try:
-            ftp.mkd(remote_dir)
-            logger.info(f"Created remote ftp dir: {remote_dir}")
-
-        except ftplib.error_perm:
-            logger.info(f"Directory already exist: {remote_dir}")
-            pass
-
-        ftp.cwd(remote_dir)
-        logger.info(f"FTP set cwd: {remote_dir}")
-
-        # Iterate through local directory
-        for item in local_dir.iterdir():
-            # local_path = os.path.join(local_dir, item)
-
-            if item.is_file() and item.suffix in [".mp4", ".mpd"]:
-                # Upload file
-                logger.info(f"Uploading file: {item}")
-                with open(item, "rb") as file:
-                    ftp.storbinary(f"STOR {item.name}", file)
-
-            # elif os.path.isdir(local_path):
-            #     # Recursively upload directory
-            #     logger.info(f"Entering directory: {local_path}")
-            #     self._upload_directory(ftp, item, item)
-
-        # Move back to parent directory
-        ftp.cwd("..")
-
-    def ftp_upload_dir(self):
-        """Connect to FTP server and upload directory."""
-        try:
-            # Connect to FTP server
-            ftp = ftplib.FTP(self.FTP_HOST)
-            ftp.login(self.FTP_USER, self.FTP_PASS)
-            logger.info(f"Connected to {self.FTP_HOST}")
-
-            # Upload directory
-            self._upload_directory(ftp, self.src_dir, self.ftp_folder)
-
-            # Close connection
-            ftp.quit()
-            logger.info("Upload completed successfully")
+            with FtpAgent(self.FTP_HOST, user=self.FTP_USER, passwd=self.FTP_PASS) as agent:
+                logger.info(f"Connected to {self.FTP_HOST}")
+                results = agent.upload_directory(
+                    self.src_dir, self.ftp_folder, suffixes=(".mp4", ".mpd"), last=(".mpd",), workers=workers
+                )
+            logger.info(f"Upload completed successfully: {len(results)} files")
             self.ew.status = self.ew.Status.FTP_UPLOAD
 
         except ftplib.all_errors as e:
@@ -299,10 +266,110 @@ class PublishEW:
             self.ew.save()
 
     def publish(self):
+        """
+        Upload package and submit it to Edgeware.
 
+        Ingest progress is tracked by EdgewareStatusPoller, so the caller
+        (i.e. a Celery worker) is free right after submission.
+        """
         self.ftp_upload_dir()
         self.edgeware_create()
-        self.pool_ew()
+
+
+class EdgewareStatusPoller:
+    """
+    Tracks Edgeware ingest state of all pending publications.
+
+    Each pass checks due publications concurrently and saves state
+    transitions. Every publication is checked on its own interval, kept on
+    the model, which grows while its state doesn't change. So the backoff
+    holds across passes run by separate processes, i.e. celery beat tasks.
+
+    Only terminal states change a publication: "done" is saved as EW_DONE
+    and "error" as EW_ERROR. Any other state (ongoing, queued, ...) keeps
+    it pending.
+
+    Run `run()` in a dedicated process (manage.py poll_edgeware) or call
+    `poll_once()` from a periodic task (vod.tasks.poll_edgeware).
+    """
+
+    DONE = "done"
+    ERROR = "error"
+
+    MIN_INTERVAL = 5
+    MAX_INTERVAL = 300
+    BACKOFF = 2
+
+    def __init__(self, api: Optional[EdgewareApi] = None, workers: int = 8) -> None:
+        self.api = api or EdgewareApi()
+        self.workers = workers
+        self.model = get_edgeware_model()
+
+    def pending(self):
+        return self.model.objects.filter(status=self.model.Status.EW_PENDING).exclude(content_id=None)
+
+    def due(self, now):
+        return self.pending().filter(Q(next_check=None) | Q(next_check__lte=now))
+
+    def _check(self, ew) -> Optional[Dict[str, Any]]:
+        try:
+            return self.api.check_content(ew.content_id)
+        except EdgewareAPIError as e:
+            logger.warning(f"Edgeware check of {ew.content_id} failed: {e}")
+            return None
+
+    def poll_once(self) -> float:
+        """
+        Check due pending publications once.
+
+        Returns:
+            Seconds to wait before the next pass.
+        """
+        now = timezone.now()
+        due = list(self.due(now))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            responses = list(executor.map(self._check, due))
+
+        changed = 0
+        for ew, data in zip(due, responses):
+            state = (data or {}).get("state")
+            if state == self.DONE:
+                ew.status = ew.Status.EW_DONE
+            elif state == self.ERROR:
+                ew.status = ew.Status.EW_ERROR
+            else:
+                # back off while nothing happens
+                ew.check_interval = min(max(ew.check_interval * self.BACKOFF, self.MIN_INTERVAL), self.MAX_INTERVAL)
+                ew.next_check = now + timedelta(seconds=ew.check_interval)
+                ew.save(update_fields=["check_interval", "next_check"])
+                continue
+            ew.msg = data
+            ew.save(update_fields=["msg", "status"])
+            logger.info(f"Edgeware content {ew.content_id}: {state}")
+            changed += 1
+
+        next_check = self.pending().aggregate(next_check=Min("next_check"))["next_check"]
+        if next_check is None:
+            # nothing pending, or new publications not checked yet
+            interval = self.MAX_INTERVAL if not self.pending().exists() else self.MIN_INTERVAL
+        else:
+            interval = (next_check - timezone.now()).total_seconds()
+            interval = min(max(interval, self.MIN_INTERVAL), self.MAX_INTERVAL)
+        logger.debug(f"Checked {len(due)} Edgeware contents, {changed} finished, next in {interval}s")
+        return interval
+
+    def run(self, stop: Optional[threading.Event] = None) -> None:
+        """
+        Poll until `stop` is set.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                interval = self.poll_once()
+            except Exception:
+                logger.exception("Edgeware status poll failed")
+                interval = self.MAX_INTERVAL
+            stop.wait(interval)
 
 
 def fetch_rabbitmq_queues():
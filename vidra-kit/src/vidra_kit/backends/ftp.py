@@ -1,10 +1,22 @@
-from ftplib import FTP, error_perm
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+from ftplib import FTP, error_perm, error_reply, error_temp
 from datetime import datetime
+from pathlib import Path
 from typing import List, Dict, Generator, Optional
+import hashlib
+import json
 import logging
+import queue
+import threading
 
 logger = logging.getLogger(__name__)
 
+# storbinary block size for uploads, the default 8 KiB is too small for media
+UPLOAD_BLOCKSIZE = 1024 * 1024
+
 
 class FtpAgent:
     """
@@ -33,28 +45,36 @@ class FtpAgent:
 
         self._ftp: Optional[FTP] = None
 
-    def __enter__(self):
-        """Connect and login to FTP server when entering context"""
+    def _connect(self) -> FTP:
+        """Open a new logged-in control connection"""
         try:
-            self._ftp = FTP(timeout=self.timeout, encoding=self.encoding)
-            self._ftp.connect(host=self.host, port=self.port)
-            self._ftp.login(user=self.user, passwd=self.passwd)
-
-            logger.info(f"Successfully connected to ftp://{self.host}")
-            return self
+            ftp = FTP(timeout=self.timeout, encoding=self.encoding)
+            ftp.connect(host=self.host, port=self.port)
+            ftp.login(user=self.user, passwd=self.passwd)
+            return ftp
         except Exception as e:
             raise ConnectionError(f"Failed to connect to FTP {self.host}: {e}") from e
 
+    @staticmethod
+    def _disconnect(ftp: FTP) -> None:
+        try:
+            ftp.quit()
+        except:
+            try:
+                ftp.close()
+            except:
+                pass
+
+    def __enter__(self):
+        """Connect and login to FTP server when entering context"""
+        self._ftp = self._connect()
+        logger.info(f"Successfully connected to ftp://{self.host}")
+        return self
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Safely close connection on exit"""
         if self._ftp:
-            try:
-                self._ftp.quit()
-            except:
-                try:
-                    self._ftp.close()
-                except:
-                    pass
+            self._disconnect(self._ftp)
             self._ftp = None
         if exc_type:
             logger.error(f"FTP session ended with error: {exc_val}")
@@ -70,13 +90,16 @@ class FtpAgent:
         """
         if not self._ftp:
             raise RuntimeError("FTP connection not established. Use 'with' statement.")
+        return self._list_dir(self._ftp, remote_path)
 
+    def _list_dir(self, ftp: FTP, remote_path: str = "") -> List[Dict[str, str]]:
+        """list_dir() over the given control connection"""
         path = remote_path or "."
         entries = []
 
         try:
             # MLSD is modern, structured, and reliable (preferred)
-            for name, facts in self._ftp.mlsd(path=path):
+            for name, facts in ftp.mlsd(path=path):
                 if self._should_skip(name):
                     continue
 
@@ -95,7 +118,7 @@ class FtpAgent:
         except error_perm:
             # Fallback to classic LIST parsing if MLSD not supported
             logger.warning("MLSD not supported, falling back to LIST parsing")
-            entries = self._parse_list_output(path)
+            entries = self._parse_list_output(path, ftp)
 
         return entries
 
@@ -104,21 +127,63 @@ class FtpAgent:
         Recursively walk FTP directory tree (like os.walk).
         Yields (dirpath, dirs, files) for each directory.
         """
+        dirs, files = self._split_entries(self.list_dir(top))
+
+        yield top, dirs, files
+
+        for dir_entry in dirs:
+            subpath = f"{top}/{dir_entry['name']}".replace("//", "/")
+            yield from self.walk(subpath)
+
+    def walk_parallel(
+        self, top: str = ".", workers: int = 8, max_pending: Optional[int] = None
+    ) -> Generator[tuple[str, List[Dict], List[Dict]], None, None]:
+        """
+        Walk FTP directory tree listing up to `workers` directories at once.
+
+        Directories are listed breadth-first over a pool of logged-in
+        connections; at most `max_pending` listings (default 4 * workers) are
+        submitted at a time. Discovered directories waiting to be listed are
+        kept in memory, their number is not bounded. Yields the same
+        (dirpath, dirs, files) tuples as walk(), in completion order.
+        """
+        max_pending = max_pending or workers * 4
+        pool = FtpConnectionPool(self, workers)
+        pending_dirs = deque([top])
+        futures = set()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            while pending_dirs or futures:
+                while pending_dirs and len(futures) < max_pending:
+                    path = pending_dirs.popleft()
+                    futures.add(executor.submit(self._pooled_list, pool, path))
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, entries = future.result()
+                    dirs, files = self._split_entries(entries)
+                    for d in dirs:
+                        pending_dirs.append(f"{path}/{d['name']}".replace("//", "/"))
+                    yield path, dirs, files
+        finally:
+            # consumer may stop early, don't list the rest of the tree
+            executor.shutdown(wait=True, cancel_futures=True)
+            pool.close()
+
+    def _pooled_list(self, pool: "FtpConnectionPool", path: str) -> tuple[str, List[Dict]]:
+        with pool.connection() as ftp:
+            return path, self._list_dir(ftp, path)
+
+    @staticmethod
+    def _split_entries(entries: List[Dict]) -> tuple[List[Dict], List[Dict]]:
         dirs = []
         files = []
-
-        for entry in self.list_dir(top):
+        for entry in entries:
             if entry["type"] == "dir" or entry["type"] in ("cdir", "pdir"):
                 if entry["name"] not in {".", ".."}:
                     dirs.append(entry)
             else:
                 files.append(entry)
-
-        yield top, dirs, files
-
-        for dir_entry in dirs:
-            subpath = f"{top}/{dir_entry['name']}".replace("//", "/")
-            yield from self.walk(subpath)
+        return dirs, files
 
     def find_files(
         self,
@@ -128,12 +193,30 @@ class FtpAgent:
         min_size: Optional[int] = None,
         max_size: Optional[int] = None,
         newer_than: Optional[datetime] = None,
+        workers: int = 1,
     ) -> List[Dict]:
         """
         Search for files matching criteria.
         Supports glob-like name_pattern (simple wildcard * only).
         """
-        results = []
+        return list(self.iter_files(
+            remote_path, name_pattern, recursive, min_size, max_size, newer_than, workers
+        ))
+
+    def iter_files(
+        self,
+        remote_path: str = ".",
+        name_pattern: str = "*",
+        recursive: bool = True,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        newer_than: Optional[datetime] = None,
+        workers: int = 1,
+    ) -> Generator[Dict, None, None]:
+        """
+        Same as find_files(), but yields files as directories are listed.
+        With workers > 1 the tree is walked by walk_parallel().
+        """
 
         def matches(name: str) -> bool:
             if name_pattern == "*" or name_pattern == "":
@@ -146,7 +229,12 @@ class FtpAgent:
                 return name.startswith(name_pattern[:-1])
             return name == name_pattern
 
-        iterator = self.walk(remote_path) if recursive else [ (remote_path, [], self.list_dir(remote_path)) ]
+        if not recursive:
+            iterator = [(remote_path, [], self.list_dir(remote_path))]
+        elif workers > 1:
+            iterator = self.walk_parallel(remote_path, workers=workers)
+        else:
+            iterator = self.walk(remote_path)
 
         for dirpath, _, files in iterator:
             for f in files:
@@ -161,9 +249,183 @@ class FtpAgent:
                 if newer_than and (f["modify"] is None or f["modify"] < newer_than):
                     continue
 
-                results.append(f)
+                yield f
+
+    # ------------------------------------------------------------------
+    # Upload
+    # ------------------------------------------------------------------
+
+    def upload_directory(
+        self,
+        local_dir: Path,
+        remote_dir: str,
+        suffixes: tuple = (".mp4", ".m4s", ".mpd", ".m3u8"),
+        last: tuple = (".mpd", ".m3u8"),
+        workers: int = 4,
+        blocksize: int = UPLOAD_BLOCKSIZE,
+        retries: int = 2,
+    ) -> Dict[str, str]:
+        """
+        Upload files of a local directory in parallel over a connection pool.
+
+        Media files already present with the same size are skipped,
+        partially uploaded files are resumed with REST. Manifests (`last`
+        suffixes) are always uploaded whole, because a re-packaged manifest
+        may have the same size, and only after all media files succeeded, so
+        a consumer never sees a manifest referring to missing segments.
 
-        return results
+        Returns:
+            Mapping of file name to "uploaded", "resumed" or "skipped".
+        """
+        local_dir = Path(local_dir)
+        files = sorted(p for p in local_dir.iterdir() if p.is_file() and p.suffix in suffixes)
+        media = [p for p in files if p.suffix not in last]
+        manifests = [p for p in files if p.suffix in last]
+
+        pool = FtpConnectionPool(self, workers)
+        try:
+            with pool.connection() as ftp:
+                try:
+                    ftp.mkd(remote_dir)
+                    logger.info(f"Created remote ftp dir: {remote_dir}")
+                except error_perm:
+                    logger.info(f"Directory already exist: {remote_dir}")
+
+            results: Dict[str, str] = {}
+            for batch, force in ((media, False), (manifests, True)):
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {
+                        executor.submit(
+                            self._upload_file, pool, p, f"{remote_dir}/{p.name}", blocksize, retries, force
+                        ): p
+                        for p in batch
+                    }
+                    for future, p in futures.items():
+                        # raises on failure, manifests are not uploaded then
+                        results[p.name] = future.result()
+            return results
+        finally:
+            pool.close()
+
+    def _upload_file(
+        self,
+        pool: "FtpConnectionPool",
+        local: Path,
+        remote: str,
+        blocksize: int,
+        retries: int,
+        force: bool = False,
+    ) -> str:
+        size = local.stat().st_size
+        for attempt in range(retries + 1):
+            try:
+                with pool.connection() as ftp:
+                    ftp.voidcmd("TYPE I")
+                    if force:
+                        remote_size = 0
+                    else:
+                        try:
+                            remote_size = ftp.size(remote) or 0
+                        except error_perm:
+                            # no such file
+                            remote_size = 0
+                    if not force and remote_size == size:
+                        logger.debug(f"Skipping {remote}: already uploaded")
+                        return "skipped"
+                    offset = remote_size if remote_size < size else 0
+                    with local.open("rb") as f:
+                        f.seek(offset)
+                        ftp.storbinary(f"STOR {remote}", f, blocksize=blocksize, rest=offset or None)
+                    logger.info(f"Uploaded {local} to {remote}" + (f" from {offset}" if offset else ""))
+                    return "resumed" if offset else "uploaded"
+            except (OSError, EOFError, error_temp, error_reply) as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"Upload of {local} failed ({e}), retrying")
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def scan_changes(self, snapshot: "FtpSnapshot", top: str = ".", full: bool = False) -> List["ChangeEvent"]:
+        """
+        Compare the tree with a stored snapshot and return file change events.
+
+        Servers update a directory's modify time when entries are added,
+        removed or renamed in it, but not for deeper changes or for files
+        growing in place. So directories with subdirectories are always
+        listed, and a leaf directory is skipped (carried over from the
+        snapshot) only if its modify time is unchanged and its listing was
+        stable in the previous scan: a directory whose listing changed is
+        listed again on next scans until sizes of files being uploaded stop
+        changing. Files rewritten in place in a settled leaf directory are
+        only noticed with `full=True`, run it periodically.
+
+        The snapshot is updated and saved after the scan.
+        """
+        old = snapshot.load()
+        new: Dict[str, Dict] = {}
+        events: List[ChangeEvent] = []
+        stack = [top]
+        listed = 0
+        while stack:
+            path = stack.pop()
+            entries = {e["name"]: e for e in self.list_dir(path)}
+            listed += 1
+            record = {
+                "modify": old.get(path, {}).get("modify"),
+                "fingerprint": FtpSnapshot.fingerprint(entries.values()),
+                "entries": {n: FtpSnapshot.entry_state(e) for n, e in entries.items()},
+            }
+            if path in new:
+                record["modify"] = new[path]["modify"]
+            prev = old.get(path)
+            prev_entries = prev.get("entries", {}) if prev else {}
+            changed = prev is None or prev.get("fingerprint") != record["fingerprint"]
+            # files may still be uploading, list again on next scan
+            record["unsettled"] = changed
+            new[path] = record
+            if changed:
+                events.extend(self._diff_listing(path, entries, prev_entries, old))
+
+            for name, entry in entries.items():
+                if entry["type"] != "dir":
+                    continue
+                subpath = f"{path}/{name}".replace("//", "/")
+                modify = record["entries"][name][2]
+                known = old.get(subpath)
+                if full or known is None or known.get("modify") != modify or not FtpSnapshot.is_settled_leaf(known):
+                    new[subpath] = {"modify": modify}
+                    stack.append(subpath)
+                else:
+                    # unchanged leaf directory, keep it from the snapshot
+                    new[subpath] = known
+
+        snapshot.save(new)
+        logger.info(f"Scanned ftp://{self.host}/{top}: listed {listed} of {len(new)} dirs, {len(events)} changes")
+        return events
+
+    @staticmethod
+    def _diff_listing(path: str, entries: Dict[str, Dict], prev_entries: Dict[str, list], old: Dict[str, Dict]) -> List["ChangeEvent"]:
+        events = []
+        for name, entry in entries.items():
+            if entry["type"] == "dir":
+                continue
+            state = FtpSnapshot.entry_state(entry)
+            if name not in prev_entries:
+                events.append(ChangeEvent(ADDED, entry["path"], entry))
+            elif prev_entries[name] != state:
+                events.append(ChangeEvent(CHANGED, entry["path"], entry))
+        for name, (kind, size, modify) in prev_entries.items():
+            if name in entries and entries[name]["type"] == kind:
+                continue
+            if kind == "dir":
+                # the whole subtree is gone
+                subpath = f"{path}/{name}".replace("//", "/")
+                for p in FtpSnapshot.subtree(old, subpath):
+                    for n, (k, _, _) in old[p]["entries"].items():
+                        if k != "dir":
+                            events.append(ChangeEvent(REMOVED, f"{p}/{n}".strip("/"), None))
+            else:
+                events.append(ChangeEvent(REMOVED, f"{path}/{name}".replace("//", "/").strip("/"), None))
+        return events
 
     # ------------------------------------------------------------------
     # Helper methods
@@ -184,10 +446,10 @@ class FtpAgent:
 
 
 
-    def _parse_list_output(self, path: str) -> List[Dict]:
+    def _parse_list_output(self, path: str, ftp: Optional[FTP] = None) -> List[Dict]:
         """Fallback parsing of traditional LIST command output"""
         lines = []
-        self._ftp.dir(path, lines.append)
+        (ftp or self._ftp).dir(path, lines.append)
         entries = []
         for line in lines:
             parts = line.split(None, 8)
@@ -217,6 +479,122 @@ class FtpAgent:
         return entries
 
 
+ADDED = "added"
+CHANGED = "changed"
+REMOVED = "removed"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    kind: str
+    """ added, changed or removed."""
+    path: str
+    entry: Optional[Dict] = None
+    """ Current list_dir() entry, None for removed files."""
+
+
+class FtpSnapshot:
+    """
+    Persisted directory listings of an FTP tree (a json file).
+
+    Each directory is stored as its modify time reported by the parent,
+    a fingerprint of its listing, (type, size, modify) of its entries and
+    whether the listing changed in the scan ("unsettled").
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def load(self) -> Dict[str, Dict]:
+        try:
+            with self.path.open() as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning(f"Ignoring corrupted FTP snapshot {self.path}")
+            return {}
+
+    def save(self, data: Dict[str, Dict]) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("w") as f:
+            json.dump(data, f)
+        tmp.replace(self.path)
+
+    @staticmethod
+    def entry_state(entry: Dict) -> list:
+        modify = entry.get("modify")
+        return [entry.get("type"), entry.get("size"), modify.isoformat() if modify else None]
+
+    @classmethod
+    def fingerprint(cls, entries) -> str:
+        h = hashlib.sha1()
+        for entry in sorted(entries, key=lambda e: e["name"]):
+            h.update(json.dumps([entry["name"], *cls.entry_state(entry)]).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def is_settled_leaf(record: Dict) -> bool:
+        """
+        Directory without subdirectories whose listing didn't change in the
+        scan that recorded it.
+        """
+        if "entries" not in record or record.get("unsettled", True):
+            return False
+        return all(kind != "dir" for kind, _, _ in record["entries"].values())
+
+    @staticmethod
+    def subtree(data: Dict[str, Dict], path: str) -> List[str]:
+        prefix = path + "/"
+        return [p for p in data if p == path or p.startswith(prefix)]
+
+
+class FtpConnectionPool:
+    """
+    Pool of logged-in control connections of an FtpAgent.
+
+    Connections are opened lazily up to `size`; a connection which failed
+    during use (network or protocol error) is closed instead of being
+    returned to the pool, after other errors it is reused.
+    """
+
+    def __init__(self, agent: FtpAgent, size: int):
+        self.agent = agent
+        self._idle: "queue.LifoQueue[FTP]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._all: List[FTP] = []
+
+    @contextmanager
+    def connection(self) -> Generator[FTP, None, None]:
+        with self._slots:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                ftp = self.agent._connect()
+                with self._lock:
+                    self._all.append(ftp)
+            try:
+                yield ftp
+            except (OSError, EOFError, error_temp, error_reply):
+                with self._lock:
+                    self._all.remove(ftp)
+                self.agent._disconnect(ftp)
+                raise
+            except Exception:
+                # i.e. error_perm, the connection itself is still usable
+                self._idle.put(ftp)
+                raise
+            else:
+                self._idle.put(ftp)
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._all = self._all, []
+        for ftp in connections:
+            self.agent._disconnect(ftp)
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
 
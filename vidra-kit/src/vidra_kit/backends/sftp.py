@@ -10,6 +10,9 @@ import io
 import os
 import posixpath
 import stat
+import threading
+import time
+from collections import namedtuple
 from urllib.parse import urljoin
 
 import paramiko
@@ -17,9 +20,19 @@ from django.core.files.base import File
 from django.utils.deconstruct import deconstructible
 from paramiko.util import ClosingContextManager
 
+from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 from django.core.files.storage import Storage
 
+# SSH channel window and packet size; paramiko defaults (2 MiB / 32 KiB) cap
+# throughput on links with high bandwidth-delay product
+WINDOW_SIZE = 64 * 1024 * 1024
+MAX_PACKET_SIZE = 256 * 1024
+# chunk size for uploads and read buffer size
+BUFFER_SIZE = 1024 * 1024
+# bytes requested ahead of a sequential reader, see SFTPReadAhead
+READ_AHEAD = 16 * 1024 * 1024
+
 
 class BaseStorage(Storage):
     def __init__(self, **settings):
@@ -58,12 +71,111 @@ def setting(name, default=None):
     """
     return getattr(settings, name, default)
 
+_Connection = namedtuple("_Connection", ["ssh", "sftp"])
+
+
+class SFTPConnectionPool:
+    """
+    SFTP connections shared by threads.
+
+    Every thread sticks to one connection. Up to `size` connections are
+    opened, beyond that threads share them round-robin (paramiko SFTP
+    clients serialise requests internally). Dead connections are replaced.
+    """
+
+    def __init__(self, connect, size):
+        self._connect = connect
+        self.size = max(1, size)
+        self._connections = []
+        # connection -> number of threads sticking to it
+        self._users = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @staticmethod
+    def _alive(connection):
+        transport = connection.ssh.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _detach(self, connection):
+        """Forget a thread using connection, returns whether it is unused."""
+        users = self._users.get(connection, 0) - 1
+        if users > 0:
+            self._users[connection] = users
+            return False
+        self._users.pop(connection, None)
+        if connection in self._connections:
+            self._connections.remove(connection)
+        return True
+
+    def get(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._alive(connection):
+            return connection.sftp
+        with self._lock:
+            if connection is not None:
+                self._detach(connection)
+            self._connections = [c for c in self._connections if self._alive(c)]
+            if len(self._connections) < self.size:
+                connection = self._connect()
+                self._connections.append(connection)
+            else:
+                connection = self._connections[self._next % len(self._connections)]
+                self._next += 1
+            self._users[connection] = self._users.get(connection, 0) + 1
+        self._local.connection = connection
+        return connection.sftp
+
+    def release(self):
+        """
+        Release connection of current thread.
+
+        The connection is closed unless other threads still use it.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            return
+        self._local.connection = None
+        with self._lock:
+            unused = self._detach(connection)
+        if unused:
+            connection.ssh.close()
+
+    def close(self):
+        """Close all connections, including ones used by other threads."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._users.clear()
+        for connection in connections:
+            connection.ssh.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def close_pools():
+    """
+    Close connections of all SFTP storages, i.e. at process shutdown.
+
+    Connections are closed even if other threads are transferring files.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
 @deconstructible
 class SFTPStorage(ClosingContextManager, BaseStorage):
     def __init__(self, **settings):
         super().__init__(**settings)
-        self._ssh = None
-        self._sftp = None
+        self._pool = None
+        # remote path -> (SFTPAttributes, expires at), filled by listdir
+        self._stat_cache = {}
+        self._stat_lock = threading.Lock()
 
     def get_default_settings(self):
         return {
@@ -77,23 +189,29 @@ class SFTPStorage(ClosingContextManager, BaseStorage):
             "known_host_file": setting("SFTP_KNOWN_HOST_FILE"),
             "root_path": setting("SFTP_STORAGE_ROOT", ""),
             "base_url": setting("SFTP_BASE_URL") or setting("MEDIA_URL"),
+            "pool_size": setting("SFTP_STORAGE_POOL_SIZE", 4),
+            "window_size": setting("SFTP_STORAGE_WINDOW_SIZE", WINDOW_SIZE),
+            "max_packet_size": setting("SFTP_STORAGE_MAX_PACKET_SIZE", MAX_PACKET_SIZE),
+            "buffer_size": setting("SFTP_STORAGE_BUFFER_SIZE", BUFFER_SIZE),
+            "read_ahead": setting("SFTP_STORAGE_READ_AHEAD", READ_AHEAD),
+            "stat_cache_ttl": setting("SFTP_STORAGE_STAT_CACHE_TTL", 5),
         }
 
     def _connect(self):
-        self._ssh = paramiko.SSHClient()
+        ssh = paramiko.SSHClient()
 
         known_host_file = self.known_host_file or os.path.expanduser(
             os.path.join("~", ".ssh", "known_hosts")
         )
 
         if os.path.exists(known_host_file):
-            self._ssh.load_host_keys(known_host_file)
+            ssh.load_host_keys(known_host_file)
 
         # and automatically add new host keys for hosts we haven't seen before.
-        self._ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
         try:
-            self._ssh.connect(self.host, **self.params)
+            ssh.connect(self.host, **self.params)
         except paramiko.AuthenticationException as e:
             if self.interactive and "password" not in self.params:
                 # If authentication has failed, and we haven't already tried
@@ -102,24 +220,55 @@ class SFTPStorage(ClosingContextManager, BaseStorage):
                 if "username" not in self.params:
                     self.params["username"] = getpass.getuser()
                 self.params["password"] = getpass.getpass()
-                self._connect()
+                return self._connect()
             else:
                 raise paramiko.AuthenticationException(e)
 
-        if self._ssh.get_transport():
-            self._sftp = self._ssh.open_sftp()
+        transport = ssh.get_transport()
+        if transport is None:
+            raise paramiko.SSHException(f"Connection to {self.host} failed")
+        # applied to the SFTP channel opened below
+        transport.default_window_size = self.window_size
+        transport.default_max_packet_size = self.max_packet_size
+        return _Connection(ssh, ssh.open_sftp())
+
+    def _get_pool(self):
+        if self._pool is None:
+            # storages with the same server and credentials share connections
+            key = (self.host, repr(sorted(self.params.items())))
+            with _pools_lock:
+                if key not in _pools:
+                    _pools[key] = SFTPConnectionPool(self._connect, self.pool_size)
+                self._pool = _pools[key]
+        return self._pool
 
     def close(self):
-        if self._ssh is None:
+        """
+        Release SFTP connection of current thread.
+
+        Pool is shared by storages with the same server and credentials, so
+        connections of other threads are kept, see `close_pools()`.
+        """
+        if self._pool is None:
             return
-        self._ssh.close()
+        self._pool.release()
 
     @property
     def sftp(self):
-        """Lazy SFTP connection"""
-        if not self._sftp or not self._ssh.get_transport().is_active():
-            self._connect()
-        return self._sftp
+        """Lazy SFTP connection of current thread"""
+        return self._get_pool().get()
+
+    def _stat(self, path):
+        """Stat a remote path, using attributes cached by listdir."""
+        with self._stat_lock:
+            cached = self._stat_cache.get(path)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        return self.sftp.stat(path)
+
+    def _invalidate(self, path):
+        with self._stat_lock:
+            self._stat_cache.pop(path, None)
 
     def _remote_path(self, name):
         return posixpath.join(self.root_path, name)
@@ -127,9 +276,14 @@ class SFTPStorage(ClosingContextManager, BaseStorage):
     def _open(self, name, mode="rb"):
         return SFTPStorageFile(name, self, mode)
 
-    def _read(self, name):
+    def _read(self, name, size=None):
         remote_path = self._remote_path(name)
-        return self.sftp.open(remote_path, "rb")
+        f = self.sftp.open(remote_path, "rb", bufsize=self.buffer_size)
+        if size is None or not self.read_ahead:
+            return f
+        return io.BufferedReader(
+            SFTPReadAhead(f, size, self.read_ahead, self.buffer_size), self.buffer_size
+        )
 
     def _chown(self, path, uid=None, gid=None):
         """Set uid and/or gid for file at path."""
@@ -164,7 +318,15 @@ class SFTPStorage(ClosingContextManager, BaseStorage):
         if not self._path_exists(dirname):
             self._mkdir(dirname)
 
-        self.sftp.putfo(content, path)
+        self._invalidate(path)
+        with self.sftp.open(path, "wb", bufsize=self.buffer_size) as f:
+            # don't wait for the server to acknowledge each write
+            f.set_pipelined(True)
+            while True:
+                chunk = content.read(self.buffer_size)
+                if not chunk:
+                    break
+                f.write(chunk)
 
         # set file permissions if configured
         if self.file_mode is not None:
@@ -174,8 +336,10 @@ class SFTPStorage(ClosingContextManager, BaseStorage):
         return name
 
     def delete(self, name):
+        path = self._remote_path(name)
+        self._invalidate(path)
         try:
-            self.sftp.remove(self._remote_path(name))
+            self.sftp.remove(path)
         except OSError:
             pass
 
@@ -183,7 +347,7 @@ class SFTPStorage(ClosingContextManager, BaseStorage):
         """Determines whether a file existis in the sftp storage given its
         absolute path."""
         try:
-            self.sftp.stat(path)
+            self._stat(path)
             return True
         except FileNotFoundError:
             return False
@@ -206,7 +370,18 @@ class SFTPStorage(ClosingContextManager, BaseStorage):
     def listdir(self, path):
         remote_path = self._remote_path(path)
         dirs, files = [], []
-        for item in self.sftp.listdir_attr(remote_path):
+        items = self.sftp.listdir_attr(remote_path)
+        if self.stat_cache_ttl:
+            # attributes come with the listing, keep them for size/exists/
+            # modified time lookups which usually follow listdir
+            expires = time.monotonic() + self.stat_cache_ttl
+            with self._stat_lock:
+                for item in items:
+                    self._stat_cache[posixpath.join(remote_path, item.filename)] = (item, expires)
+                if len(self._stat_cache) > 100_000:
+                    now = time.monotonic()
+                    self._stat_cache = {k: v for k, v in self._stat_cache.items() if v[1] > now}
+        for item in items:
             if self._isdir_attr(item):
                 dirs.append(item.filename)
             else:
@@ -215,7 +390,7 @@ class SFTPStorage(ClosingContextManager, BaseStorage):
 
     def size(self, name):
         remote_path = self._remote_path(name)
-        return self.sftp.stat(remote_path).st_size
+        return self._stat(remote_path).st_size
 
     # From Django
     def _datetime_from_timestamp(self, ts):
@@ -224,12 +399,12 @@ class SFTPStorage(ClosingContextManager, BaseStorage):
 
     def get_accessed_time(self, name):
         remote_path = self._remote_path(name)
-        utime = self.sftp.stat(remote_path).st_atime
+        utime = self._stat(remote_path).st_atime
         return self._datetime_from_timestamp(utime)
 
     def get_modified_time(self, name):
         remote_path = self._remote_path(name)
-        utime = self.sftp.stat(remote_path).st_mtime
+        utime = self._stat(remote_path).st_mtime
         return self._datetime_from_timestamp(utime)
 
     def url(self, name):
@@ -238,6 +413,74 @@ class SFTPStorage(ClosingContextManager, BaseStorage):
         return urljoin(self.base_url, name).replace("\\", "/")
 
 
+class SFTPReadAhead(io.RawIOBase):
+    """
+    Remote file reader requesting up to `window` bytes ahead.
+
+    Paramiko reads a file with one synchronous 32 KiB request per
+    round-trip. Here the next `window` bytes are requested at once with
+    readv, which pipelines the requests, and are returned as they arrive.
+    Unlike `SFTPFile.prefetch()`, no more than a window is requested when
+    reading stops early or seeks elsewhere.
+    """
+
+    def __init__(self, f, size, window, chunk_size):
+        self._file = f
+        self._size = size
+        self._window = max(window, chunk_size)
+        self._chunk_size = chunk_size
+        self._pos = 0
+        self._blocks = iter(())
+        self._data = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset != self._pos:
+            # blocks requested for the old position are dropped
+            self._blocks = iter(())
+            self._data = memoryview(b"")
+            self._pos = offset
+        return self._pos
+
+    def _request(self):
+        """Requests the window at current position."""
+        end = min(self._pos + self._window, self._size)
+        chunks = [
+            (offset, min(self._chunk_size, end - offset))
+            for offset in range(self._pos, end, self._chunk_size)
+        ]
+        return self._file.readv(chunks) if chunks else iter(())
+
+    def readinto(self, b):
+        if not self._data:
+            self._data = memoryview(next(self._blocks, b""))
+        if not self._data:
+            self._blocks = self._request()
+            self._data = memoryview(next(self._blocks, b""))
+        n = min(len(b), len(self._data))
+        b[:n] = self._data[:n]
+        self._data = self._data[n:]
+        self._pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
 class SFTPStorageFile(File):
     def __init__(self, name, storage, mode):
         self.name = name
@@ -255,7 +498,9 @@ class SFTPStorageFile(File):
 
     def read(self, num_bytes=None):
         if not self._is_read:
-            self.file = self._storage._read(self.name)
+            # read ahead from the first read on, File.chunks() and
+            # copyfileobj read in small chunks
+            self.file = self._storage._read(self.name, size=self.size)
             self._is_read = True
 
         return self.file.read(num_bytes)
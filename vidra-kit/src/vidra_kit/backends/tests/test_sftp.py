@@ -0,0 +1,175 @@
+import io
+import threading
+from unittest import mock
+
+import pytest
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from vidra_kit.backends import sftp  # noqa: E402
+
+
+class RemoteFile:
+    """Paramiko SFTPFile double serving data with readv."""
+
+    def __init__(self, data):
+        self.data = data
+        self.readv_calls = []
+        self.closed = False
+
+    def readv(self, chunks):
+        self.readv_calls.append(chunks)
+        for offset, length in chunks:
+            yield self.data[offset:offset + length]
+
+    def close(self):
+        self.closed = True
+
+
+def connection():
+    ssh = mock.Mock()
+    ssh.get_transport.return_value.is_active.return_value = True
+    return sftp._Connection(ssh, mock.Mock())
+
+
+@pytest.fixture
+def storage():
+    storage = sftp.SFTPStorage(host="example.com", buffer_size=4, read_ahead=16, stat_cache_ttl=5)
+    storage._pool = mock.MagicMock()
+    return storage
+
+
+@pytest.fixture
+def client(storage):
+    return storage._pool.get.return_value
+
+
+def test_read_ahead_chunks(storage, client):
+    """Chunked reads are served from windows requested with readv."""
+    remote = RemoteFile(bytes(range(40)))
+    client.open.return_value = remote
+    client.stat.return_value.st_size = 40
+    f = sftp.SFTPStorageFile("a.ts", storage, "rb")
+
+    assert b"".join(f.chunks(chunk_size=3)) == remote.data
+
+    client.open.assert_called_once_with("a.ts", "rb", bufsize=4)
+    assert [c[0][0] for c in remote.readv_calls] == [0, 16, 32]
+    assert remote.readv_calls[0] == [(0, 4), (4, 4), (8, 4), (12, 4)]
+    assert remote.readv_calls[2] == [(32, 4), (36, 4)]
+    f.close()
+    assert remote.closed
+
+
+def test_read_ahead_seek(storage, client):
+    """Seeking drops the current window."""
+    remote = RemoteFile(bytes(range(40)))
+    client.open.return_value = remote
+    client.stat.return_value.st_size = 40
+    f = sftp.SFTPStorageFile("a.ts", storage, "rb")
+
+    assert f.read(2) == bytes([0, 1])
+    f.seek(30)
+    assert f.read(4) == bytes([30, 31, 32, 33])
+    assert f.read() == bytes(range(34, 40))
+    assert [c[0][0] for c in remote.readv_calls] == [0, 30]
+
+
+def test_read_whole_file(storage, client):
+    remote = RemoteFile(b"x" * 10)
+    client.open.return_value = remote
+    client.stat.return_value.st_size = 10
+
+    assert sftp.SFTPStorageFile("a.ts", storage, "rb").read() == remote.data
+
+
+def test_stat_cache(storage, client):
+    """Attributes from listdir are used until they expire."""
+    item = mock.Mock(filename="a.ts", st_mode=0o100644, st_size=10)
+    client.listdir_attr.return_value = [item]
+
+    assert storage.listdir("") == ([], ["a.ts"])
+    assert storage.size("a.ts") == 10
+    assert storage.exists("a.ts")
+    client.stat.assert_not_called()
+
+    storage.delete("a.ts")
+    client.stat.side_effect = FileNotFoundError
+    assert not storage.exists("a.ts")
+
+
+def test_stat_cache_expired(storage, client):
+    client.listdir_attr.return_value = [mock.Mock(filename="a.ts", st_mode=0o100644, st_size=10)]
+    client.stat.return_value.st_size = 20
+    storage.listdir("")
+
+    with mock.patch.object(sftp.time, "monotonic", return_value=sftp.time.monotonic() + 6):
+        assert storage.size("a.ts") == 20
+
+
+def test_save_pipelined(storage, client):
+    """Writes are pipelined in buffer_size chunks."""
+    remote = client.open.return_value.__enter__.return_value
+
+    storage._save("dir/a.ts", io.BytesIO(b"0123456789"))
+
+    client.open.assert_called_once_with("dir/a.ts", "wb", bufsize=4)
+    remote.set_pipelined.assert_called_once_with(True)
+    assert [c.args[0] for c in remote.write.call_args_list] == [b"0123", b"4567", b"89"]
+
+
+def test_pool_thread_connection():
+    """Threads stick to a connection, beyond pool size they share them."""
+    connect = mock.Mock(side_effect=lambda: connection())
+    pool = sftp.SFTPConnectionPool(connect, size=2)
+    clients = []
+
+    def get():
+        clients.append((pool.get(), pool.get()))
+
+    threads = [threading.Thread(target=get) for _ in range(4)]
+    for t in threads:
+        t.start()
+        t.join()
+
+    assert connect.call_count == 2
+    assert all(first is second for first, second in clients)
+    assert len(set(id(first) for first, _ in clients)) == 2
+
+
+def test_pool_dead_connection():
+    connect = mock.Mock(side_effect=lambda: connection())
+    pool = sftp.SFTPConnectionPool(connect, size=1)
+    first = pool.get()
+    pool._local.connection.ssh.get_transport.return_value.is_active.return_value = False
+
+    assert pool.get() is not first
+    assert connect.call_count == 2
+
+
+def test_pool_release():
+    """Connection is closed when its last thread releases it."""
+    pool = sftp.SFTPConnectionPool(connection, size=1)
+    pool.get()
+    conn = pool._local.connection
+    other_done = threading.Event()
+    release_other = threading.Event()
+
+    def other():
+        pool.get()
+        other_done.set()
+        release_other.wait()
+        pool.release()
+
+    t = threading.Thread(target=other)
+    t.start()
+    other_done.wait()
+
+    pool.release()
+    conn.ssh.close.assert_not_called()
+
+    release_other.set()
+    t.join()
+    conn.ssh.close.assert_called_once_with()
@@ -0,0 +1,230 @@
+"""
+Structured ffmpeg progress reporting.
+
+ffmpeg is started with ``-nostats -progress pipe:N`` where N is a dedicated
+pipe, so progress arrives as ``key=value`` blocks terminated by a
+``progress=continue|end`` line instead of being scraped from stderr. Both
+the progress pipe and stderr are drained by background threads, so a chatty
+ffmpeg never blocks on a full pipe regardless of how fast the consumer is.
+
+    proc = FFmpegProgress(["ffmpeg", "-i", src, "-c:v", "libx264", dst])
+    for p in proc:
+        print(f"{p.percent:.0%} eta {p.eta:.0f}s")
+    if proc.wait() != 0:
+        print(proc.stderr)
+"""
+
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Sequence
+
+# input duration as reported by ffmpeg on stderr, used if not given explicitly
+RE_DURATION = re.compile(rb"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+_END = object()
+
+
+@dataclass(frozen=True)
+class Progress:
+    """
+    A single ffmpeg progress report.
+    """
+
+    out_time: float
+    """ Output position, seconds."""
+    elapsed: float
+    """ Wall time since ffmpeg start, seconds."""
+    duration: Optional[float] = None
+    """ Input duration, seconds."""
+    frame: Optional[int] = None
+    fps: Optional[float] = None
+    speed: Optional[float] = None
+    """ Encoding speed factor reported by ffmpeg."""
+    total_size: Optional[int] = None
+    """ Output size, bytes."""
+    done: bool = False
+
+    @property
+    def percent(self) -> Optional[float]:
+        """
+        Processed share of input in [0, 1].
+        """
+        if self.done:
+            return 1.0
+        if not self.duration:
+            return None
+        return min(max(self.out_time / self.duration, 0.0), 1.0)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        Estimated remaining time, seconds.
+        """
+        if self.done:
+            return 0.0
+        if not self.duration:
+            return None
+        speed = self.speed
+        if not speed and self.elapsed and self.out_time:
+            speed = self.out_time / self.elapsed
+        if not speed:
+            return None
+        return max(self.duration - self.out_time, 0.0) / speed
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """
+        Output bytes written per wall second.
+        """
+        if self.total_size is None or not self.elapsed:
+            return None
+        return self.total_size / self.elapsed
+
+
+def _number(value: Optional[str], cast=float):
+    if value is None:
+        return None
+    value = value.strip().rstrip("x")
+    try:
+        return cast(value)
+    except ValueError:
+        # "N/A" values at the beginning of encoding
+        return None
+
+
+def parse_blocks(lines: Iterable[bytes]) -> Iterator[Dict[str, str]]:
+    """
+    Group ``-progress`` output to key/value blocks.
+    """
+    block: Dict[str, str] = {}
+    for line in lines:
+        key, sep, value = line.decode("utf-8", "replace").strip().partition("=")
+        if not sep:
+            continue
+        block[key] = value
+        if key == "progress":
+            yield block
+            block = {}
+
+
+def make_progress(
+    block: Dict[str, str], elapsed: float, duration: Optional[float]
+) -> Progress:
+    """
+    Converts a key/value block to Progress.
+    """
+    out_time_us = _number(block.get("out_time_us"), int)
+    if out_time_us is None:
+        # older ffmpeg versions report microseconds as out_time_ms
+        out_time_us = _number(block.get("out_time_ms"), int)
+    return Progress(
+        out_time=max(out_time_us or 0, 0) / 1_000_000,
+        elapsed=elapsed,
+        duration=duration,
+        frame=_number(block.get("frame"), int),
+        fps=_number(block.get("fps")),
+        speed=_number(block.get("speed")),
+        total_size=_number(block.get("total_size"), int),
+        done=block.get("progress") == "end",
+    )
+
+
+class FFmpegProgress:
+    """
+    Runs ffmpeg and iterates over its progress reports.
+
+    Iteration finishes when ffmpeg exits. Only last ``stderr_lines`` lines of
+    ffmpeg log are kept for error reporting.
+    """
+
+    def __init__(
+        self,
+        cmd: Sequence[str],
+        duration: Optional[float] = None,
+        stdout: Optional[int] = subprocess.DEVNULL,
+        stderr_lines: int = 50,
+    ) -> None:
+        self.duration = duration
+        self.last: Optional[Progress] = None
+        self._stderr: deque = deque(maxlen=stderr_lines)
+        self._queue: "queue.Queue" = queue.Queue()
+        read_fd, write_fd = os.pipe()
+        args = [cmd[0], "-nostats", "-progress", f"pipe:{write_fd}", *cmd[1:]]
+        self.started = time.monotonic()
+        try:
+            self.process = subprocess.Popen(
+                args,
+                stdin=subprocess.DEVNULL,
+                stdout=stdout,
+                stderr=subprocess.PIPE,
+                pass_fds=(write_fd,),
+            )
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            # ffmpeg holds the only write end now, so EOF means ffmpeg exited
+            os.close(write_fd)
+        self._threads = [
+            threading.Thread(
+                target=self._read_progress, args=(os.fdopen(read_fd, "rb"),), daemon=True
+            ),
+            threading.Thread(
+                target=self._read_stderr, args=(self.process.stderr,), daemon=True
+            ),
+        ]
+        for t in self._threads:
+            t.start()
+
+    @property
+    def stderr(self) -> str:
+        """
+        Tail of ffmpeg log.
+        """
+        return b"".join(self._stderr).decode("utf-8", "replace")
+
+    def _read_stderr(self, stream: IO[bytes]) -> None:
+        with stream:
+            for line in stream:
+                if self.duration is None:
+                    m = RE_DURATION.search(line)
+                    if m:
+                        h, mnt, s = m.groups()
+                        self.duration = int(h) * 3600 + int(mnt) * 60 + float(s)
+                self._stderr.append(line)
+
+    def _read_progress(self, stream: IO[bytes]) -> None:
+        with stream:
+            for block in parse_blocks(stream):
+                elapsed = time.monotonic() - self.started
+                self._queue.put(make_progress(block, elapsed, self.duration))
+        self._queue.put(_END)
+
+    def __iter__(self) -> Iterator[Progress]:
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            self.last = item
+            yield item
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        """
+        Waits for ffmpeg and log readers to finish.
+
+        :return: ffmpeg exit code.
+        """
+        code = self.process.wait(timeout)
+        for t in self._threads:
+            t.join(timeout)
+        return code
+
+    @property
+    def args(self) -> List[str]:
+        return list(self.process.args)  # type: ignore
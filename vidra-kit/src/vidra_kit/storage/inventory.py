@@ -0,0 +1,424 @@
+"""
+Persistent inventory of provider files on the Isilon mount.
+
+Listing and stat'ing thousands of files over SMB/NFS is slow, so the tree is
+mirrored to a SQLite index and refreshed incrementally: a directory is listed
+again only if its mtime changed (creating, removing or renaming an entry
+updates the mtime of its directory). Unchanged directories cost one stat.
+Writing to a file doesn't touch its directory, so files modified recently
+(still being uploaded) are stat'ed again on every refresh until they settle.
+
+Paths are stored relative to the root. The first path component defines
+file state and provider:
+
+    FAILED/<provider>/...  -> failed
+    UPLOAD/<provider>/...  -> upload
+    <provider>/...         -> enqueued
+
+`get_inventory()` returns the index shared by a process; keep it fresh with
+periodic `refresh()` calls (e.g. the vod refresh_inventory task). Readers may
+refresh just the part they query with `refresh(rel_dir)` or `refresh_dir()`.
+"""
+
+import fnmatch
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from vidra_kit import logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL,
+    mtime REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    state TEXT NOT NULL,
+    provider TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_provider ON files (provider, state);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime);
+"""
+
+# files modified within this many seconds may still grow
+SETTLE_TIME = 600
+
+DEFAULT_ROOT = "/export/isilj/fenix2"
+
+STATE_DIRS = {"FAILED": "failed", "UPLOAD": "upload"}
+ENQUEUED = "enqueued"
+
+
+@dataclass(frozen=True)
+class FileRecord:
+    path: Path
+    size: int
+    mtime: float
+    state: str
+    provider: str
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+
+@dataclass(frozen=True)
+class DirRecord:
+    path: Path
+    mtime: float
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+
+@dataclass
+class RefreshStats:
+    dirs: int = 0
+    listed: int = 0
+    added: int = 0
+    removed: int = 0
+    updated: int = 0
+    elapsed: float = 0.0
+
+
+def classify(rel_path: str) -> Tuple[str, str]:
+    """
+    Returns (state, provider) for a path relative to the inventory root.
+    """
+    parts = rel_path.split("/")
+    if parts[0] in STATE_DIRS:
+        return STATE_DIRS[parts[0]], parts[1] if len(parts) > 2 else ""
+    return ENQUEUED, parts[0] if len(parts) > 1 else ""
+
+
+class Inventory:
+    """
+    SQLite index of files under root.
+
+    Args:
+        root: tree to index, i.e. /export/isilj/fenix2.
+        db_path: SQLite database file, created if missing.
+        skip: directory names not descended into.
+        settle_time: files modified within this many seconds, or empty, are
+            stat'ed again on refresh.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        db_path: str,
+        skip: Tuple[str, ...] = (".snapshot",),
+        settle_time: float = SETTLE_TIME,
+    ):
+        self.root = Path(root)
+        self.db_path = db_path
+        self.skip = set(skip)
+        self.settle_time = settle_time
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        columns = [r[1] for r in self._db.execute("PRAGMA table_info(dirs)")]
+        if "mtime" not in columns:
+            # index created before directory mtimes were kept
+            self._db.execute("ALTER TABLE dirs ADD COLUMN mtime REAL NOT NULL DEFAULT 0")
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "Inventory":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Refresh
+    # ------------------------------------------------------------------
+
+    def _rel(self, path: str) -> str:
+        rel = os.path.relpath(path, self.root)
+        return "" if rel == "." else rel.replace(os.sep, "/")
+
+    def _children(self, rel_dir: str) -> List[str]:
+        rows = self._db.execute("SELECT path FROM dirs WHERE parent = ?", (rel_dir,))
+        return [r[0] for r in rows]
+
+    def _forget(self, rel_dir: str) -> int:
+        """
+        Removes a directory subtree from the index.
+        """
+        prefix = rel_dir + "/"
+        cur = self._db.execute(
+            "DELETE FROM files WHERE dir = ? OR substr(dir, 1, ?) = ?",
+            (rel_dir, len(prefix), prefix),
+        )
+        self._db.execute(
+            "DELETE FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?",
+            (rel_dir, len(prefix), prefix),
+        )
+        return cur.rowcount
+
+    def _list(self, rel_dir: str, mtime_ns: int, stats: RefreshStats) -> List[str]:
+        """
+        Re-lists a changed directory, returns its subdirectories.
+
+        New subdirectories are indexed as not listed yet (mtime_ns 0), so
+        the next refresh lists them.
+        """
+        abs_dir = self.root / rel_dir
+        files = []
+        subdirs = []
+        dir_rows = []
+        with os.scandir(abs_dir) as it:
+            for entry in it:
+                if entry.name in self.skip:
+                    continue
+                rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        subdirs.append(rel)
+                        dir_rows.append((rel, rel_dir, st.st_mtime))
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        state, provider = classify(rel)
+                        files.append(
+                            (rel, rel_dir, entry.name, st.st_size, st.st_mtime, state, provider)
+                        )
+                except FileNotFoundError:
+                    # removed while listing
+                    continue
+        stats.listed += 1
+        known = set(
+            r[0] for r in self._db.execute("SELECT path FROM files WHERE dir = ?", (rel_dir,))
+        )
+        current = set(f[0] for f in files)
+        stats.added += len(current - known)
+        gone = known - current
+        stats.removed += len(gone)
+        self._db.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in gone])
+        self._db.executemany(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", files
+        )
+        for old in set(self._children(rel_dir)) - set(subdirs):
+            stats.removed += self._forget(old)
+        self._db.executemany(
+            "INSERT INTO dirs VALUES (?, ?, 0, ?) "
+            "ON CONFLICT (path) DO UPDATE SET mtime = excluded.mtime",
+            dir_rows,
+        )
+        self._db.execute(
+            "INSERT INTO dirs VALUES (?, ?, ?, ?) ON CONFLICT (path) DO UPDATE "
+            "SET parent = excluded.parent, mtime_ns = excluded.mtime_ns, mtime = excluded.mtime",
+            (rel_dir, os.path.dirname(rel_dir) if rel_dir else None, mtime_ns, mtime_ns / 1e9),
+        )
+        return subdirs
+
+    def _restat_unsettled(self, stats: RefreshStats, rel_dir: str = "") -> None:
+        """
+        Updates size and mtime of files under rel_dir which may still be
+        written.
+        """
+        query = "SELECT path, size, mtime FROM files WHERE (mtime >= ? OR size = 0)"
+        params: tuple = (time.time() - self.settle_time,)
+        if rel_dir:
+            prefix = rel_dir + "/"
+            query += " AND (dir = ? OR substr(dir, 1, ?) = ?)"
+            params += (rel_dir, len(prefix), prefix)
+        rows = self._db.execute(query, params).fetchall()
+        for path, size, mtime in rows:
+            try:
+                st = os.stat(self.root / path)
+            except FileNotFoundError:
+                # removal is noticed by the directory listing
+                continue
+            if (st.st_size, st.st_mtime) != (size, mtime):
+                stats.updated += 1
+                self._db.execute(
+                    "UPDATE files SET size = ?, mtime = ? WHERE path = ?",
+                    (st.st_size, st.st_mtime, path),
+                )
+
+    def _check_dir(self, rel_dir: str, force: bool, stats: RefreshStats) -> Optional[List[str]]:
+        """
+        Lists a directory if it changed since it was listed.
+
+        Returns:
+            Subdirectories, or None if the directory is gone.
+        """
+        try:
+            mtime_ns = os.stat(self.root / rel_dir).st_mtime_ns
+        except FileNotFoundError:
+            stats.removed += self._forget(rel_dir)
+            return None
+        stats.dirs += 1
+        row = self._db.execute(
+            "SELECT mtime_ns FROM dirs WHERE path = ?", (rel_dir,)
+        ).fetchone()
+        if not force and row is not None and row[0] == mtime_ns:
+            return self._children(rel_dir)
+        return self._list(rel_dir, mtime_ns, stats)
+
+    def refresh(self, rel_dir: str = "", full: bool = False) -> RefreshStats:
+        """
+        Brings the index up to date with the filesystem.
+
+        Args:
+            rel_dir: refresh only this subtree, relative to root.
+            full: list every directory regardless of its mtime.
+        """
+        started = time.monotonic()
+        stats = RefreshStats()
+        rel_dir = rel_dir.strip("/")
+        with self._lock, self._db:
+            stack = [rel_dir]
+            while stack:
+                subdirs = self._check_dir(stack.pop(), full, stats)
+                stack.extend(subdirs or ())
+            self._restat_unsettled(stats, rel_dir)
+        stats.elapsed = time.monotonic() - started
+        logger.info(
+            f"Inventory refreshed: {stats.dirs} dirs, {stats.listed} listed, "
+            f"+{stats.added} -{stats.removed} ~{stats.updated} files in {stats.elapsed:.2f}s"
+        )
+        return stats
+
+    def refresh_dir(self, rel_dir: str, force: bool = False) -> RefreshStats:
+        """
+        Brings a single directory, without its subdirectories, up to date.
+
+        An unchanged directory costs one stat plus a stat per unsettled
+        file. Call with `force` after changing the directory, as coarse
+        mtime granularity of network filesystems may hide the change.
+        """
+        stats = RefreshStats()
+        rel_dir = rel_dir.strip("/")
+        with self._lock, self._db:
+            if self._check_dir(rel_dir, force, stats) is not None:
+                # own files only, subdirectories have their own refresh
+                self._restat_unsettled(stats, rel_dir)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _records(self, query: str, params: tuple) -> Iterator[FileRecord]:
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        for path, size, mtime, state, provider in rows:
+            yield FileRecord(self.root / path, size, mtime, state, provider)
+
+    def files(
+        self,
+        provider: Optional[str] = None,
+        pattern: str = "*",
+        state: Optional[str] = None,
+        recursive: bool = True,
+    ) -> List[FileRecord]:
+        """
+        Indexed files matching a glob pattern, sorted by path.
+
+        Args:
+            provider: provider name, all providers if None.
+            pattern: file name glob pattern.
+            state: failed, upload or enqueued; all states if None.
+            recursive: include files in subdirectories of state roots.
+        """
+        query = "SELECT path, size, mtime, state, provider FROM files WHERE 1"
+        params: list = []
+        if provider is not None:
+            query += " AND provider = ?"
+            params.append(provider)
+        if state is not None:
+            query += " AND state = ?"
+            params.append(state)
+        query += " ORDER BY path"
+        result = []
+        for record in self._records(query, tuple(params)):
+            if not fnmatch.fnmatchcase(record.name, pattern):
+                continue
+            if not recursive:
+                rel = record.path.relative_to(self.root).parts
+                depth = 3 if record.state in ("failed", "upload") else 2
+                if len(rel) != depth:
+                    continue
+            result.append(record)
+        return result
+
+    def listdir(self, rel_dir: str) -> Tuple[List[DirRecord], List[FileRecord]]:
+        """
+        Indexed subdirectories and files of a directory relative to root.
+        """
+        rel_dir = rel_dir.strip("/")
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, mtime FROM dirs WHERE parent = ? ORDER BY path", (rel_dir,)
+            ).fetchall()
+        dirs = [DirRecord(self.root / path, mtime) for path, mtime in rows]
+        files = list(
+            self._records(
+                "SELECT path, size, mtime, state, provider FROM files "
+                "WHERE dir = ? ORDER BY name",
+                (rel_dir,),
+            )
+        )
+        return dirs, files
+
+    def summary(self, provider: Optional[str] = None) -> Dict[str, Tuple[int, int]]:
+        """
+        Number and total size of files per state.
+        """
+        query = "SELECT state, COUNT(*), COALESCE(SUM(size), 0) FROM files"
+        params: tuple = ()
+        if provider is not None:
+            query += " WHERE provider = ?"
+            params = (provider,)
+        query += " GROUP BY state"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return {state: (count, size) for state, count, size in rows}
+
+
+_inventories: Dict[Tuple[str, str], Inventory] = {}
+_inventories_lock = threading.Lock()
+
+
+def default_db_path(root: str) -> str:
+    """
+    Index file of a root, VIDRA_INVENTORY_DB or a per-root temp file.
+    """
+    db_path = os.environ.get("VIDRA_INVENTORY_DB")
+    if db_path:
+        return db_path
+    digest = hashlib.sha1(str(root).encode()).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), f"vidra-inventory-{digest}.sqlite3")
+
+
+def get_inventory(root: str = DEFAULT_ROOT, db_path: Optional[str] = None) -> Inventory:
+    """
+    Inventory of root shared by all users in this process.
+    """
+    db_path = db_path or default_db_path(root)
+    key = (str(root), str(db_path))
+    with _inventories_lock:
+        if key not in _inventories:
+            _inventories[key] = Inventory(str(root), str(db_path))
+        return _inventories[key]
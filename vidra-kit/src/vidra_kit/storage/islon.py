@@ -1,21 +1,26 @@
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from rich.progress import Progress, TextColumn, BarColumn, TransferSpeedColumn, TimeRemainingColumn
 
+from vidra_kit.storage.fastcopy import CopyResult, copy_file
+from vidra_kit.storage.inventory import DEFAULT_ROOT, Inventory, get_inventory
+from vidra_kit.storage.transfer import TransferResult, TransferScheduler
+
 
 class CopyWithProgress:
-    def __init__(self, chunk_size=1024 * 1024):
+    def __init__(self, chunk_size=1024 * 1024, interval: float = 0.2, verify: bool = False):
+        # chunk_size is kept for compatibility, kernel copy doesn't need it
         self.chunk_size = chunk_size
+        self.interval = interval
+        self.verify = verify
 
-    def copy(self, src: Path, dest: Path):
+    def copy(self, src: Path, dest: Path) -> CopyResult:
         src = Path(src)
         dest = Path(dest)
 
-        total_size = src.stat().st_size
-
-        with src.open("rb") as src_file, dest.open("wb") as dest_file, Progress(
+        with Progress(
                 TextColumn("[bold blue]Copying[/bold blue] {task.fields[filename]}"),
                 BarColumn(),
                 "[progress.percentage]{task.percentage:>3.1f}%",
@@ -25,20 +30,27 @@ class CopyWithProgress:
                 TimeRemainingColumn(),
         ) as progress:
 
-            task = progress.add_task("copy", filename=src.name, total=total_size)
+            task = progress.add_task("copy", filename=src.name, total=src.stat().st_size)
 
-            while True:
-                chunk = src_file.read(self.chunk_size)
-                if not chunk:
-                    break
-                dest_file.write(chunk)
-                progress.update(task, advance=len(chunk))
+            def update(copied: int, total: int) -> None:
+                progress.update(task, completed=copied)
+
+            return copy_file(src, dest, progress=update, interval=self.interval, verify=self.verify)
 
 
 class ProviderFileInspector:
-    def __init__(self, provider: str, root: str = "/export/isilj/fenix2"):
+    def __init__(self, provider: str, root: str = DEFAULT_ROOT, inventory: Optional[Inventory] = None):
+        """
+        Args:
+            provider: provider name.
+            root: Isilon mount root.
+            inventory: file index of root, the index shared by the process
+                if None. Lookups refresh the provider directories of the
+                index, which costs a stat per unchanged directory.
+        """
         self.provider = provider
         self.root = Path(root)
+        self.inventory = inventory if inventory is not None else get_inventory(root)
 
         self.search_roots = {
             'failed': self.root / "FAILED" / provider,
@@ -46,6 +58,11 @@ class ProviderFileInspector:
             'enqueued': self.root / provider,
         }
 
+    def refresh(self) -> None:
+        """Bring the index of provider directories up to date."""
+        for path in self.search_roots.values():
+            self.inventory.refresh(path.relative_to(self.root).as_posix())
+
     def locate_files(self, pattern: str = "*.tar", recursive: bool = False, enqueued=False) -> Dict[str, List[Path]]:
         """
         Locate files matching the given pattern in all search roots.
@@ -62,16 +79,27 @@ class ProviderFileInspector:
         if enqueued:
             matches['enqueued'] = []
 
-        for key, path in self.search_roots.items():
-            if not path.exists():
-                continue
-            if recursive:
-                matches[key].extend(path.rglob(pattern))
-            else:
-                matches[key].extend(path.glob(pattern))
-            matches[key].sort()
+        self.refresh()
+        for record in self.inventory.files(self.provider, pattern, recursive=recursive):
+            matches[record.state].append(record.path)
         return matches
 
+    def copy_files(self, files: List[Path], dest: Path, **scheduler_options) -> List[TransferResult]:
+        """
+        Copy located files to a directory concurrently.
+
+        Args:
+            files: files to copy, i.e. one of locate_files() lists.
+            dest: destination directory.
+            scheduler_options: TransferScheduler options (workers, bandwidth...).
+
+        Returns:
+            Transfer results in the order of files.
+        """
+        dest = Path(dest)
+        scheduler = TransferScheduler(**scheduler_options)
+        return scheduler.run((f, dest / f.name) for f in files)
+
     def _format_size(self, size_bytes: int) -> str:
         """Return a human-readable file size (e.g. '1.23 MB')."""
         for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
@@ -82,17 +110,21 @@ class ProviderFileInspector:
 
     def summary(self, pattern: str = "*.tar", recursive: bool = False) -> None:
         """Print a concise summary of matched files with metadata."""
-        files = self.locate_files(pattern, recursive)
+        # sizes and mtimes come from the index, no stat per file
+        self.refresh()
+        records = self.inventory.files(self.provider, pattern, recursive=recursive)
+        files = {'failed': [], 'upload': [], 'enqueued': []}
+        for r in records:
+            files[r.state].append((r.name, r.size, r.mtime))
         total_files = sum(len(file_list) for file_list in files.values())
         print(f"Provider: {self.provider}, Total files: {total_files}")
         for key, file_list in files.items():
             if file_list:
                 print(f"{key.capitalize()}:")
-                for f in file_list:
-                    stat = f.stat()
-                    size = self._format_size(stat.st_size)
-                    mtime = datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M")
-                    print(f"  {f.name} | {size} | {mtime}")
+                for name, size_bytes, st_mtime in file_list:
+                    size = self._format_size(size_bytes)
+                    mtime = datetime.fromtimestamp(st_mtime).strftime("%Y-%m-%d %H:%M")
+                    print(f"  {name} | {size} | {mtime}")
 
 
 inspector = ProviderFileInspector("blitz")
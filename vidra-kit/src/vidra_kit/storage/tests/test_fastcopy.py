@@ -0,0 +1,56 @@
+import os
+import shutil
+
+import pytest
+
+from vidra_kit.storage.fastcopy import copy_file
+
+
+def make_file(path, size):
+    path.write_bytes(os.urandom(size))
+    return path
+
+
+def test_copy(tmp_path):
+    src = make_file(tmp_path / "a.ts", 1024 * 1024 + 1)
+
+    result = copy_file(src, tmp_path / "b.ts", verify=True)
+
+    assert result.size == src.stat().st_size
+    assert (tmp_path / "b.ts").read_bytes() == src.read_bytes()
+
+
+def test_same_file(tmp_path):
+    """Copying a file onto itself must not truncate it."""
+    src = make_file(tmp_path / "a.ts", 1024)
+    data = src.read_bytes()
+    link = tmp_path / "link.ts"
+    link.symlink_to(src)
+
+    for dest in (src, link):
+        with pytest.raises(shutil.SameFileError):
+            copy_file(src, dest)
+
+    assert src.read_bytes() == data
+
+
+def test_resume(tmp_path):
+    src = make_file(tmp_path / "a.ts", 4096)
+    dest = tmp_path / "b.ts"
+    dest.write_bytes(src.read_bytes()[:1000] + b"garbage")
+
+    copy_file(src, dest, offset=1000)
+
+    assert dest.read_bytes() == src.read_bytes()
+
+
+def test_resume_past_end(tmp_path):
+    """Offset beyond partial destination would leave a hole of zeros."""
+    src = make_file(tmp_path / "a.ts", 4096)
+    dest = tmp_path / "b.ts"
+    dest.write_bytes(src.read_bytes()[:1000])
+
+    with pytest.raises(ValueError):
+        copy_file(src, dest, offset=2000)
+
+    assert dest.read_bytes() == src.read_bytes()[:1000]
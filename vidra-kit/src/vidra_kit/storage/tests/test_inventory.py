@@ -0,0 +1,147 @@
+import os
+import time
+
+import pytest
+
+from vidra_kit.storage.inventory import Inventory, classify
+from vidra_kit.storage.islon import ProviderFileInspector
+
+
+def make_file(path, size=10):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def age(path, seconds=3600):
+    """Moves mtime to the past, the file is settled."""
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def bump(path):
+    """Changes directory mtime, coarse timestamps may hide quick changes."""
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def names(records):
+    return [r.path.name for r in records]
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / "root"
+    for rel in ("FAILED/blitz/a.tar", "UPLOAD/blitz/b.tar", "blitz/c.tar", "blitz/sub/d.tar", "other/e.tar"):
+        age(make_file(root / rel))
+    return root
+
+
+@pytest.fixture
+def inventory(root, tmp_path):
+    with Inventory(str(root), str(tmp_path / "index.sqlite3")) as inventory:
+        yield inventory
+
+
+@pytest.mark.parametrize("rel_path,expected", [
+    ("FAILED/blitz/a.tar", ("failed", "blitz")),
+    ("UPLOAD/blitz/sub/b.tar", ("upload", "blitz")),
+    ("blitz/c.tar", ("enqueued", "blitz")),
+    ("FAILED/a.tar", ("failed", "")),
+    ("a.tar", ("enqueued", "")),
+])
+def test_classify(rel_path, expected):
+    assert classify(rel_path) == expected
+
+
+def test_refresh(inventory):
+    stats = inventory.refresh()
+
+    assert stats.added == 5
+    assert names(inventory.files("blitz")) == ["a.tar", "b.tar", "c.tar", "d.tar"]
+    assert names(inventory.files("blitz", recursive=False)) == ["a.tar", "b.tar", "c.tar"]
+    assert names(inventory.files(state="failed")) == ["a.tar"]
+    assert inventory.summary("blitz") == {"failed": (1, 10), "upload": (1, 10), "enqueued": (2, 20)}
+
+
+def test_refresh_unchanged(inventory):
+    inventory.refresh()
+
+    stats = inventory.refresh()
+
+    assert stats.listed == 0
+    assert (stats.added, stats.removed, stats.updated) == (0, 0, 0)
+
+
+def test_refresh_added_removed_renamed(root, inventory):
+    inventory.refresh()
+    make_file(root / "blitz" / "new.tar")
+    (root / "UPLOAD" / "blitz" / "b.tar").unlink()
+    (root / "FAILED" / "blitz" / "a.tar").rename(root / "FAILED" / "blitz" / "renamed.tar")
+    (root / "blitz" / "sub").rename(root / "blitz" / "moved")
+    for rel in ("blitz", "UPLOAD/blitz", "FAILED/blitz"):
+        bump(root / rel)
+
+    stats = inventory.refresh()
+
+    # renames are a removal and an addition
+    assert (stats.added, stats.removed) == (3, 3)
+    assert sorted(names(inventory.files("blitz"))) == ["c.tar", "d.tar", "new.tar", "renamed.tar"]
+    assert inventory.files("blitz", "d.tar")[0].path == root / "blitz" / "moved" / "d.tar"
+
+
+def test_refresh_unsettled(root, inventory):
+    growing = make_file(root / "UPLOAD" / "blitz" / "growing.tar", 1)
+    settled = root / "blitz" / "c.tar"
+    inventory.refresh()
+    growing.write_bytes(b"x" * 100)
+    # a write doesn't change the directory mtime, settled files aren't stat'ed
+    settled.write_bytes(b"x" * 100)
+    age(settled)
+
+    stats = inventory.refresh()
+
+    assert stats.listed == 0
+    assert stats.updated == 1
+    sizes = {r.name: r.size for r in inventory.files("blitz")}
+    assert sizes["growing.tar"] == 100
+    assert sizes["c.tar"] == 10
+
+
+def test_refresh_subtree(root, inventory):
+    stats = inventory.refresh("blitz")
+
+    assert stats.added == 2
+    assert names(inventory.files()) == ["c.tar", "d.tar"]
+
+
+def test_refresh_dir(root, inventory):
+    inventory.refresh_dir("blitz")
+
+    dirs, files = inventory.listdir("blitz")
+    assert names(dirs) == ["sub"]
+    assert names(files) == ["c.tar"]
+
+    # subdirectories are listed by the next refresh
+    inventory.refresh()
+    assert names(inventory.listdir("blitz/sub")[1]) == ["d.tar"]
+
+    (root / "blitz" / "sub").rename(root / "blitz" / "moved")
+    inventory.refresh_dir("blitz", force=True)
+    dirs, _ = inventory.listdir("blitz")
+    assert names(dirs) == ["moved"]
+    assert inventory.listdir("blitz/sub") == ([], [])
+
+
+def test_inspector_locate_files(root, inventory):
+    inspector = ProviderFileInspector("blitz", str(root), inventory)
+
+    matches = inspector.locate_files("*.tar", recursive=True)
+
+    assert matches == {
+        "failed": [root / "FAILED" / "blitz" / "a.tar"],
+        "upload": [root / "UPLOAD" / "blitz" / "b.tar"],
+        "enqueued": [root / "blitz" / "c.tar", root / "blitz" / "sub" / "d.tar"],
+    }
+    # only provider directories are indexed
+    assert inventory.files("other") == []
@@ -0,0 +1,151 @@
+import os
+from unittest import mock
+
+import pytest
+
+from vidra_kit.storage import fastcopy, transfer
+from vidra_kit.storage.transfer import RateLimiter, TransferScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    c = FakeClock()
+    with mock.patch.object(transfer.time, "monotonic", c.monotonic), mock.patch.object(
+        transfer.time, "sleep", c.sleep
+    ):
+        yield c
+
+
+def make_file(path, size):
+    path.write_bytes(os.urandom(size))
+    return path
+
+
+def test_rate_limiter_burst(clock):
+    limiter = RateLimiter(rate=100, burst=100)
+
+    limiter.consume(100)
+
+    assert clock.slept == []
+
+
+def test_rate_limiter_debt(clock):
+    limiter = RateLimiter(rate=100, burst=100)
+
+    limiter.consume(100)
+    limiter.consume(50)
+    assert clock.slept == [0.5]
+
+    # bucket refills while time passes
+    clock.now += 1.0
+    limiter.consume(100)
+    assert clock.slept == [0.5]
+
+
+def test_transfer(tmp_path):
+    src = make_file(tmp_path / "a.ts", 3 * 1024 * 1024)
+    dest_dir = tmp_path / "dest"
+    dest_dir.mkdir()
+    progress = []
+
+    results = TransferScheduler(show_progress=False, progress=lambda c, t: progress.append((c, t))).run(
+        [(src, dest_dir / src.name)]
+    )
+
+    assert [r.status for r in results] == [transfer.COPIED]
+    assert (dest_dir / src.name).read_bytes() == src.read_bytes()
+    assert not (dest_dir / "a.ts.part").exists()
+    assert progress[-1] == (src.stat().st_size, src.stat().st_size)
+
+
+def test_transfer_skip_and_resume(tmp_path):
+    data = os.urandom(2 * 1024 * 1024)
+    done = tmp_path / "done.ts"
+    partial = tmp_path / "partial.ts"
+    done.write_bytes(data)
+    partial.write_bytes(data)
+    dest_dir = tmp_path / "dest"
+    dest_dir.mkdir()
+    (dest_dir / "done.ts").write_bytes(data)
+    (dest_dir / "partial.ts.part").write_bytes(data[:1000])
+
+    results = TransferScheduler(show_progress=False, verify=True).run(
+        [(done, dest_dir / "done.ts"), (partial, dest_dir / "partial.ts")]
+    )
+
+    assert [r.status for r in results] == [transfer.SKIPPED, transfer.RESUMED]
+    assert (dest_dir / "partial.ts").read_bytes() == data
+
+
+def test_bandwidth_charged_for_kernel_copy(tmp_path, monkeypatch):
+    """copy_file_range moves data through this host unless on NFS 4.2."""
+    if not hasattr(os, "copy_file_range"):
+        pytest.skip("copy_file_range is not supported")
+    monkeypatch.setattr(fastcopy, "_reflink", lambda src_fd, dst_fd: False)
+    size = 2 * transfer.LIMITED_CHUNK + 100
+    src = make_file(tmp_path / "a.ts", size)
+    scheduler = TransferScheduler(show_progress=False, bandwidth=1024)
+    scheduler.limiter = mock.Mock()
+
+    result = scheduler.transfer(src, tmp_path / "b.ts")
+
+    assert result.copy.method == "copy_file_range"
+    charged = [c.args[0] for c in scheduler.limiter.consume.call_args_list]
+    assert charged == [transfer.LIMITED_CHUNK, transfer.LIMITED_CHUNK, 100]
+
+
+def test_bandwidth_charged_before_chunks(tmp_path, monkeypatch):
+    monkeypatch.delattr(os, "copy_file_range", raising=False)
+    monkeypatch.delattr(os, "sendfile", raising=False)
+    monkeypatch.setattr(fastcopy, "_reflink", lambda src_fd, dst_fd: False)
+    size = 3 * fastcopy.CHUNK_SIZE + 100
+    src = make_file(tmp_path / "a.ts", size)
+    scheduler = TransferScheduler(show_progress=False, bandwidth=1024)
+    scheduler.limiter = mock.Mock()
+
+    result = scheduler.transfer(src, tmp_path / "b.ts")
+
+    assert result.copy.method == "chunked"
+    charged = [c.args[0] for c in scheduler.limiter.consume.call_args_list]
+    assert sum(charged) == size
+    assert max(charged) == fastcopy.CHUNK_SIZE
+
+
+def test_retry_progress(tmp_path):
+    """A retried transfer doesn't count its bytes twice."""
+    src = make_file(tmp_path / "a.ts", 1024 * 1024)
+    copy_file = transfer.copy_file
+    calls = []
+
+    def flaky(src, dest, progress=None, **kwargs):
+        calls.append(kwargs["offset"])
+        if len(calls) == 1:
+            dest.write_bytes(src.read_bytes()[:1000])
+            progress(1000, src.stat().st_size)
+            raise OSError("connection reset")
+        return copy_file(src, dest, progress=progress, **kwargs)
+
+    progress = []
+    scheduler = TransferScheduler(
+        show_progress=False, retries=1, progress=lambda c, t: progress.append(c)
+    )
+    with mock.patch.object(transfer, "copy_file", side_effect=flaky):
+        results = scheduler.run([(src, tmp_path / "b.ts")])
+
+    assert [r.status for r in results] == [transfer.RESUMED]
+    assert calls == [0, 1000]
+    assert progress[-1] == src.stat().st_size
+    assert max(progress) == src.stat().st_size
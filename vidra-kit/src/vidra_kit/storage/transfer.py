@@ -0,0 +1,255 @@
+"""
+Parallel multi-file transfer scheduler.
+
+Copies many files concurrently with:
+
+* a global bandwidth cap shared by all copies (token bucket);
+* a concurrency limit per destination directory;
+* resume of partially copied files: data is copied to ``<name>.part`` and
+  renamed when complete, so an existing destination is always complete and
+  an existing ``.part`` file is continued from its size (after comparing
+  prefix checksums if ``verify`` is enabled);
+* a single aggregated progress bar.
+
+    scheduler = TransferScheduler(workers=8, bandwidth=200 * 2**20)
+    results = scheduler.run((f, dest_dir / f.name) for f in files)
+"""
+
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from rich.progress import (
+    BarColumn,
+    Progress,
+    TextColumn,
+    TimeRemainingColumn,
+    TransferSpeedColumn,
+)
+
+from vidra_kit import logger
+from vidra_kit.storage.fastcopy import CHUNK_SIZE, CopyResult, copy_file
+
+PART_SUFFIX = ".part"
+
+# kernel copy chunk when bandwidth is limited, keeps bursts small
+LIMITED_CHUNK = 4 * 1024 * 1024
+
+COPIED = "copied"
+RESUMED = "resumed"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class RateLimiter:
+    """
+    Token bucket shared by concurrent transfers.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int) -> None:
+        """
+        Takes `amount` bytes from the bucket, sleeping while it is in debt.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+@dataclass
+class TransferResult:
+    src: Path
+    dest: Path
+    status: str
+    copy: Optional[CopyResult] = None
+    error: Optional[BaseException] = None
+
+
+def _prefix_checksum(path: Path, size: int) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        remaining = size
+        while remaining:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            h.update(chunk)
+            remaining -= len(chunk)
+    return h.hexdigest()
+
+
+class TransferScheduler:
+    """
+    Copies files concurrently with shared bandwidth and per-destination limits.
+
+    Args:
+        workers: number of concurrent copies.
+        bandwidth: aggregate copy rate limit, bytes per second (None - unlimited).
+        per_destination: concurrent copies into the same directory.
+        verify: verify checksums of copied files and of resumed prefixes.
+        show_progress: render aggregated rich progress bar.
+        progress: called with (copied, total) bytes over all transfers.
+        retries: attempts to resume a failed transfer.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        bandwidth: Optional[float] = None,
+        per_destination: int = 2,
+        verify: bool = False,
+        show_progress: bool = True,
+        progress: Optional[Callable[[int, int], None]] = None,
+        retries: int = 0,
+    ):
+        self.workers = workers
+        self.limiter = RateLimiter(bandwidth) if bandwidth else None
+        self.per_destination = per_destination
+        self.verify = verify
+        self.show_progress = show_progress
+        self.progress = progress
+        self.retries = retries
+        self._slots: Dict[Path, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+        self._copied = 0
+        self._total = 0
+        self._active = 0
+
+    def _slot(self, dest: Path) -> threading.Semaphore:
+        with self._lock:
+            key = dest.parent
+            if key not in self._slots:
+                self._slots[key] = threading.Semaphore(self.per_destination)
+            return self._slots[key]
+
+    def _advance(self, amount: int) -> None:
+        with self._lock:
+            self._copied += amount
+            copied, total = self._copied, self._total
+        if self.progress is not None:
+            self.progress(copied, total)
+
+    def _resume_offset(self, src: Path, part: Path) -> int:
+        if not part.exists():
+            return 0
+        size = part.stat().st_size
+        if size > src.stat().st_size:
+            return 0
+        if self.verify and size and _prefix_checksum(src, size) != _prefix_checksum(part, size):
+            logger.warning(f"Discarding {part}: content differs from {src}")
+            return 0
+        return size
+
+    def transfer(self, src: Path, dest: Path) -> TransferResult:
+        """
+        Copies a single file, resuming or skipping it when possible.
+        """
+        src_size = src.stat().st_size
+        if dest.exists() and dest.stat().st_size == src_size:
+            self._advance(src_size)
+            return TransferResult(src, dest, SKIPPED)
+
+        part = dest.with_name(dest.name + PART_SUFFIX)
+        with self._slot(dest):
+            with self._lock:
+                self._active += 1
+            # bytes of this transfer counted in aggregated progress
+            last = 0
+            try:
+                offset = self._resume_offset(src, part)
+                self._advance(offset)
+                last = offset
+
+                def update(copied: int, total: int) -> None:
+                    nonlocal last
+                    delta, last = copied - last, copied
+                    self._advance(delta)
+
+                result = copy_file(
+                    src,
+                    part,
+                    progress=update,
+                    interval=0.2,
+                    verify=self.verify,
+                    offset=offset,
+                    chunk_size=LIMITED_CHUNK if self.limiter else CHUNK_SIZE * 64,
+                    # bandwidth is taken before data is moved, only
+                    # clones are not charged
+                    throttle=self.limiter.consume if self.limiter else None,
+                )
+                part.replace(dest)
+            except BaseException:
+                # a retry counts resumed and copied bytes again
+                self._advance(-last)
+                raise
+            finally:
+                with self._lock:
+                    self._active -= 1
+        return TransferResult(src, dest, RESUMED if offset else COPIED, copy=result)
+
+    def _run_one(self, src: Path, dest: Path) -> TransferResult:
+        for attempt in range(self.retries + 1):
+            try:
+                return self.transfer(src, dest)
+            except Exception as e:
+                logger.error(f"Transfer {src} -> {dest} failed (attempt {attempt + 1}): {e}")
+                error = e
+        return TransferResult(src, dest, FAILED, error=error)
+
+    def run(self, transfers: Iterable[Tuple[Path, Path]]) -> List[TransferResult]:
+        """
+        Runs all transfers and returns their results in the same order.
+        """
+        pairs = [(Path(s), Path(d)) for s, d in transfers]
+        with self._lock:
+            self._copied = 0
+            self._total = sum(s.stat().st_size for s, _ in pairs)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._run_one, s, d) for s, d in pairs]
+            if self.show_progress:
+                self._render(futures, len(pairs))
+            results = [f.result() for f in futures]
+
+        failed = sum(r.status == FAILED for r in results)
+        logger.info(f"Transferred {len(results) - failed} of {len(results)} files, {failed} failed")
+        return results
+
+    def _render(self, futures, count: int) -> None:
+        with Progress(
+            TextColumn("[bold blue]Transferring[/bold blue] {task.fields[files]}"),
+            BarColumn(),
+            "[progress.percentage]{task.percentage:>3.1f}%",
+            "•",
+            TransferSpeedColumn(),
+            "•",
+            TimeRemainingColumn(),
+        ) as progress:
+            task = progress.add_task("transfer", total=self._total, files="")
+            while True:
+                done = sum(f.done() for f in futures)
+                with self._lock:
+                    copied, active = self._copied, self._active
+                progress.update(
+                    task,
+                    completed=copied,
+                    files=f"{done}/{count} files, {active} active",
+                )
+                if done == count:
+                    break
+                time.sleep(0.2)
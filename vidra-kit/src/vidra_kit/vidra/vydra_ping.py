@@ -5,6 +5,7 @@ from celery import Celery, group
 
 from vidra_kit import logger
 from vidra_kit.vidra.providers import PROVIDERS
+from vidra_kit.storage.fastcopy import copy_file
 from vidra_kit.storage.islon import CopyWithProgress
 from celery import Task
 
@@ -46,8 +47,9 @@ class VidraMixin:
         dest = self.provider_home / file.name
         logger.info(f"Moving {file.name} to {dest}")
         try:
-            new = shutil.copy(file, dest)
-            logger.info(f"Moving done to {new}")
+            result = copy_file(file, dest)
+            shutil.copymode(file, dest)
+            logger.info(f"Moving done to {dest} ({result.method}, {result.rate / 2**20:.1f} MiB/s)")
             return self.build_payload(dest)
         except (shutil.Error, OSError) as e:
             logger.error(f"Failed to copy file {file} to {dest}: {e}")
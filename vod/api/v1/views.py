@@ -82,8 +82,135 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 import mimetypes
+import os
 
-class VueFinderViewSet(viewsets.ViewSet):
+from vod.inventory import get_inventory
+
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+SORT_KEYS = {
+    "name": lambda e: e["name"].lower(),
+    "size": lambda e: e["size"],
+    "updated": lambda e: e["updated"],
+    "created": lambda e: e["created"],
+    "type": lambda e: os.path.splitext(e["name"])[1].lower(),
+}
+
+
+def scan_dir(inventory, rel_dir: str):
+    """
+    Entries of a directory from the inventory index.
+
+    The directory is brought up to date first, which costs one stat if it
+    didn't change. The index keeps modification times only, so ``created``
+    of the entries is the modification time.
+    """
+    inventory.refresh_dir(rel_dir)
+    dirs, files = inventory.listdir(rel_dir)
+    entries = [
+        {"name": d.name, "is_dir": True, "size": 0, "created": int(d.mtime), "updated": int(d.mtime)}
+        for d in dirs
+    ]
+    entries.extend(
+        {"name": f.name, "is_dir": False, "size": f.size, "created": int(f.mtime), "updated": int(f.mtime)}
+        for f in files
+    )
+    return entries
+
+
+def path_entry(fs_path: Path):
+    """
+    Listing entry of a single path, same as the ``scan_dir`` ones.
+    """
+    st = fs_path.stat()
+    is_dir = fs_path.is_dir()
+    return {
+        "name": fs_path.name,
+        "is_dir": is_dir,
+        "size": 0 if is_dir else st.st_size,
+        "created": int(st.st_mtime),
+        "updated": int(st.st_mtime),
+    }
+
+
+def listing_item(entry, rel_path: str):
+    is_dir = entry["is_dir"]
+    return {
+        "name": entry["name"],
+        "path": f"local://public/{rel_path}",
+        "type": "dir" if is_dir else "file",
+        "size": entry["size"],
+        "mime": "directory" if is_dir else mimetypes.guess_type(entry["name"])[0] or "application/octet-stream",
+        "created": entry["created"],
+        "updated": entry["updated"],
+    }
+
+
+class VueFinderListingMixin:
+    """
+    Directory listing, paginated on request.
+
+    Query params: ``sort`` (name, size, updated, created, type), ``order``
+    (asc, desc), ``filter`` (case insensitive substring of name), ``cursor``
+    (from ``next_cursor`` of the previous page) and ``limit``. Directories go
+    first regardless of sort order.
+
+    Whole directory is returned unless ``limit`` or ``cursor`` is given, as
+    the stock VueFinder client sends neither. The cursor is an offset into
+    the current listing: entries added or removed between requests shift
+    later pages, so some entries may be skipped or repeated.
+
+    Listings come from the inventory index of ``BASE_DIR``, views changing
+    a directory call ``invalidate_listing`` to re-list it.
+    """
+
+    @property
+    def inventory(self):
+        return get_inventory(self.BASE_DIR)
+
+    def index_path(self, fs_path: Path) -> str:
+        rel_path = fs_path.relative_to(self.BASE_DIR).as_posix()
+        return "" if rel_path == "." else rel_path
+
+    def invalidate_listing(self, *fs_paths: Path):
+        for fs_path in fs_paths:
+            self.inventory.refresh_dir(self.index_path(fs_path), force=True)
+
+    def to_vuefinder_item(self, fs_path: Path):
+        return listing_item(path_entry(fs_path), self.index_path(fs_path))
+
+    def list_dir(self, request, path: str, fs_path: Path):
+        params = request.query_params
+        sort = params.get("sort", "name")
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Invalid sort key {sort}")
+        reverse = params.get("order", "asc") == "desc"
+        paginate = "limit" in params or "cursor" in params
+        limit = min(max(int(params.get("limit", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        offset = max(int(params.get("cursor") or 0), 0)
+
+        rel_dir = fs_path.relative_to(self.BASE_DIR)
+        entries = scan_dir(self.inventory, self.index_path(fs_path))
+        name_filter = params.get("filter", "").lower()
+        if name_filter:
+            entries = [e for e in entries if name_filter in e["name"].lower()]
+        entries = sorted(entries, key=SORT_KEYS[sort], reverse=reverse)
+        # stable sort keeps the order inside both groups
+        entries.sort(key=lambda e: not e["is_dir"])
+
+        if not paginate:
+            offset, limit = 0, len(entries)
+        page = entries[offset:offset + limit]
+        next_offset = offset + len(page)
+        return Response({
+            "dirname": path,
+            "files": [listing_item(e, str(rel_dir / e["name"])) for e in page],
+            "total": len(entries),
+            "next_cursor": str(next_offset) if next_offset < len(entries) else None,
+        })
+
+
+class VueFinderViewSet(VueFinderListingMixin, viewsets.ViewSet):
     BASE_DIR = Path('/export/isilj/fenix2')
 
     def get_path(self, path: str):
@@ -92,19 +219,6 @@ class VueFinderViewSet(viewsets.ViewSet):
         rel_path = path[len("local://public"):].lstrip("/")
         return self.BASE_DIR / rel_path
 
-    def to_vuefinder_item(self, fs_path: Path, rel_path: str):
-        stat = fs_path.stat()
-        is_dir = fs_path.is_dir()
-        return {
-            "name": fs_path.name,
-            "path": f"local://public/{rel_path}",
-            "type": "dir" if is_dir else "file",
-            "size": 0 if is_dir else stat.st_size,
-            "mime": "directory" if is_dir else mimetypes.guess_type(fs_path)[0] or "application/octet-stream",
-            "created": int(stat.st_ctime),
-            "updated": int(stat.st_mtime),
-        }
-
     def list(self, request):
         path = request.query_params.get("path", "local://public/")
         preview = request.query_params.get("preview")
@@ -117,12 +231,7 @@ class VueFinderViewSet(viewsets.ViewSet):
                 return FileResponse(open(fs_path, "rb"), content_type=mimetypes.guess_type(fs_path)[0]) if preview \
                     else FileResponse(open(fs_path, "rb"), as_attachment=True, filename=fs_path.name)
 
-            items = []
-            for item in sorted(fs_path.iterdir(), key=lambda x: (not x.is_dir(), x.name.lower())):
-                rel_item_path = str(fs_path.relative_to(self.BASE_DIR) / item.name)
-                items.append(self.to_vuefinder_item(item, rel_item_path))
-
-            return Response({"dirname": path, "files": items})
+            return self.list_dir(request, path, fs_path)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -136,8 +245,8 @@ class VueFinderViewSet(viewsets.ViewSet):
         for file in request.FILES.getlist("files"):
             file_path = fs_path / file.name
             default_storage.save(str(file_path), file)
-            rel_path = str(file_path.relative_to(self.BASE_DIR))
-            uploaded_files.append(self.to_vuefinder_item(file_path, rel_path))
+            uploaded_files.append(self.to_vuefinder_item(file_path))
+        self.invalidate_listing(fs_path)
 
         return Response({"files": uploaded_files})
 
@@ -152,6 +261,7 @@ class VueFinderViewSet(viewsets.ViewSet):
                     shutil.rmtree(fs_path)
                 else:
                     fs_path.unlink()
+                self.invalidate_listing(fs_path.parent)
                 deleted.append(item_path)
             except Exception:
                 continue
@@ -164,6 +274,7 @@ class VueFinderViewSet(viewsets.ViewSet):
             old_path = self.get_path(request.data["item"])
             new_path = old_path.parent / request.data["newName"]
             old_path.rename(new_path)
+            self.invalidate_listing(old_path.parent)
             return Response({"path": f"local://public/{new_path.relative_to(self.BASE_DIR)}"})
 
         elif action_type in ["move", "copy"]:
@@ -179,7 +290,9 @@ class VueFinderViewSet(viewsets.ViewSet):
                         shutil.copytree(src, dst, dirs_exist_ok=True)
                     else:
                         shutil.copy2(src, dst)
+                self.invalidate_listing(src.parent)
                 results.append(f"local://public/{dst.relative_to(self.BASE_DIR)}")
+            self.invalidate_listing(target)
             return Response({"paths": results})
 
         return Response({"error": "Unknown action"}, status=status.HTTP_400_BAD_REQUEST)
@@ -191,16 +304,18 @@ class VueFinderViewSet(viewsets.ViewSet):
             path = self.get_path(request.data["path"])
             folder = path / request.data["name"]
             folder.mkdir()
-            return Response(self.to_vuefinder_item(folder, str(folder.relative_to(self.BASE_DIR))))
+            self.invalidate_listing(path)
+            return Response(self.to_vuefinder_item(folder))
 
         elif action_type == "save":
             path = self.get_path(request.data["path"])
             path.write_text(request.data["content"], encoding="utf-8")
-            return Response(self.to_vuefinder_item(path, str(path.relative_to(self.BASE_DIR))))
+            self.invalidate_listing(path.parent)
+            return Response(self.to_vuefinder_item(path))
 
         return Response({"error": "Unknown action"}, status=status.HTTP_400_BAD_REQUEST)
 
-class VueFinderViewSet2(viewsets.ViewSet):
+class VueFinderViewSet2(VueFinderListingMixin, viewsets.ViewSet):
     """
     DRF ViewSet to handle VueFinder operations.
     Base path: local://public → MEDIA_ROOT/public
@@ -213,19 +328,6 @@ class VueFinderViewSet2(viewsets.ViewSet):
         rel_path = path[len("local://public"):].lstrip("/")
         return self.BASE_DIR / rel_path
 
-    def to_vuefinder_item(self, fs_path: Path, rel_path: str):
-        stat = fs_path.stat()
-        is_dir = fs_path.is_dir()
-        return {
-            "name": fs_path.name,
-            "path": f"local://public/{rel_path}",
-            "type": "dir" if is_dir else "file",
-            "size": 0 if is_dir else stat.st_size,
-            "mime": "directory" if is_dir else mimetypes.guess_type(fs_path)[0] or "application/octet-stream",
-            "created": int(stat.st_ctime),
-            "updated": int(stat.st_mtime),
-        }
-
     # GET /api/files/ → list or download/preview
     def list(self, request):
         path = request.query_params.get("path", "local://public/")
@@ -239,12 +341,7 @@ class VueFinderViewSet2(viewsets.ViewSet):
                 return FileResponse(open(fs_path, "rb"), content_type=mimetypes.guess_type(fs_path)[0]) if preview \
                     else FileResponse(open(fs_path, "rb"), as_attachment=True, filename=fs_path.name)
 
-            items = []
-            for item in sorted(fs_path.iterdir(), key=lambda x: (not x.is_dir(), x.name.lower())):
-                rel_item_path = str(fs_path.relative_to(self.BASE_DIR) / item.name)
-                items.append(self.to_vuefinder_item(item, rel_item_path))
-
-            return Response({"dirname": path, "files": items})
+            return self.list_dir(request, path, fs_path)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -260,8 +357,8 @@ class VueFinderViewSet2(viewsets.ViewSet):
             for file in request.FILES.getlist("files"):
                 file_path = fs_path / file.name
                 default_storage.save(str(file_path), file)
-                rel_path = str(file_path.relative_to(self.BASE_DIR))
-                uploaded_files.append(self.to_vuefinder_item(file_path, rel_path))
+                uploaded_files.append(self.to_vuefinder_item(file_path))
+            self.invalidate_listing(fs_path)
 
             return Response({"files": uploaded_files})
         except Exception as e:
@@ -280,6 +377,7 @@ class VueFinderViewSet2(viewsets.ViewSet):
                     shutil.rmtree(fs_path)
                 else:
                     fs_path.unlink()
+                self.invalidate_listing(fs_path.parent)
                 deleted.append(item_path)
             except Exception:
                 continue
@@ -295,6 +393,7 @@ class VueFinderViewSet2(viewsets.ViewSet):
                 old_path = self.get_path(data["item"])
                 new_path = old_path.parent / data["newName"]
                 old_path.rename(new_path)
+                self.invalidate_listing(old_path.parent)
                 return Response({"path": f"local://public/{new_path.relative_to(self.BASE_DIR)}"})
 
             elif action_type in ["move", "copy"]:
@@ -310,7 +409,9 @@ class VueFinderViewSet2(viewsets.ViewSet):
                             shutil.copytree(src, dst, dirs_exist_ok=True)
                         else:
                             shutil.copy2(src, dst)
+                    self.invalidate_listing(src.parent)
                     results.append(f"local://public/{dst.relative_to(self.BASE_DIR)}")
+                self.invalidate_listing(target)
                 return Response({"paths": results})
 
             return Response({"error": "Unknown action"}, status=status.HTTP_400_BAD_REQUEST)
@@ -327,12 +428,14 @@ class VueFinderViewSet2(viewsets.ViewSet):
                 path = self.get_path(data["path"])
                 folder = path / data["name"]
                 folder.mkdir()
-                return Response(self.to_vuefinder_item(folder, str(folder.relative_to(self.BASE_DIR))))
+                self.invalidate_listing(path)
+                return Response(self.to_vuefinder_item(folder))
 
             elif action_type == "save":
                 path = self.get_path(data["path"])
                 path.write_text(data["content"], encoding="utf-8")
-                return Response(self.to_vuefinder_item(path, str(path.relative_to(self.BASE_DIR))))
+                self.invalidate_listing(path.parent)
+                return Response(self.to_vuefinder_item(path))
 
             return Response({"error": "Unknown action"}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -0,0 +1,20 @@
+"""
+Index of provider files on the Isilon mount, shared by views and tasks.
+
+Settings:
+    VOD_INVENTORY_ROOT: indexed tree, /export/isilj/fenix2 by default.
+    VOD_INVENTORY_DB: SQLite index file, a per-root temp file by default.
+"""
+from django.conf import settings
+
+from vidra_kit.storage import inventory
+
+
+def get_inventory(root=None) -> inventory.Inventory:
+    """
+    Shared index of root, VOD_INVENTORY_ROOT if None.
+    """
+    configured = str(getattr(settings, 'VOD_INVENTORY_ROOT', inventory.DEFAULT_ROOT))
+    root = str(root or configured)
+    db_path = getattr(settings, 'VOD_INVENTORY_DB', None) if root == configured else None
+    return inventory.get_inventory(root, db_path and str(db_path))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from vidra_kit.backends.api import EdgewareStatusPoller
+
+
+class Command(BaseCommand):
+    help = 'Track Edgeware ingest state of pending publications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Check pending publications once and exit')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent Edgeware requests')
+
+    def handle(self, *args, **options):
+        poller = EdgewareStatusPoller(workers=options['workers'])
+        if options['once']:
+            interval = poller.poll_once()
+            self.stdout.write(f"Next check in {interval}s")
+            return
+        poller.run()
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from video_encoding import tuning
+from video_encoding.config import settings
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ffmpeg encoders on this host for encoder auto tuning'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ffmpeg', help='ffmpeg binary path')
+        parser.add_argument(
+            '--cache', help='probe results file, VIDEO_ENCODING_PROBE_CACHE or a per-host temp file by default')
+
+    def handle(self, *args, **options):
+        caps = tuning.get_capabilities(
+            options['ffmpeg'], options['cache'] or settings.VIDEO_ENCODING_PROBE_CACHE)
+        for codec, speeds in caps.speed.items():
+            line = ', '.join(f'{preset} {speed:.2f}x' for preset, speed in speeds.items())
+            self.stdout.write(f'{codec}: {line}')
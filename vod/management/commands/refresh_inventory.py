@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from vod.inventory import get_inventory
+
+
+class Command(BaseCommand):
+    help = 'Keep the provider files index up to date'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Refresh the index once and exit')
+        parser.add_argument('--full', action='store_true', help='List every directory, not only changed ones')
+        parser.add_argument('--interval', type=float, default=60, help='Seconds between refreshes')
+
+    def handle(self, *args, **options):
+        inventory = get_inventory()
+        while True:
+            stats = inventory.refresh(full=options['full'])
+            self.stdout.write(
+                f"{stats.dirs} dirs, {stats.listed} listed, +{stats.added} -{stats.removed} "
+                f"~{stats.updated} files in {stats.elapsed:.2f}s"
+            )
+            if options['once']:
+                return
+            time.sleep(options['interval'])
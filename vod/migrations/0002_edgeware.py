@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vod", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Edgeware",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("modified_at", models.DateTimeField(auto_now=True)),
+                ("title", models.CharField(max_length=255)),
+                ("ftp_dir", models.CharField(max_length=512)),
+                (
+                    "content_id",
+                    models.CharField(max_length=255, null=True, unique=True),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("ftp_upload", "FTP UPLOADED"),
+                            ("ftp_error", "FTP ERROR"),
+                            ("ew_pending", "INGEST PENDING"),
+                            ("ew_error", "INGEST ERROR"),
+                            ("ew_done", "INGEST DONE"),
+                        ],
+                        max_length=20,
+                        null=True,
+                    ),
+                ),
+                (
+                    "msg",
+                    models.JSONField(
+                        blank=True, help_text="Last Edgeware API response", null=True
+                    ),
+                ),
+                (
+                    "check_interval",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Seconds between ingest state checks"
+                    ),
+                ),
+                ("next_check", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_check"],
+                        name="vod_edgewar_status_76331e_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DeliveryUri",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("type", models.CharField(max_length=32)),
+                ("uri", models.URLField(max_length=512)),
+                (
+                    "ew",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="delivery_uris",
+                        to="vod.edgeware",
+                    ),
+                ),
+            ],
+        ),
+    ]
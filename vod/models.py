@@ -181,6 +181,47 @@ class Stream(models.Model):
         return f"[{self.stream_protocol}] {self.edge.title}"
 
 
+class Edgeware(models.Model):
+    """Package published to Edgeware over FTP, see vidra_kit PublishEW."""
+
+    class Status(models.TextChoices):
+        FTP_UPLOAD = "ftp_upload", "FTP UPLOADED"
+        FTP_ERROR = "ftp_error", "FTP ERROR"
+        EW_PENDING = "ew_pending", "INGEST PENDING"
+        EW_ERROR = "ew_error", "INGEST ERROR"
+        EW_DONE = "ew_done", "INGEST DONE"
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    title = models.CharField(max_length=255)
+    ftp_dir = models.CharField(max_length=512)
+    content_id = models.CharField(max_length=255, null=True, unique=True)
+    status = models.CharField(max_length=20, choices=Status, null=True)
+    msg = models.JSONField(null=True, blank=True, help_text='Last Edgeware API response')
+
+    # ingest state polling backoff, see EdgewareStatusPoller
+    check_interval = models.PositiveIntegerField(default=0, help_text='Seconds between ingest state checks')
+    next_check = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_check']),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class DeliveryUri(models.Model):
+    ew = models.ForeignKey(Edgeware, on_delete=models.CASCADE, related_name="delivery_uris")
+    type = models.CharField(max_length=32)
+    uri = models.URLField(max_length=512)
+
+    def __str__(self):
+        return f"[{self.type}] {self.ew.title}"
+
+
 class Worker(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
@@ -2,12 +2,17 @@ import os
 import tarfile
 import tempfile
 import subprocess
+from dataclasses import asdict
 from pathlib import Path
 from lxml import etree
 from celery import shared_task, group
 from django.conf import settings
+from django.utils import timezone
 
-from vidra_kit.backends.api import RabbitMQMonitor
+from vidra_kit.backends.api import EdgewareStatusPoller, RabbitMQMonitor
+from video_encoding import tuning
+from video_encoding.config import settings as encoding_settings
+from .inventory import get_inventory
 from .models import Video
 
 # Schema paths
@@ -37,6 +42,44 @@ def _load_schema(path):
     return _schema_cache[path]
 
 
+def _encoder_params(codec, preset):
+    """
+    Threads and preset for codec, tuned for this host if
+    VIDEO_ENCODING_AUTO_TUNE is enabled and the host was probed
+    (manage.py probe_encoders), otherwise the given preset.
+
+    Uses the video_encoding tuning settings: TARGET_SPEED, JOBS (encodes
+    running at once on a worker host) and PROBE_CACHE.
+    """
+    if not encoding_settings.VIDEO_ENCODING_AUTO_TUNE:
+        return ['-preset', preset]
+    caps = tuning.get_capabilities(
+        cache_path=encoding_settings.VIDEO_ENCODING_PROBE_CACHE, run_probe=False)
+    if caps is None:
+        return ['-preset', preset]
+    t = tuning.tune(
+        caps,
+        codec,
+        target_speed=encoding_settings.VIDEO_ENCODING_TARGET_SPEED,
+        jobs=encoding_settings.VIDEO_ENCODING_JOBS,
+    )
+    if t.preset is None:
+        return ['-preset', preset]
+    return t.get_params()
+
+
+def _has_audio(path):
+    """
+    Whether a media file has at least one audio stream.
+    """
+    out = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'a',
+         '-show_entries', 'stream=index', '-of', 'csv=p=0', str(path)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return bool(out.strip())
+
+
 def find_adi_in_tar(tar):
     for member in tar.getmembers():
         if member.isfile() and member.name.lower().endswith(('adi.xml', 'package.xml')):
@@ -99,9 +142,17 @@ def process_vod_package(self, video_id):
                 video.status = 'adi_validated'
                 video.save()
 
-                # 4. Chain to transcoding
-                chain = archive_to_hevc.s(video.id) | transcode_to_dash.s(video.id)
-                chain.delay()
+                # 4. Archive and DASH ladder don't depend on each other,
+                # run them concurrently; video is ready when both succeed
+                # (tracked on the model, no result backend is needed)
+                video.hevc_archive = ''
+                video.dash_directory = ''
+                video.status = 'processing'
+                video.save(update_fields=['hevc_archive', 'dash_directory', 'status', 'updated_at'])
+                group(
+                    archive_to_hevc.si(video.id).on_error(fail_video.s(video.id)),
+                    transcode_to_dash.si(video.id).on_error(fail_video.s(video.id)),
+                ).delay()
 
     except Exception as exc:
         video.status = 'error'
@@ -152,10 +203,13 @@ def archive_to_hevc(video_id):
     output_path = settings.MEDIA_ROOT / 'archive' / 'hevc' / f"{video_id}.mp4"
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    cmd = ['ffmpeg', '-i', input_path, '-c:v', 'libx265', '-preset', 'slow', '-crf', '23', '-c:a', 'copy', '-y', str(output_path)]
+    cmd = ['ffmpeg', '-i', input_path, '-c:v', 'libx265', *_encoder_params('libx265', 'slow'),
+           '-crf', '23', '-c:a', 'copy', '-y', str(output_path)]
     subprocess.run(cmd, check=True)
     video.hevc_archive = f"archive/hevc/{video_id}.mp4"
-    video.save()
+    # transcode_to_dash updates the same row concurrently
+    video.save(update_fields=['hevc_archive', 'updated_at'])
+    finalize_video(video_id)
 
 
 @shared_task
@@ -173,20 +227,89 @@ def transcode_to_dash(video_id):
         ("1920x1080", "6000k", "1080p"),
     ]
 
+    # One decode feeds every rendition; renditions are fragmented (CMAF)
+    # MP4s with aligned keyframes, so both DASH and HLS manifests are
+    # packaged from the same media without re-encoding.
+    split = f"[0:v]split={len(resolutions)}" + "".join(
+        f"[v{i}]" for i in range(len(resolutions))
+    )
+    scales = [
+        f"[v{i}]scale={w_h}[out{i}]" for i, (w_h, _, _) in enumerate(resolutions)
+    ]
+    cmd = ['ffmpeg', '-y', '-i', input_path,
+           '-filter_complex', ";".join([split] + scales)]
+    x264_params = _encoder_params('libx264', 'medium')
+    frag_flags = ['-movflags', '+frag_keyframe+empty_moov+default_base_moof', '-f', 'mp4']
     frag_files = []
-    for w_h, bitrate, label in resolutions:
+    for i, (w_h, bitrate, label) in enumerate(resolutions):
         frag = dash_dir / f"output_{label}.mp4"
-        cmd = ['ffmpeg', '-i', input_path, '-vf', f"scale={w_h}", '-c:v', 'libx264', '-b:v', bitrate, '-c:a', 'aac', '-b:a', '128k', '-f', 'mp4', '-y', str(frag)]
-        subprocess.run(cmd, check=True)
+        cmd += ['-map', f"[out{i}]",
+                '-c:v', 'libx264', *x264_params, '-b:v', bitrate,
+                '-g', '48', '-keyint_min', '48', '-sc_threshold', '0',
+                *frag_flags, str(frag)]
+        frag_files.append(str(frag))
+    # audio is encoded once and packaged as a single adaptation set shared
+    # by all video renditions
+    if _has_audio(input_path):
+        frag = dash_dir / "output_audio.mp4"
+        cmd += ['-map', '0:a:0', '-c:a', 'aac', '-b:a', '128k',
+                '-frag_duration', '2000000', *frag_flags, str(frag)]
         frag_files.append(str(frag))
+    subprocess.run(cmd, check=True)
 
-    # DASH packaging with Bento4
-    mp4dash_cmd = ['mp4dash', '-o', str(dash_dir), '--profile=on-demand'] + frag_files
+    # DASH and HLS packaging with Bento4 from the same fragmented renditions
+    mp4dash_cmd = ['mp4dash', '-o', str(dash_dir), '--force', '--profile=on-demand',
+                   '--hls'] + frag_files
     subprocess.run(mp4dash_cmd, check=True)
 
     video.dash_directory = f"dash/{video_id}/"
-    video.status = 'ready'
-    video.save()
+    # archive_to_hevc updates the same row concurrently
+    video.save(update_fields=['dash_directory', 'updated_at'])
+    finalize_video(video_id)
+
+
+def finalize_video(video_id):
+    """
+    Marks video ready after both HEVC archive and DASH ladder are done.
+
+    Called by both tasks after saving their result; a single conditional
+    update, so the one finishing last marks the video.
+    """
+    return Video.objects.filter(id=video_id, status='processing').exclude(
+        hevc_archive='').exclude(dash_directory='').update(status='ready', updated_at=timezone.now())
+
+
+@shared_task
+def fail_video(request, exc, traceback, video_id):
+    """
+    Errback of archive and DASH tasks, marks video failed.
+    """
+    logger.error(f"Processing video {video_id} failed in {request.task}: {exc}")
+    Video.objects.filter(id=video_id).update(
+        status='error', processing_log=f"{request.task}: {exc}", updated_at=timezone.now())
+
+
+@shared_task
+def poll_edgeware():
+    """
+    Checks Edgeware ingest state of due publications once.
+
+    Schedule with celery beat every few seconds (MIN_INTERVAL), each
+    publication is checked on its own backoff interval. Alternatively run
+    manage.py poll_edgeware.
+    """
+    return EdgewareStatusPoller().poll_once()
+
+
+@shared_task
+def refresh_inventory(full=False):
+    """
+    Brings the provider files index up to date.
+
+    Schedule with celery beat every minute or so, an unchanged directory
+    costs one stat. Alternatively run manage.py refresh_inventory.
+    """
+    return asdict(get_inventory().refresh(full=full))
 
 
 def poll_workers_health():
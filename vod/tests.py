@@ -1,3 +1,223 @@
-from django.test import TestCase
+import subprocess
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from vidra_kit.backends.api import EdgewareAPIError, EdgewareStatusPoller
+
+from .api.v1.views import VueFinderViewSet
+from .models import Edgeware, Video
+from .tasks import _encoder_params, archive_to_hevc, fail_video, finalize_video
+
+
+class EdgewareStatusPollerTestCase(TestCase):
+    def setUp(self):
+        self.api = mock.Mock()
+        self.states = {}
+        self.api.check_content.side_effect = self.check_content
+        self.poller = EdgewareStatusPoller(api=self.api, workers=2)
+
+    def check_content(self, content_id):
+        state = self.states[content_id]
+        if isinstance(state, Exception):
+            raise state
+        return {"content_id": content_id, "state": state}
+
+    def create(self, content_id, state, status=Edgeware.Status.EW_PENDING):
+        self.states[content_id] = state
+        return Edgeware.objects.create(title=content_id, ftp_dir=f"vod/{content_id}",
+                                       content_id=content_id, status=status)
+
+    def test_terminal_states(self):
+        """Only done and error states finish a publication."""
+        done = self.create("done", "done")
+        error = self.create("error", "error")
+        ongoing = self.create("ongoing", "ongoing")
+        queued = self.create("queued", "queued")
+        failed = self.create("failed", EdgewareAPIError("HTTP 500"))
+
+        self.poller.poll_once()
+
+        done.refresh_from_db()
+        self.assertEqual(done.status, Edgeware.Status.EW_DONE)
+        self.assertEqual(done.msg, {"content_id": "done", "state": "done"})
+        error.refresh_from_db()
+        self.assertEqual(error.status, Edgeware.Status.EW_ERROR)
+        for ew in (ongoing, queued, failed):
+            ew.refresh_from_db()
+            self.assertEqual(ew.status, Edgeware.Status.EW_PENDING)
+            self.assertEqual(ew.check_interval, EdgewareStatusPoller.MIN_INTERVAL)
+            self.assertIsNotNone(ew.next_check)
+
+    def test_not_pending_skipped(self):
+        self.create("uploaded", "done", status=Edgeware.Status.FTP_UPLOAD)
+
+        self.assertEqual(self.poller.poll_once(), EdgewareStatusPoller.MAX_INTERVAL)
+
+        self.api.check_content.assert_not_called()
+
+    def test_backoff_between_passes(self):
+        """Backoff is kept on the model, so each pass may run in a new poller."""
+        ew = self.create("ongoing", "ongoing")
+
+        interval = self.poller.poll_once()
+        self.assertAlmostEqual(interval, EdgewareStatusPoller.MIN_INTERVAL, delta=1)
+
+        # not due yet
+        EdgewareStatusPoller(api=self.api).poll_once()
+        self.assertEqual(self.api.check_content.call_count, 1)
+
+        Edgeware.objects.update(next_check=timezone.now() - timedelta(seconds=1))
+        interval = EdgewareStatusPoller(api=self.api).poll_once()
+
+        self.assertEqual(self.api.check_content.call_count, 2)
+        ew.refresh_from_db()
+        self.assertEqual(ew.check_interval, EdgewareStatusPoller.MIN_INTERVAL * EdgewareStatusPoller.BACKOFF)
+        self.assertAlmostEqual(interval, ew.check_interval, delta=1)
+
+        self.states["ongoing"] = "done"
+        Edgeware.objects.update(next_check=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(EdgewareStatusPoller(api=self.api).poll_once(), EdgewareStatusPoller.MAX_INTERVAL)
+        ew.refresh_from_db()
+        self.assertEqual(ew.status, Edgeware.Status.EW_DONE)
+
+
+class VideoProcessingTestCase(TestCase):
+    def setUp(self):
+        self.video = Video.objects.create(title="video", status='processing',
+                                          mezzanine_video="mezzanine/1.mp4")
+
+    def test_finalize_video(self):
+        """Video is ready only after both archive and DASH ladder are done."""
+        Video.objects.filter(id=self.video.id).update(hevc_archive="archive/hevc/1.mp4")
+        self.assertEqual(finalize_video(self.video.id), 0)
+
+        Video.objects.filter(id=self.video.id).update(dash_directory="dash/1/")
+        self.assertEqual(finalize_video(self.video.id), 1)
+
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.status, 'ready')
+
+    def test_failed_branch(self):
+        """Errback marks video failed, the other branch can't make it ready."""
+        error = subprocess.CalledProcessError(1, 'ffmpeg')
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=Path(media_root)), \
+                mock.patch('vod.tasks.subprocess.run', side_effect=error):
+            result = archive_to_hevc.si(self.video.id).on_error(fail_video.s(self.video.id)).apply()
+
+        self.assertTrue(result.failed())
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.status, 'error')
+        self.assertIn('archive_to_hevc', self.video.processing_log)
+
+        Video.objects.filter(id=self.video.id).update(hevc_archive="archive/hevc/1.mp4",
+                                                      dash_directory="dash/1/")
+        self.assertEqual(finalize_video(self.video.id), 0)
+
+
+class EncoderParamsTestCase(SimpleTestCase):
+    def test_not_tuned(self):
+        with mock.patch('vod.tasks.tuning.get_capabilities') as get_capabilities:
+            self.assertEqual(_encoder_params('libx264', 'medium'), ['-preset', 'medium'])
+        get_capabilities.assert_not_called()
+
+    @override_settings(VIDEO_ENCODING_AUTO_TUNE=True, VIDEO_ENCODING_PROBE_CACHE='/var/cache/probe.json',
+                       VIDEO_ENCODING_TARGET_SPEED=2.0, VIDEO_ENCODING_JOBS=4)
+    def test_video_encoding_settings(self):
+        """Probe results and tuning come from VIDEO_ENCODING_* settings."""
+        caps = mock.Mock()
+        tuning = mock.Mock(preset='fast')
+        tuning.get_params.return_value = ['-threads', '2', '-preset', 'fast']
+        with mock.patch('vod.tasks.tuning.get_capabilities', return_value=caps) as get_capabilities, \
+                mock.patch('vod.tasks.tuning.tune', return_value=tuning) as tune:
+            self.assertEqual(_encoder_params('libx264', 'medium'), ['-threads', '2', '-preset', 'fast'])
+
+        get_capabilities.assert_called_once_with(cache_path='/var/cache/probe.json', run_probe=False)
+        tune.assert_called_once_with(caps, 'libx264', target_speed=2.0, jobs=4)
+
+    @override_settings(VIDEO_ENCODING_AUTO_TUNE=True)
+    def test_not_probed(self):
+        with mock.patch('vod.tasks.tuning.get_capabilities', return_value=None):
+            self.assertEqual(_encoder_params('libx265', 'slow'), ['-preset', 'slow'])
+
+
+class VueFinderListingTestCase(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name) / "files"
+        self.root.mkdir()
+        for name, size in (("b.mp4", 30), ("a.tar", 10), ("C.xml", 20)):
+            (self.root / name).write_bytes(b"x" * size)
+        (self.root / "zdir").mkdir()
+        (self.root / "adir").mkdir()
+        patcher = mock.patch.object(VueFinderViewSet, 'BASE_DIR', self.root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings = override_settings(VOD_INVENTORY_ROOT=str(self.root), VOD_INVENTORY_DB=Path(tmp.name) / "index")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.factory = APIRequestFactory()
+
+    def call(self, method, view_action, **data):
+        view = VueFinderViewSet.as_view({method: view_action})
+        if method == 'get':
+            request = self.factory.get('/api/files/', data)
+        else:
+            request = getattr(self.factory, method)('/api/files/', data, format='json')
+        return view(request).data
+
+    def names(self, **params):
+        return [f["name"] for f in self.call('get', 'list', **params)["files"]]
+
+    def test_sort(self):
+        """Directories go first in any order."""
+        self.assertEqual(self.names(), ["adir", "zdir", "a.tar", "b.mp4", "C.xml"])
+        self.assertEqual(self.names(sort="size", order="desc"), ["adir", "zdir", "b.mp4", "C.xml", "a.tar"])
+        self.assertEqual(self.names(sort="type"), ["adir", "zdir", "b.mp4", "a.tar", "C.xml"])
+
+    def test_filter(self):
+        self.assertEqual(self.names(filter="A"), ["adir", "a.tar"])
+
+    def test_limit_cursor(self):
+        data = self.call('get', 'list', limit=2)
+        self.assertEqual([f["name"] for f in data["files"]], ["adir", "zdir"])
+        self.assertEqual(data["total"], 5)
+
+        names = []
+        cursor = data["next_cursor"]
+        while cursor is not None:
+            data = self.call('get', 'list', limit=2, cursor=cursor)
+            names.extend(f["name"] for f in data["files"])
+            cursor = data["next_cursor"]
+        self.assertEqual(names, ["a.tar", "b.mp4", "C.xml"])
+
+    def test_whole_directory(self):
+        """Stock VueFinder client sends neither limit nor cursor."""
+        data = self.call('get', 'list', path="local://public/")
+        self.assertEqual(len(data["files"]), 5)
+        self.assertIsNone(data["next_cursor"])
+        item = data["files"][2]
+        self.assertEqual(item["path"], "local://public/a.tar")
+        self.assertEqual(item["size"], 10)
+
+    def test_invalidation(self):
+        """Listing is up to date after mkdir, rename and delete."""
+        self.names()
+
+        item = self.call('put', 'put', action="create-folder", path="local://public/adir", name="new")
+        self.assertEqual(item["path"], "local://public/adir/new")
+        self.assertEqual(self.names(path="local://public/adir"), ["new"])
+
+        self.call('patch', 'patch', action="rename", item="local://public/a.tar", newName="d.tar")
+        self.assertEqual(self.names(), ["adir", "zdir", "b.mp4", "C.xml", "d.tar"])
+
+        self.call('delete', 'delete', items=["local://public/adir", "local://public/b.mp4"])
+        self.assertEqual(self.names(), ["zdir", "C.xml", "d.tar"])
+        self.assertEqual(self.names(path="local://public/zdir"), [])